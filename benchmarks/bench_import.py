@@ -0,0 +1,82 @@
+"""
+Import-time budget for main.py.
+
+Imports main in fresh interpreters with `python -X importtime`, reports the median cumulative
+import time and the slowest modules, and exits with 1 when the median exceeds the budget or when a
+heavy module that only some actions need (Telegram client, eth_account, interactive prompts) is
+imported at startup.
+
+Usage:
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --budget-ms 120 --runs 7 --top 15
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only be imported by the actions that use them
+LAZY_MODULES = ["pyrogram", "eth_account", "questionary", "src.trade", "src.export_keys", "src.check_balance"]
+
+
+def measure_once(module: str) -> Tuple[int, Dict[str, int]]:
+    """Import module in a fresh interpreter, returns its cumulative time and every module's, in us"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        cumulative[name.strip()] = int(cumulative_us)
+    return cumulative[module], cumulative
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the startup import time of main.py against a budget")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ms", type=float, default=150.0, help="median cumulative import time allowed")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest modules to show")
+    args = parser.parse_args()
+
+    totals: List[int] = []
+    modules: Dict[str, int] = {}
+    for _ in range(args.runs):
+        total, modules = measure_once(args.module)
+        totals.append(total)
+
+    median_ms = statistics.median(totals) / 1000
+    print(f"import {args.module}: median {median_ms:.1f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    print(f"{'module':<50}{'cumulative ms':>15}")
+    slowest = sorted(((us, name) for name, us in modules.items() if name != args.module), reverse=True)
+    for us, name in slowest[:args.top]:
+        print(f"{name:<50}{us / 1000:>15.1f}")
+
+    failed = False
+    eager = [name for name in LAZY_MODULES if name in modules]
+    if eager:
+        print(f"FAIL: imported at startup, should be lazy: {', '.join(eager)}")
+        failed = True
+    if median_ms > args.budget_ms:
+        print(f"FAIL: {median_ms:.1f} ms exceeds the {args.budget_ms:.0f} ms budget")
+        failed = True
+    if not failed:
+        print("OK")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Benchmark of the open/close order flow against the in-memory bot simulator.
+
+Runs Trade.trade with 2, 10, 50 and 200 simulated accounts and reports wall-clock time per trade,
+time and RPCs per step of execute_position/close_position and peak memory. The config pause ranges
+are set to zero and the start-up reconcile pass is off, so the numbers measure the order flow, not
+asyncio.sleep.
+
+Usage:
+    python benchmarks/bench_trade.py
+    python benchmarks/bench_trade.py --accounts 2 10 --trades 3 --latency 0.05 0.2 --json bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loguru import logger
+
+import src.trade as trade_module
+from src.trade import Trade
+from src.utils.position_ledger import PositionLedger
+from src.utils.bot_simulator import SimulatedBot, SimulatedBotDriver, SimulatedClientPool
+from src.utils.rate_limiter import RateLimiter
+from src.utils.tracing import tracer
+from src.utils.message_classifier import BotState
+
+
+PAUSE_SETTINGS = [
+    "BETWEEN_OPEN_CLOSE_TRADE_TIME_RANGE",
+    "BETWEEN_CLOSE_NEXT_TRADE_TIME_RANGE",
+    "BETWEEN_ACCOUNTS_IN_ONE_TRADE_PAUSE_RANGE",
+    "PAUSE_BETWEEN_TRADE_SIDES",
+]
+
+STEP_NAMES = {
+    BotState.TICKER: "ticker",
+    BotState.CHOOSE_LEVERAGE: "leverage",
+    BotState.CHOOSE_POSITION_SIZE: "size",
+    BotState.CONFIRM_POSITION: "preview",
+    BotState.ORDER_PLACED: "order_placed",
+    BotState.CLOSE_POSITION: "positions",
+    BotState.CHOOSE_PERCENTAGE: "percentage",
+    BotState.CLOSED_POSITION: "closed",
+}
+
+
+class StepStats:
+    def __init__(self):
+        self.durations: Dict[str, List[float]] = defaultdict(list)
+        self.rpcs: Dict[str, List[int]] = defaultdict(list)
+
+    def record(self, step: str, duration: float, rpcs: int):
+        self.durations[step].append(duration)
+        self.rpcs[step].append(rpcs)
+
+    def summary(self) -> Dict[str, dict]:
+        return {
+            step: {
+                "count": len(durations),
+                "mean_ms": statistics.fmean(durations) * 1000,
+                "max_ms": max(durations) * 1000,
+                "rpcs_per_step": statistics.fmean(self.rpcs[step]),
+            }
+            for step, durations in sorted(self.durations.items())
+        }
+
+
+class RecordingDriver(SimulatedBotDriver):
+    """Simulated driver that attributes time and RPCs to the step each wait completes"""
+
+    def __init__(self, session_name: str, bot: SimulatedBot, limiter: RateLimiter, stats: StepStats):
+        super().__init__(session_name, bot, limiter)
+        self.stats = stats
+        self.flow = "open"
+        self.rpcs = 0
+        self.step_started = None
+
+    def count_rpc(self):
+        self.rpcs += 1
+        if self.step_started is None:
+            self.step_started = time.perf_counter()
+
+    async def raw_send_message(self, text: str):
+        if text.startswith("/"):
+            self.flow = "close" if text == "/close" else "open"
+        self.count_rpc()
+        return await super().raw_send_message(text)
+
+    async def raw_request_callback_answer(self, message, callback_data):
+        self.count_rpc()
+        return await super().raw_request_callback_answer(message, callback_data)
+
+    async def raw_get_chat_history(self, limit: int):
+        self.count_rpc()
+        return await super().raw_get_chat_history(limit)
+
+    async def wait_for_any(self, states: List[BotState], timeout: int = 30):
+        # wait_for_message goes through here too, a wait for several screens is a step of its own
+        started = self.step_started or time.perf_counter()
+        result = await super().wait_for_any(states, timeout)
+        step = f"{self.flow}:" + "|".join(STEP_NAMES.get(state, state.name.lower()) for state in states)
+        self.stats.record(step, time.perf_counter() - started, self.rpcs)
+        self.rpcs = 0
+        self.step_started = None
+        return result
+
+
+class RecordingPool(SimulatedClientPool):
+    def __init__(self, bot: SimulatedBot, limiter: RateLimiter, stats: StepStats):
+        super().__init__(bot, limiter)
+        self.stats = stats
+
+    def create_driver(self, session_name: str):
+        return RecordingDriver(session_name, self.bot, self.limiter, self.stats)
+
+
+def build_plan(session_names: List[str], volume: float) -> dict:
+    """One-trade plan splitting the accounts evenly between long and short"""
+    half = len(session_names) // 2
+    return {
+        "total_trades": 1,
+        "total_trades_completed": 0,
+        "completed": False,
+        "trades": {
+            "trade1": {
+                "pair": "HYPE",
+                "completed": False,
+                "long": {"accounts": [{"telegram": name, "volume": volume} for name in session_names[:half]]},
+                "short": {"accounts": [{"telegram": name, "volume": volume} for name in session_names[half:]]},
+            }
+        },
+    }
+
+
+async def run_scenario(accounts: int, trades: int, latency: tuple, rate_limit: bool, workdir: str) -> dict:
+    stats = StepStats()
+    bot = SimulatedBot(latency=latency, seed=accounts)
+    limiter = RateLimiter() if rate_limit else RateLimiter(global_rate=1e9, account_rate=1e9, account_burst=1e9)
+    pool = RecordingPool(bot, limiter, stats)
+    session_names = [f"bench_{accounts}_{index}" for index in range(accounts)]
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    await pool.start(session_names)
+    startup = time.perf_counter() - started
+
+    trade_times = []
+    succeeded = 0
+    for index in range(trades):
+        trade = Trade(
+            build_plan(session_names, 20.0),
+            os.path.join(workdir, f"plan_{accounts}_{index}.json"),
+            pool=pool,
+            ledger=PositionLedger(os.path.join(workdir, "positions.json")),
+        )
+        started = time.perf_counter()
+        if await trade.trade():
+            succeeded += 1
+        trade_times.append(time.perf_counter() - started)
+
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    await pool.stop()
+
+    return {
+        "accounts": accounts,
+        "trades": trades,
+        "trades_succeeded": succeeded,
+        "startup_s": startup,
+        "trade_mean_s": statistics.fmean(trade_times),
+        "trade_max_s": max(trade_times),
+        "peak_memory_mb": peak / 1024 / 1024,
+        "steps": stats.summary(),
+    }
+
+
+def print_result(result: dict):
+    print(
+        f"\n=== {result['accounts']} accounts | {result['trades_succeeded']}/{result['trades']} trades ok | "
+        f"startup {result['startup_s']:.3f}s | trade mean {result['trade_mean_s']:.3f}s max {result['trade_max_s']:.3f}s | "
+        f"peak memory {result['peak_memory_mb']:.1f} MB"
+    )
+    print(f"{'step':<20}{'count':>8}{'mean ms':>12}{'max ms':>12}{'rpcs/step':>12}")
+    for step, data in result["steps"].items():
+        print(f"{step:<20}{data['count']:>8}{data['mean_ms']:>12.2f}{data['max_ms']:>12.2f}{data['rpcs_per_step']:>12.2f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark the open/close order flow against the bot simulator")
+    parser.add_argument("--accounts", type=int, nargs="+", default=[2, 10, 50, 200])
+    parser.add_argument("--trades", type=int, default=3, help="trades per scenario")
+    parser.add_argument("--latency", type=float, nargs=2, default=[0.05, 0.2], help="bot reply latency range, seconds")
+    parser.add_argument("--no-rate-limit", action="store_true", help="disable the request rate limiter")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    for setting in PAUSE_SETTINGS:
+        setattr(trade_module, setting, [0, 0])
+    # Every Trade.trade call would first read Positions Overview of all accounts
+    trade_module.RECONCILE_ON_START = False
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        tracer.folder = os.path.join(workdir, "traces")
+        for accounts in args.accounts:
+            result = await run_scenario(accounts, args.trades, tuple(args.latency), not args.no_rate_limit, workdir)
+            print_result(result)
+            results.append(result)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,4 +1,4 @@
-CYCLE_MODE = False
+CYCLE_MODE = False #- балансы и ключи по одному аккаунту, торговля без остановки: трейды генерируются прямо перед запуском
 
 BETWEEN_OPEN_CLOSE_TRADE_TIME_RANGE = [10, 30]  #- пауза между открытием и закрытием трейда
 BETWEEN_CLOSE_NEXT_TRADE_TIME_RANGE = [10, 20] #- пауза между закрытием и открытием следующего трейда
@@ -9,6 +9,23 @@ VOLUME_RANGE = [16, 25] #- объем трейда
 AMOUNT_MULTIPLIER_RANGE = [0.9, 1.1] #- множитель объема для встречного трейда
 TRADES_COUNT_RANGE = [1, 2] #- количество трейдов в одной инструкции
 LEVERAGE = 1 #- кредитное плечо
+TRADE_GROUPS_COUNT = 1 #- на сколько непересекающихся групп делить аккаунты, группы торгуют параллельно
+RECONCILE_ON_START = True #- перед торговлей проверить Positions Overview аккаунтов из журнала позиций и закрыть позиции, оставшиеся после падения
+CLIENT_START_CONCURRENCY = 20 #- сколько telegram клиентов запускается одновременно
+SESSION_CREATE_CONCURRENCY = 5 #- сколько аккаунтов одновременно запрашивают код при создании сессий
+BALANCE_CHECK_CONCURRENCY = 50 #- сколько балансов проверяется одновременно
+BALANCE_CACHE_TTL = 300 #- сколько секунд сохранённый баланс считается актуальным, 0 - всегда спрашивать бота
+
+RATE_LIMIT_GLOBAL_PER_SECOND = 25 #- сколько запросов в секунду отправляется боту со всех аккаунтов вместе
+RATE_LIMIT_ACCOUNT_PER_SECOND = 1 #- сколько запросов в секунду отправляется боту с одного аккаунта
+RATE_LIMIT_ACCOUNT_BURST = 3 #- сколько запросов подряд аккаунт может отправить без паузы
+FLOOD_WAIT_MAX_RETRIES = 3 #- сколько раз повторять запрос после FloodWait
+
+TRACING_ENABLED = True #- запись задержек по шагам трейда в data/traces
+
+LOG_LEVEL = "DEBUG" #- минимальный уровень логов в консоли и data/logs
+LOG_MODULE_LEVELS = {} #- уровни для отдельных модулей, например {"src.trade": "WARNING", "src.utils.bot_driver": "WARNING", "src.utils.tracing": "WARNING"}
+LOG_JSON = False #- дополнительно писать логи в data/logs/app.jsonl в JSON (session, trade_id, step, latency_ms)
 
 
 """
@@ -1,99 +1,294 @@
+import argparse
 import asyncio
+import json
+import os
 from loguru import logger
 import sys
-from src.export_keys import ExportKeys
-from src.session_manager import create_sessions, load_sessions_from_folder
-from src.trade import Trade
-from src.utils.reader import load_instructions
-from src.utils.instractions import generate_trade_instructions
-from src.check_balance import CheckBalances
-
-    
-# Logging configuration
-logger.remove()
-
-logger.add(
-    sys.stdout,
-    colorize=True,
-    format="<light-cyan>{time:HH:mm:ss:SSS}</light-cyan> | <level>{level: <8}</level> | <white>{file}:{line}</white> | <white>{message}</white>",
-)
-logger.add(
-    "data/logs/app.log",
-    rotation="100 MB",
-    format="{time:YYYY-MM-DD HH:mm:ss:SSS} | {level: <8} | {file}:{line} | {message}",
-    encoding="utf-8",
-)
+# Only lightweight modules are imported here. The Telegram client, eth_account and the
+# interactive prompts are imported by the actions that need them, see benchmarks/bench_import.py
+from src.utils.session_registry import load_sessions_from_folder, session_registry
+from src.utils.instractions import generate_trade_instructions, build_trade_instructions, save_trade_instructions, trade_generator
+from src.utils.balance_store import balance_store
+from src.utils.logging_setup import setup_logging
+from config import BALANCE_CACHE_TTL, BALANCE_CHECK_CONCURRENCY, SESSION_CREATE_CONCURRENCY, TRADE_GROUPS_COUNT, CYCLE_MODE
+
+
+async def stop_clients():
+    """Stop the client pool if an action has started it"""
+    if "src.session_manager" in sys.modules:
+        from src.session_manager import client_pool
+        await client_pool.stop()
 
 
 async def main():
-    user_action = int(
-        input(
-            "\n1. Create session"
-            "\n2. Start trading"
-            "\n3. Show existing sessions"
-            "\n4. Generate instructions"
-            "\n5. Export private keys"
-            "\n6. Check balances"
-            "\nSelect action: "
-        )
-    )
-
-    if user_action == 1:
-        await create_sessions()
-        logger.success("Sessions successfully added")
-
-    elif user_action == 2:
-        instructions = await load_instructions()
-        if not instructions:
-            logger.error("No instructions loaded")
-            return
-        print(instructions)
-        trade = Trade(instructions)
-        if await trade.trade():
-            logger.success("Trade completed successfully")
-        else:
-            logger.error("Trade completed with errors")
-
-    elif user_action == 3:
-        sessions = await load_sessions_from_folder("data/sessions")
-        logger.info("Check sessions:")
-        for session in sessions:
-            user = session["user"]
-            logger.info(
-                f'Session: {session["session_name"]} | '
-                f'User: {user["username"]} ({user["first_name"]} {user["last_name"]})'
+    try:
+        while True:
+            user_action = int(
+                input(
+                    "\n0. Exit"
+                    "\n1. Create session"
+                    "\n2. Start trading"
+                    "\n3. Show existing sessions"
+                    "\n4. Generate instructions"
+                    "\n5. Export private keys"
+                    "\n6. Check balances"
+                    "\n7. Export balance history to CSV"
+                    "\nSelect action: "
+                )
             )
 
-    elif user_action == 4:
-        sessions = await load_sessions_from_folder("data/sessions")
-        if not sessions:
-            logger.error("No sessions found. Please create sessions first")
-            return
-        try:
-            instructions = generate_trade_instructions(sessions)
-            logger.success("Trade instructions generated successfully")
-        except Exception as e:
-            logger.error(f"Failed to generate instructions: {e}")
-
-    elif user_action == 5:
-        sessions = await load_sessions_from_folder("data/sessions")
-        if not sessions:
-            logger.error("No sessions found. Please create sessions first")
-            return
-        export_keys = ExportKeys(sessions)
-        await export_keys.export_keys()
-        logger.success("Keys exported successfully")
-
-    elif user_action == 6:
-        sessions = await load_sessions_from_folder("data/sessions")
-        if not sessions:
-            logger.error("No sessions found. Please create sessions first")
-            return
-        check_balances = CheckBalances(sessions)
-        await check_balances.check_balances()
-        logger.success("Balances checked successfully")
+            if user_action == 0:
+                break
+
+            elif user_action == 1:
+                from src.session_manager import create_sessions
+                await create_sessions()
+                logger.success("Sessions successfully added")
+
+            elif user_action == 2:
+                from src.trade import Trade
+                if CYCLE_MODE:
+                    # Trades are generated one by one while the clients stay connected, Ctrl+C stops
+                    sessions = await load_sessions_from_folder("data/sessions")
+                    if not sessions:
+                        logger.error("No sessions found. Please create sessions first")
+                        continue
+                    available_balances = await asyncio.to_thread(
+                        balance_store.available_balances, [session["session_name"] for session in sessions], BALANCE_CACHE_TTL
+                    )
+                    try:
+                        generator = trade_generator(sessions, available_balances=available_balances or None)
+                    except Exception as e:
+                        logger.error(f"Failed to generate trades: {e}")
+                        continue
+                    await Trade(None, registry=session_registry, generator=generator).trade()
+                    continue
+
+                from src.utils.reader import load_instructions
+                instructions, instructions_file = await load_instructions()
+                if not instructions:
+                    logger.error("No instructions loaded")
+                    continue
+                print(instructions)
+                trade = Trade(instructions, instructions_file, registry=session_registry)
+                if await trade.trade():
+                    logger.success("Trade completed successfully")
+                else:
+                    logger.error("Trade completed with errors")
+
+            elif user_action == 3:
+                sessions = await load_sessions_from_folder("data/sessions")
+                logger.info("Check sessions:")
+                for session in sessions:
+                    user = session["user"]
+                    logger.info(
+                        f'Session: {session["session_name"]} | '
+                        f'User: {user["username"]} ({user["first_name"]} {user["last_name"]})'
+                    )
+
+            elif user_action == 4:
+                sessions = await load_sessions_from_folder("data/sessions")
+                if not sessions:
+                    logger.error("No sessions found. Please create sessions first")
+                    continue
+                # Size legs by the cached available margin, accounts without a fresh balance stay uncapped
+                available_balances = await asyncio.to_thread(
+                    balance_store.available_balances, [session["session_name"] for session in sessions], BALANCE_CACHE_TTL
+                )
+                try:
+                    instructions = generate_trade_instructions(sessions, available_balances=available_balances or None)
+                    logger.success("Trade instructions generated successfully")
+                except Exception as e:
+                    logger.error(f"Failed to generate instructions: {e}")
+
+            elif user_action == 5:
+                sessions = await load_sessions_from_folder("data/sessions")
+                if not sessions:
+                    logger.error("No sessions found. Please create sessions first")
+                    continue
+                from src.export_keys import ExportKeys
+                export_keys = ExportKeys(sessions)
+                await export_keys.export_keys()
+                logger.success("Keys exported successfully")
+
+            elif user_action == 6:
+                sessions = await load_sessions_from_folder("data/sessions")
+                if not sessions:
+                    logger.error("No sessions found. Please create sessions first")
+                    continue
+                from src.check_balance import CheckBalances
+                check_balances = CheckBalances(sessions)
+                await check_balances.check_balances()
+                logger.success("Balances checked successfully")
+
+            elif user_action == 7:
+                await asyncio.to_thread(balance_store.export_csv, "data/balance_history.csv")
+
+    finally:
+        # Clients stay connected between actions and are stopped once on exit
+        await stop_clients()
+
+
+def emit(data):
+    """Print a command result as JSON on stdout, logs go to stderr"""
+    print(json.dumps(data, indent=2, ensure_ascii=False))
+
+
+async def select_sessions(names: list) -> list:
+    """Sessions from the registry, all of them if no names are given"""
+    sessions = await load_sessions_from_folder("data/sessions")
+    if not names:
+        return sessions
+    missing = [name for name in names if name not in session_registry]
+    if missing:
+        raise ValueError(f"Unknown sessions: {', '.join(missing)}")
+    return [session_registry.get(name) for name in names]
+
+
+async def run_command(args) -> int:
+    """Run one subcommand without prompts, returns the process exit code"""
+    try:
+        if args.command == "list-sessions":
+            sessions = await load_sessions_from_folder("data/sessions")
+            emit([
+                {"session_name": session["session_name"], "phone": session.get("phone"), "user": session.get("user")}
+                for session in sessions
+            ])
+            return 0
+
+        if args.command == "create-sessions":
+            from src.session_manager import create_sessions
+            summary = await create_sessions(args.concurrency)
+            emit(summary)
+            return 0 if not summary["failed"] else 1
+
+        if args.command == "generate":
+            sessions = await load_sessions_from_folder("data/sessions")
+            available_balances = None
+            if args.use_balances:
+                available_balances = await asyncio.to_thread(
+                    balance_store.available_balances, [session["session_name"] for session in sessions], args.max_age
+                )
+            instructions = build_trade_instructions(sessions, args.groups, available_balances)
+            file_path = save_trade_instructions(instructions)
+            emit({
+                "plan": file_path,
+                "total_trades": instructions["total_trades"],
+                "total_volume": instructions["total_volume"],
+                "groups": instructions["groups"],
+            })
+            return 0
+
+        if args.command == "trade" and args.cycle:
+            from src.trade import Trade
+            sessions = await load_sessions_from_folder("data/sessions")
+            available_balances = None
+            if args.use_balances:
+                available_balances = await asyncio.to_thread(
+                    balance_store.available_balances, [session["session_name"] for session in sessions], args.max_age
+                )
+            trade = Trade(None, registry=session_registry,
+                          generator=trade_generator(sessions, args.groups, available_balances, args.max_trades))
+            succeeded = await trade.trade()
+            emit({
+                "succeeded": succeeded,
+                "total_trades": trade.instructions["total_trades"],
+                "total_trades_completed": trade.instructions["total_trades_completed"],
+                "total_volume_completed": trade.instructions["total_volume_completed"],
+            })
+            return 0 if succeeded else 1
+
+        if args.command == "trade":
+            if not args.plan:
+                raise ValueError("Either --plan or --cycle is required")
+            if not os.path.exists(args.plan):
+                raise ValueError(f"Instructions file {args.plan} not found")
+            from src.trade import Trade
+            from src.utils.reader import read_instructions
+            trade = Trade(read_instructions(args.plan), args.plan, registry=session_registry)
+            succeeded = await trade.trade()
+            instructions = trade.instructions
+            emit({
+                "plan": args.plan,
+                "succeeded": succeeded,
+                "total_trades": instructions.get("total_trades"),
+                "total_trades_completed": instructions.get("total_trades_completed"),
+                "total_volume_completed": instructions.get("total_volume_completed"),
+                "completed": instructions.get("completed", False),
+            })
+            return 0 if succeeded else 1
+
+        if args.command == "balances":
+            from src.check_balance import CheckBalances
+            sessions = await select_sessions(args.sessions)
+            check_balances = CheckBalances(sessions, concurrency=args.concurrency, cache_ttl=args.max_age)
+            results = await check_balances.check_balances(sessions)
+            emit({
+                session_name: dict(zip(("perps_balance", "perps_available", "spot_balance", "spot_available"), balances))
+                if balances else None
+                for session_name, balances in results.items()
+            })
+            return 0 if results and all(results.values()) else 1
+
+        if args.command == "export-keys":
+            from src.export_keys import ExportKeys
+            sessions = await select_sessions(args.sessions)
+            results = await ExportKeys(sessions).export_keys(sessions)
+            emit(results)
+            return 0 if results and all(results.values()) else 1
+
+    except Exception as e:
+        logger.error(f"{args.command} failed: {str(e)}")
+        emit({"error": str(e)})
+        return 1
+
+    finally:
+        await stop_clients()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="PVP trade bot. Run without a command for the interactive menu")
+    commands = parser.add_subparsers(dest="command")
+
+    create = commands.add_parser("create-sessions", help="log in accounts from data/telegram_accounts.txt")
+    create.add_argument("--concurrency", type=int, default=SESSION_CREATE_CONCURRENCY)
+
+    generate = commands.add_parser("generate", help="generate a new instructions file")
+    generate.add_argument("--groups", type=int, default=TRADE_GROUPS_COUNT, help="disjoint account groups")
+    generate.add_argument("--use-balances", action="store_true", help="cap legs by cached available balances")
+    generate.add_argument("--max-age", type=float, default=BALANCE_CACHE_TTL, help="max age of cached balances, seconds")
+
+    trade = commands.add_parser("trade", help="execute an instructions file, or trade continuously with --cycle")
+    trade.add_argument("--plan", help="path to the instructions file")
+    trade.add_argument("--cycle", action="store_true", help="generate every trade right before it runs, until stopped")
+    trade.add_argument("--groups", type=int, default=TRADE_GROUPS_COUNT, help="disjoint account groups, with --cycle")
+    trade.add_argument("--max-trades", type=int, default=None, help="stop --cycle after this many trades")
+    trade.add_argument("--use-balances", action="store_true", help="cap legs by cached available balances, with --cycle")
+    trade.add_argument("--max-age", type=float, default=BALANCE_CACHE_TTL, help="max age of cached balances, seconds")
+
+    balances = commands.add_parser("balances", help="check balances")
+    balances.add_argument("--sessions", nargs="*", default=[], help="session names, all sessions if omitted")
+    balances.add_argument("--concurrency", type=int, default=BALANCE_CHECK_CONCURRENCY)
+    balances.add_argument("--max-age", type=float, default=BALANCE_CACHE_TTL, help="serve cached balances up to this age, 0 to always ask the bot")
+
+    export = commands.add_parser("export-keys", help="export private keys")
+    export.add_argument("--sessions", nargs="*", default=[], help="session names, all sessions if omitted")
+
+    commands.add_parser("list-sessions", help="list existing sessions")
+    return parser
+
 
 if __name__ == "__main__":
+    args = build_parser().parse_args()
+    if args.command:
+        setup_logging(sys.stderr)
+        try:
+            sys.exit(asyncio.run(run_command(args)))
+        except KeyboardInterrupt:
+            logger.info("Program stopped by user")
+            sys.exit(130)
+
+    setup_logging()
     try:
         asyncio.run(main())
 
@@ -1,4 +1,3 @@
-import pyrogram
 from loguru import logger
 import asyncio
 import questionary
@@ -9,13 +8,25 @@ import os
 
 # Import configuration
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from config import CYCLE_MODE
+from config import CYCLE_MODE, BALANCE_CHECK_CONCURRENCY, BALANCE_CACHE_TTL
+from src.session_manager import ClientPool, client_pool
+from src.utils.message_classifier import BotState
+from src.utils.balance_store import BalanceStore, balance_store
+
+
+PERPS_BALANCE_PATTERN = re.compile(r"Perps Balance: \$(\d+\.\d+) \(Available to trade: \$(\d+\.\d+)\)")
+SPOT_BALANCE_PATTERN = re.compile(r"Spot Balance: \$(\d+\.\d+) \(Available to trade: \$(\d+\.\d+)\)")
 
 
 class CheckBalances:
-    def __init__(self, sessions: list):
+    def __init__(self, sessions: list, pool: ClientPool = client_pool, concurrency: int = BALANCE_CHECK_CONCURRENCY,
+                 store: BalanceStore = balance_store, cache_ttl: float = BALANCE_CACHE_TTL):
         self.sessions = sessions
         self.bot_username = "pvptrade_bot"
+        self.pool = pool
+        self.concurrency = concurrency
+        self.store = store
+        self.cache_ttl = cache_ttl
 
     async def select_sessions(self):
         """Interactive session selection"""
@@ -54,13 +65,11 @@ class CheckBalances:
     def parse_balance_message(self, message_text: str) -> tuple:
         """Extract balance information from message"""
         try:
-            # Extract perps balance using regex
-            perps_match = re.search(r"Perps Balance: \$(\d+\.\d+) \(Available to trade: \$(\d+\.\d+)\)", message_text)
+            perps_match = PERPS_BALANCE_PATTERN.search(message_text)
             perps_balance = float(perps_match.group(1)) if perps_match else 0.0
             perps_available = float(perps_match.group(2)) if perps_match else 0.0
 
-            # Extract spot balance using regex
-            spot_match = re.search(r"Spot Balance: \$(\d+\.\d+) \(Available to trade: \$(\d+\.\d+)\)", message_text)
+            spot_match = SPOT_BALANCE_PATTERN.search(message_text)
             spot_balance = float(spot_match.group(1)) if spot_match else 0.0
             spot_available = float(spot_match.group(2)) if spot_match else 0.0
 
@@ -69,114 +78,94 @@ class CheckBalances:
             logger.error(f"Error parsing balance message: {str(e)}")
             return 0.0, 0.0, 0.0, 0.0
 
-    async def check_single_balance(self, session: dict) -> bool:
-        """Check balance for a single session"""
+    def log_balance(self, session: dict, balances: tuple, cached: bool = False):
+        perps_balance, perps_available, spot_balance, spot_available = balances
+        total_balance = perps_balance + spot_balance
+
+        balance_line = (
+            f"\n{'='*50}\n"
+            f"Session: {session['session_name']}{' (cached)' if cached else ''}\n"
+            f"User: {session['user']['username']}\n"
+            f"Perps: ${perps_balance:.2f} (Available: ${perps_available:.2f}) | "
+            f"Spot: ${spot_balance:.2f} (Available: ${spot_available:.2f}) | "
+            f"Total: ${total_balance:.2f}\n"
+            f"{'='*50}"
+        )
+        logger.info(balance_line)
+
+    async def check_single_balance(self, session: dict, timeout: int = 30) -> tuple | None:
+        """Check balance for a single session, returns (perps, perps available, spot, spot available)"""
         try:
-            async with pyrogram.Client(
-                name=session["session_name"],
-                workdir="data/sessions"
-            ) as app:
+            cached = await asyncio.to_thread(self.store.latest, session["session_name"], self.cache_ttl)
+            if cached:
+                self.log_balance(session, cached, cached=True)
+                return cached
+
+            async with self.pool.lease(session["session_name"]) as bot:
                 logger.info(f"Checking balance for session {session['session_name']}")
-                
-                # Send /wallet command
-                await app.send_message(self.bot_username, "/wallet")
-                
-                # First quick check for clan registration message
-                await asyncio.sleep(2)
-                async for message in app.get_chat_history(self.bot_username, limit=1):
-                    if message.text and "Create your clan" in message.text:
-                        logger.warning(f"Session {session['session_name']} requires clan registration to proceed")
-                        return False
-                
-                # Poll for response with timeout
-                balance_found = False
-                timeout = 30  # 30 seconds timeout
-                start_time = asyncio.get_event_loop().time()
-                
-                while not balance_found and (asyncio.get_event_loop().time() - start_time) < timeout:
-                    # Get wallet information
-                    async for message in app.get_chat_history(self.bot_username, limit=3):
-                        if message.text and "Create your clan" in message.text:
-                            logger.warning(f"Session {session['session_name']} requires clan registration to proceed")
-                            return False
-                            
-                        if message.text and "Your Wallet" in message.text:
-                            perps_balance, perps_available, spot_balance, spot_available = self.parse_balance_message(message.text)
-                            total_balance = perps_balance + spot_balance
-                            
-                            balance_line = (
-                                f"\n{'='*50}\n"
-                                f"Session: {session['session_name']}\n"
-                                f"User: {session['user']['username']}\n"
-                                f"Perps: ${perps_balance:.2f} (Available: ${perps_available:.2f}) | "
-                                f"Spot: ${spot_balance:.2f} (Available: ${spot_available:.2f}) | "
-                                f"Total: ${total_balance:.2f}\n"
-                                f"{'='*50}"
-                            )
-                            
-                            logger.info(balance_line)
-                            balance_found = True
-                            return True
-                    
-                    if not balance_found:
-                        await asyncio.sleep(1)  # Wait 1 second before next check
-                        
-                if not balance_found:
-                    logger.error(f"Timeout: Could not find balance info for {session['session_name']} after {timeout} seconds")
-                    return False
+
+                # Send /wallet command and wait for the wallet or the clan registration screen
+                await bot.send_message("/wallet")
+                success, message = await bot.wait_for_any([BotState.WALLET, BotState.CLAN_REGISTRATION], timeout)
+                parsed = bot.parse(message) if success else None
+
+            if not success:
+                logger.error(f"Timeout: Could not find balance info for {session['session_name']} after {timeout} seconds")
+                return None
+            if BotState.CLAN_REGISTRATION in parsed:
+                logger.warning(f"Session {session['session_name']} requires clan registration to proceed")
+                return None
+
+            balances = self.parse_balance_message(message.text)
+            await asyncio.to_thread(self.store.record, session["session_name"], balances)
+            self.log_balance(session, balances)
+            return balances
 
         except Exception as e:
             logger.error(f"Error checking balance for {session['session_name']}: {str(e)}")
-            return False
+            return None
 
-    async def check_balances(self):
-        """Check balances for selected sessions"""
-        selected_sessions = await self.select_sessions()
+    async def check_balances(self, selected_sessions: list = None) -> dict:
+        """Check balances for the given or interactively selected sessions, returns balances by session name"""
+        if selected_sessions is None:
+            selected_sessions = await self.select_sessions()
         if not selected_sessions:
             logger.info("Balance check cancelled")
-            return
+            return {}
+
+        # Connect the sessions without a fresh cached balance up front, concurrently
+        stale = await asyncio.to_thread(
+            lambda: [s["session_name"] for s in selected_sessions if not self.store.latest(s["session_name"], self.cache_ttl)]
+        )
+        await self.pool.start(stale)
 
-        total_checked = 0
-        total_perps = 0.0
-        total_spot = 0.0
-        
         if CYCLE_MODE:
             # Sequential mode
             logger.info("Running in sequential mode")
+            results = []
             for session in selected_sessions:
-                if await self.check_single_balance(session):
-                    total_checked += 1
-                    # Get the last message to extract balances
-                    async with pyrogram.Client(name=session["session_name"], workdir="data/sessions") as app:
-                        async for message in app.get_chat_history(self.bot_username, limit=3):
-                            if message.text and "Your Wallet" in message.text:
-                                perps_balance, _, spot_balance, _ = self.parse_balance_message(message.text)
-                                total_perps += perps_balance
-                                total_spot += spot_balance
-                                break
+                results.append(await self.check_single_balance(session))
                 await asyncio.sleep(1)  # Small delay between sessions
         else:
-            # Parallel mode
+            # Parallel mode, at most self.concurrency checks at once
             logger.info("Running in parallel mode")
-            tasks = []
-            for session in selected_sessions:
-                async def check_and_get_balance(sess):
-                    if await self.check_single_balance(sess):
-                        async with pyrogram.Client(name=sess["session_name"], workdir="data/sessions") as app:
-                            async for message in app.get_chat_history(self.bot_username, limit=3):
-                                if message.text and "Your Wallet" in message.text:
-                                    return self.parse_balance_message(message.text)
-                    return None
-
-                tasks.append(check_and_get_balance(session))
-            
-            results = await asyncio.gather(*tasks)
-            for result in results:
-                if result:
-                    perps_balance, _, spot_balance, _ = result
-                    total_perps += perps_balance
-                    total_spot += spot_balance
-                    total_checked += 1
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def check_with_limit(session: dict):
+                async with semaphore:
+                    return await self.check_single_balance(session)
+
+            results = await asyncio.gather(*[check_with_limit(session) for session in selected_sessions])
+
+        total_checked = 0
+        total_perps = 0.0
+        total_spot = 0.0
+        for result in results:
+            if result:
+                perps_balance, _, spot_balance, _ = result
+                total_perps += perps_balance
+                total_spot += spot_balance
+                total_checked += 1
 
         if total_checked > 0:
             total_balance = total_perps + total_spot
@@ -193,4 +182,6 @@ class CheckBalances:
             logger.success(f"Successfully checked balances for {total_checked} session(s)")
         else:
             logger.error("Failed to check any balances")
+
+        return {session["session_name"]: result for session, result in zip(selected_sessions, results)}
         
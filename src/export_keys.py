@@ -9,13 +9,19 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 from config import CYCLE_MODE
 
-from src.utils.confirmation_messages import REVEAL_PRIVATE_KEY_MESSAGE, PRIVATE_KEY_MESSAGE, SETTINGS_MESSAGE, CLAN_REGISTRATION_MESSAGE, NEVER_SHARE_PRIVATE_KEY_MESSAGE
+from src.utils.bot_driver import BotDriver
+from src.session_manager import ClientPool, client_pool
+from src.utils.key_writer import KeyExportWriter
+from src.utils.confirmation_messages import REVEAL_PRIVATE_KEY_MESSAGE
+from src.utils.message_classifier import BotState
 
 
 class ExportKeys:
-    def __init__(self, sessions: list):
+    def __init__(self, sessions: list, pool: ClientPool = client_pool, writer: KeyExportWriter = None):
         self.sessions = sessions
         self.bot_username = "pvptrade_bot"
+        self.pool = pool
+        self.writer = writer or KeyExportWriter()
 
     def get_eth_address(self, private_key: str) -> str:
         """Convert private key to ETH address"""
@@ -60,123 +66,94 @@ class ExportKeys:
             return [selected]
         return []
 
-    async def wait_for_message(self, app: pyrogram.Client, text: str, timeout: int = 30) -> tuple[bool, pyrogram.types.Message]:
-        """Wait for a specific message to appear"""
-        start_time = asyncio.get_event_loop().time()
-        while (asyncio.get_event_loop().time() - start_time) < timeout:
-            async for message in app.get_chat_history(self.bot_username, limit=3):
-                if message.text and text in message.text:
-                    return True, message
-            await asyncio.sleep(1)
-        return False, None
+    async def wait_for_message(self, bot: BotDriver, state: BotState, timeout: int = 30) -> tuple[bool, pyrogram.types.Message]:
+        """Wait for a specific screen to appear"""
+        return await bot.wait_for_message(state, timeout)
 
-    async def click_export_button(self, app: pyrogram.Client, settings_message) -> bool:
+    async def click_export_button(self, bot: BotDriver, settings_message) -> bool:
         """Click the export private key button"""
         try:
-            if settings_message.reply_markup:
-                for row in settings_message.reply_markup.inline_keyboard:
-                    for button in row:
-                        if "Export private key" in button.text:
-                            logger.info("Found Export private key button")
-                            try:
-                                await app.request_callback_answer(
-                                    chat_id=settings_message.chat.id,
-                                    message_id=settings_message.id,
-                                    callback_data="export",
-                                )
-                                logger.info("Export button clicked successfully")
-                                # Wait for confirmation message
-                                success, _ = await self.wait_for_message(app, NEVER_SHARE_PRIVATE_KEY_MESSAGE)
-                                if success:
-                                    return True
-                                logger.error("Did not receive confirmation message after export click")
-                                return False
-                            except TimeoutError:
-                                # logger.warning("Export button click timed out, but may have succeeded")
-                                # Check if we got the message despite timeout
-                                success, _ = await self.wait_for_message(app, NEVER_SHARE_PRIVATE_KEY_MESSAGE)
-                                if success:
-                                    return True
-                                logger.error("Did not receive confirmation message after timeout")
-                                return False
-                            except Exception as e:
-                                logger.error(f"Error clicking export button: {str(e)}")
-                                return False
-            logger.error("Export button not found in settings menu")
-            return False
+            callback_data = bot.parse(settings_message).keyboard.find("Export private key")
+            if callback_data is None:
+                logger.error("Export button not found in settings menu")
+                return False
+            logger.info("Found Export private key button")
+            try:
+                await bot.request_callback_answer(settings_message, callback_data)
+                logger.info("Export button clicked successfully")
+                # Wait for confirmation message
+                success, _ = await self.wait_for_message(bot, BotState.NEVER_SHARE_PRIVATE_KEY)
+                if success:
+                    return True
+                logger.error("Did not receive confirmation message after export click")
+                return False
+            except TimeoutError:
+                # logger.warning("Export button click timed out, but may have succeeded")
+                # Check if we got the message despite timeout
+                success, _ = await self.wait_for_message(bot, BotState.NEVER_SHARE_PRIVATE_KEY)
+                if success:
+                    return True
+                logger.error("Did not receive confirmation message after timeout")
+                return False
+            except Exception as e:
+                logger.error(f"Error clicking export button: {str(e)}")
+                return False
         except Exception as e:
             logger.error(f"Error clicking export button: {str(e)}")
             return False
 
-    async def click_confirmation_button(self, app: pyrogram.Client) -> bool:
+    async def click_confirmation_button(self, bot: BotDriver) -> bool:
         """Click the confirmation button"""
         try:
-            async for message in app.get_chat_history(self.bot_username, limit=3):
-                if message.reply_markup:
-                    for row in message.reply_markup.inline_keyboard:
-                        for button in row:
-                            if REVEAL_PRIVATE_KEY_MESSAGE in button.text:
-                                logger.info("Found confirmation button")
-                                try:
-                                    await app.request_callback_answer(
-                                        chat_id=message.chat.id,
-                                        message_id=message.id,
-                                        callback_data=button.callback_data,
-                                    )
-                                    logger.info("Confirmation button clicked successfully")
-                                    # Wait for private key message
-                                    success, _ = await self.wait_for_message(app, PRIVATE_KEY_MESSAGE)
-                                    if success:
-                                        return True
-                                    logger.error("Did not receive private key after confirmation")
-                                    return False
-                                except TimeoutError:
-                                    # logger.warning("Confirmation click timed out, but may have succeeded")
-                                    # Check if we got the message despite timeout
-                                    success, _ = await self.wait_for_message(app, PRIVATE_KEY_MESSAGE)
-                                    if success:
-                                        return True
-                                    logger.error("Did not receive private key after timeout")
-                                    return False
-                                except Exception as e:
-                                    logger.error(f"Error clicking confirmation button: {str(e)}")
-                                    return False
-            logger.error("Confirmation button not found")
-            return False
+            success, message = await self.wait_for_message(bot, BotState.NEVER_SHARE_PRIVATE_KEY)
+            callback_data = bot.parse(message).keyboard.find(REVEAL_PRIVATE_KEY_MESSAGE) if success else None
+            if callback_data is None:
+                logger.error("Confirmation button not found")
+                return False
+            logger.info("Found confirmation button")
+            try:
+                await bot.request_callback_answer(message, callback_data)
+                logger.info("Confirmation button clicked successfully")
+                # Wait for private key message
+                success, _ = await self.wait_for_message(bot, BotState.PRIVATE_KEY)
+                if success:
+                    return True
+                logger.error("Did not receive private key after confirmation")
+                return False
+            except TimeoutError:
+                # logger.warning("Confirmation click timed out, but may have succeeded")
+                # Check if we got the message despite timeout
+                success, _ = await self.wait_for_message(bot, BotState.PRIVATE_KEY)
+                if success:
+                    return True
+                logger.error("Did not receive private key after timeout")
+                return False
+            except Exception as e:
+                logger.error(f"Error clicking confirmation button: {str(e)}")
+                return False
         except Exception as e:
             logger.error(f"Error clicking confirmation button: {str(e)}")
             return False
 
-    async def extract_and_save_key(self, app: pyrogram.Client, session: dict) -> bool:
+    async def extract_and_save_key(self, bot: BotDriver, session: dict) -> bool:
         """Extract private key from message and save it"""
         try:
-            async for message in app.get_chat_history(self.bot_username, limit=3):
-                if message.text and PRIVATE_KEY_MESSAGE in message.text:
-                    lines = message.text.strip().split('\n')
-                    for line in lines:
-                        line = line.strip()
-                        if line.startswith('0x'):
-                            key = line
-                            eth_address = self.get_eth_address(key)
-                            export_line = f"{session['user']['username']}:{session['session_name']}:{key}:{eth_address}\n"
-                            
-                            # Read existing keys to avoid duplicates
-                            existing_keys = set()
-                            try:
-                                with open("data/exported_wallets.txt", "r", encoding='utf-8') as f:
-                                    existing_keys = set(f.readlines())
-                            except FileNotFoundError:
-                                pass
-
-                            if export_line not in existing_keys:
-                                with open("data/exported_wallets.txt", "a", encoding='utf-8') as f:
-                                    f.write(export_line)
-                                logger.success(f"Private key and address exported and saved for {session['session_name']}")
-                                logger.info(f"ETH Address: {eth_address}")
-                                return True
-                            else:
-                                logger.info(f"Key already exists for {session['session_name']}, skipping")
-                                return True
+            success, message = await self.wait_for_message(bot, BotState.PRIVATE_KEY)
+            if success:
+                lines = message.text.strip().split('\n')
+                for line in lines:
+                    line = line.strip()
+                    if line.startswith('0x'):
+                        key = line
+                        eth_address = self.get_eth_address(key)
+                        export_line = f"{session['user']['username']}:{session['session_name']}:{key}:{eth_address}\n"
+
+                        if await self.writer.write(session['session_name'], export_line):
+                            logger.success(f"Private key and address exported and saved for {session['session_name']}")
+                            logger.info(f"ETH Address: {eth_address}")
+                        else:
+                            logger.info(f"Key already exists for {session['session_name']}, skipping")
+                        return True
             logger.error("Private key not found in messages")
             return False
         except Exception as e:
@@ -185,85 +162,94 @@ class ExportKeys:
 
     async def export_single_session(self, session: dict) -> bool:
         """Export keys for a single session"""
+        if not self.writer.running:
+            # Called on its own rather than from export_keys, run the writer just for this session
+            await self.writer.start()
+            try:
+                return await self.export_single_session(session)
+            finally:
+                await self.writer.stop()
+
         try:
-            async with pyrogram.Client(
-                name=session["session_name"],
-                workdir="data/sessions"
-            ) as app:
+            async with self.pool.lease(session["session_name"]) as bot:
                 logger.info(f"Exporting keys for session {session['session_name']}")
                 
                 # Send /settings command and wait for response
-                await app.send_message(self.bot_username, "/settings")
-                success, settings_message = await self.wait_for_message(app, SETTINGS_MESSAGE)
+                await bot.send_message("/settings")
+                success, settings_message = await self.wait_for_message(bot, BotState.SETTINGS)
                 if not success:
                     logger.error(f"Timeout waiting for settings menu for {session['session_name']}")
                     return False
                 
                 # Quick check for clan registration
-                if CLAN_REGISTRATION_MESSAGE in settings_message.text:
+                if BotState.CLAN_REGISTRATION in bot.parse(settings_message):
                     logger.error(f"Session {session['session_name']} requires clan registration to proceed")
                     return False
                 
                 # Click export button (now includes waiting for confirmation message)
-                if not await self.click_export_button(app, settings_message):
+                if not await self.click_export_button(bot, settings_message):
                     return False
                 
                 # Click confirmation button (now includes waiting for private key)
-                if not await self.click_confirmation_button(app):
+                if not await self.click_confirmation_button(bot):
                     return False
                 
                 # Extract and save key
-                return await self.extract_and_save_key(app, session)
+                return await self.extract_and_save_key(bot, session)
 
         except Exception as e:
             logger.error(f"Error processing session {session['session_name']}: {str(e)}")
             return False
 
-    async def export_keys(self):
-        """Main export function"""
-        selected_sessions = await self.select_sessions()
+    async def export_keys(self, selected_sessions: list = None) -> dict:
+        """Export keys of the given or interactively selected sessions, returns success by session name"""
+        if selected_sessions is None:
+            selected_sessions = await self.select_sessions()
         if not selected_sessions:
             logger.info("Export cancelled")
-            return
-
-        exported_keys = set()
-        total_exported = 0
+            return {}
 
-        if CYCLE_MODE:
-            # Sequential mode
-            logger.info("Running in sequential mode")
-            for session in selected_sessions:
-                if session["session_name"] in exported_keys:
-                    logger.info(f"Skipping already exported session: {session['session_name']}")
-                    continue
-                    
-                if await self.export_single_session(session):
-                    exported_keys.add(session["session_name"])
-                    total_exported += 1
-                await asyncio.sleep(1)  # Small delay between sessions
-        else:
-            # Parallel mode
-            logger.info("Running in parallel mode")
-            tasks = []
-            for session in selected_sessions:
-                if session["session_name"] not in exported_keys:
-                    task = self.export_single_session(session)
-                    tasks.append(task)
-                else:
-                    logger.info(f"Skipping already exported session: {session['session_name']}")
+        # Sessions already in the export file are skipped before connecting
+        await self.writer.start()
+        exported_before = [session for session in selected_sessions if self.writer.is_exported(session["session_name"])]
+        for session in exported_before:
+            logger.info(f"Skipping already exported session: {session['session_name']}")
+        pending = [session for session in selected_sessions if not self.writer.is_exported(session["session_name"])]
 
-            if tasks:
-                results = await asyncio.gather(*tasks, return_exceptions=True)
-                for session, result in zip(selected_sessions, results):
-                    if isinstance(result, Exception):
-                        logger.error(f"Error exporting session {session['session_name']}: {str(result)}")
-                    elif result:
-                        exported_keys.add(session["session_name"])
-                        total_exported += 1
+        try:
+            # Connect the remaining sessions up front, concurrently
+            await self.pool.start(session["session_name"] for session in pending)
+
+            if CYCLE_MODE:
+                # Sequential mode
+                logger.info("Running in sequential mode")
+                results = []
+                for session in pending:
+                    results.append(await self.export_single_session(session))
+                    await asyncio.sleep(1)  # Small delay between sessions
+            else:
+                # Parallel mode
+                logger.info("Running in parallel mode")
+                results = await asyncio.gather(*[self.export_single_session(session) for session in pending], return_exceptions=True)
+        finally:
+            await self.writer.stop()
+
+        exported_keys = {session["session_name"] for session in exported_before}
+        total_exported = 0
+        for session, result in zip(pending, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error exporting session {session['session_name']}: {str(result)}")
+            elif result:
+                exported_keys.add(session["session_name"])
+                total_exported += 1
 
         if total_exported > 0:
             logger.success(f"Successfully exported {total_exported} key(s)")
+        elif not pending:
+            logger.info("All selected sessions are already exported")
         else:
             logger.error("Failed to export any keys")
 
+        return {session["session_name"]: session["session_name"] in exported_keys for session in selected_sessions}
+
 
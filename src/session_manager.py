@@ -1,10 +1,17 @@
 import pyrogram
 from loguru import logger
+import asyncio
 import os
 import json
+from contextlib import asynccontextmanager
+from typing import Dict, Iterable
 import aiofiles
-from aiofiles.ospath import exists
+import questionary
 from src.utils.reader import read_accounts, Account, read_session_json_file
+from src.utils.session_registry import session_registry
+from src.utils.bot_driver import BotDriver
+from src.utils.reply_router import ReplyRouter
+from config import CLIENT_START_CONCURRENCY, SESSION_CREATE_CONCURRENCY
 
 
 def get_value(file_json: dict, *keys) -> str | None:
@@ -15,8 +22,116 @@ def get_value(file_json: dict, *keys) -> str | None:
     return None
 
 
-async def create_sessions() -> None:
-    """Creates new Telegram sessions from config"""
+async def prompt_code(account: Account, prompt_lock: asyncio.Lock) -> str:
+    """Ask for the login code of one account, one prompt at a time"""
+    async with prompt_lock:
+        code = await questionary.text(f"Enter the code sent to {account.phone} ({account.session_name}):").ask_async()
+    return (code or "").strip()
+
+
+async def prompt_password(account: Account, prompt_lock: asyncio.Lock) -> str:
+    """Ask for the 2FA password of one account, one prompt at a time"""
+    async with prompt_lock:
+        password = await questionary.password(f"Enter the 2FA password for {account.phone}:").ask_async()
+    return password or ""
+
+
+async def save_session_info(account: Account, user_data: pyrogram.types.User, json_file: str) -> None:
+    """Write the session JSON for a logged in account"""
+    session_info = {
+        "session_name": account.session_name,
+        "phone": account.phone,
+        "user": {
+            "id": user_data.id,
+            "username": user_data.username,
+            "first_name": user_data.first_name,
+            "last_name": user_data.last_name,
+        },
+        "api_id": account.app_id,
+        "api_hash": account.api_hash,
+        "device_model": "Desktop",
+        "system_version": "Windows 10",
+        "app_version": "1.0",
+        "lang_code": "en",
+        "system_lang_code": "en",
+        "proxy": account.proxy,
+    }
+
+    async with aiofiles.open(json_file, "w", encoding="utf-8") as f:
+        await f.write(json.dumps(session_info, indent=4, ensure_ascii=False))
+
+
+async def create_session(account: Account, session_folder: str, semaphore: asyncio.Semaphore,
+                         prompt_lock: asyncio.Lock) -> bool:
+    """Log in one account and write its session files"""
+    session_file = f"{session_folder}/{account.session_name}.session"
+    json_file = f"{session_folder}/{account.session_name}.json"
+
+    async with semaphore:
+        logger.info(f"Creating session {account.session_name} for {account.phone} (API ID: {account.app_id})")
+        session = pyrogram.Client(
+            api_id=account.app_id,
+            api_hash=account.api_hash,
+            name=account.session_name,
+            workdir=session_folder,
+            phone_number=account.phone,
+            password=account.password
+        )
+
+        try:
+            if not await session.connect():
+                sent_code = await session.send_code(account.phone)
+                code = await prompt_code(account, prompt_lock)
+                try:
+                    user_data = await session.sign_in(account.phone, sent_code.phone_code_hash, code)
+                except pyrogram.errors.SessionPasswordNeeded:
+                    password = account.password or await prompt_password(account, prompt_lock)
+                    user_data = await session.check_password(password)
+                if not isinstance(user_data, pyrogram.types.User):
+                    logger.error(f"Phone number {account.phone} is not registered in Telegram")
+                    return False
+
+            user_data = await session.get_me()
+        except pyrogram.errors.PasswordHashInvalid:
+            logger.error(f"Invalid password for account {account.phone}")
+            return False
+        except (pyrogram.errors.PhoneCodeInvalid, pyrogram.errors.PhoneCodeExpired):
+            logger.error(f"Invalid phone code for account {account.phone}")
+            return False
+        except Exception as e:
+            logger.error(f"Error creating session {account.session_name}: {str(e)}")
+            return False
+        finally:
+            if session.is_connected:
+                await session.disconnect()
+
+    # Verify that .session file was created
+    if not os.path.exists(session_file):
+        logger.error(f"Session file was not created at {session_file}")
+        return False
+
+    try:
+        await save_session_info(account, user_data, json_file)
+    except Exception as e:
+        logger.error(f"Error saving session {account.session_name}: {str(e)}")
+        return False
+
+    logger.success(
+        f"Successfully added session {user_data.username} | {user_data.first_name} {user_data.last_name}"
+    )
+    logger.debug(f"Session files created: {session_file} and {json_file}")
+    return True
+
+
+async def create_sessions(concurrency: int = SESSION_CREATE_CONCURRENCY) -> Dict[str, list]:
+    """
+    Creates new Telegram sessions from config.
+
+    Up to `concurrency` accounts connect and request login codes at the same time, the codes are
+    asked for one at a time in the order they were requested. Returns the session names that were
+    created, failed and skipped.
+    """
+    summary = {"created": [], "failed": [], "skipped": []}
     # Create sessions directory if it doesn't exist
     session_folder = "data/sessions"
     if not os.path.exists(session_folder):
@@ -26,82 +141,32 @@ async def create_sessions() -> None:
     accounts = read_accounts()
     if not accounts:
         logger.error("No accounts found in config")
-        return
+        return summary
 
+    # Skip accounts that already have a session before touching the network
+    pending = []
     for account in accounts:
-        try:
-            # Check if session already exists
-            session_file = f"{session_folder}/{account.session_name}.session"
-            json_file = f"{session_folder}/{account.session_name}.json"
-            
-            if os.path.exists(session_file) and os.path.exists(json_file):
-                logger.info(f"Session {account.session_name} already exists, skipping")
-                continue
-
-            # Log account information before creating session
-            logger.info(f"Creating session for account:")
-            logger.info(f"Phone: {account.phone}")
-            logger.info(f"Session name: {account.session_name}")
-            logger.info(f"API ID: {account.app_id}")
-
-            # Create client with config settings
-            session = pyrogram.Client(
-                api_id=account.app_id,
-                api_hash=account.api_hash,
-                name=account.session_name,
-                workdir=session_folder,
-                phone_number=account.phone,
-                password=account.password
-            )
-
-            # Connect and get user information
-            try:
-                async with session:
-                    user_data = await session.get_me()
-            except pyrogram.errors.PasswordHashInvalid:
-                logger.error(f"Invalid password for account {account.phone}")
-                continue
-            except pyrogram.errors.PhoneCodeInvalid:
-                logger.error(f"Invalid phone code for account {account.phone}")
-                continue
-
-            # Verify that .session file was created
-            if not os.path.exists(session_file):
-                logger.error(f"Session file was not created at {session_file}")
-                continue
-
-            # Save session information to JSON
-            session_info = {
-                "session_name": account.session_name,
-                "phone": account.phone,
-                "user": {
-                    "id": user_data.id,
-                    "username": user_data.username,
-                    "first_name": user_data.first_name,
-                    "last_name": user_data.last_name,
-                },
-                "api_id": account.app_id,
-                "api_hash": account.api_hash,
-                "device_model": "Desktop",
-                "system_version": "Windows 10",
-                "app_version": "1.0",
-                "lang_code": "en",
-                "system_lang_code": "en",
-                "proxy": account.proxy,
-            }
-
-            # Save information to JSON file
-            async with aiofiles.open(json_file, "w", encoding="utf-8") as f:
-                await f.write(json.dumps(session_info, indent=4, ensure_ascii=False))
-
-            logger.success(
-                f"Successfully added session {user_data.username} | {user_data.first_name} {user_data.last_name}"
-            )
-            logger.debug(f"Session files created: {session_file} and {json_file}")
-
-        except Exception as e:
-            logger.error(f"Error creating session {account.session_name}: {str(e)}")
+        session_file = f"{session_folder}/{account.session_name}.session"
+        json_file = f"{session_folder}/{account.session_name}.json"
+        if os.path.exists(session_file) and os.path.exists(json_file):
+            logger.info(f"Session {account.session_name} already exists, skipping")
+            summary["skipped"].append(account.session_name)
             continue
+        pending.append(account)
+
+    if not pending:
+        return summary
+
+    semaphore = asyncio.Semaphore(concurrency)
+    prompt_lock = asyncio.Lock()
+    results = await asyncio.gather(
+        *[create_session(account, session_folder, semaphore, prompt_lock) for account in pending]
+    )
+    session_registry.invalidate()
+    for account, created in zip(pending, results):
+        summary["created" if created else "failed"].append(account.session_name)
+    logger.info(f"Created {sum(results)} of {len(pending)} sessions")
+    return summary
 
 
 async def load_sessions(session_name: str, folder_path: str) -> dict:
@@ -117,21 +182,82 @@ async def load_sessions(session_name: str, folder_path: str) -> dict:
         return {}
 
 
-async def load_sessions_from_folder(folder_path: str) -> list:
-    """Загружает сессии из указанной папки"""
-    try:
-        if not os.path.exists(folder_path):
-            logger.error(f"Папка {folder_path} не существует")
-            return []
-
-        sessions = []
-        for file in os.listdir(folder_path):
-            if file.endswith(".json"):
-                session_name = file.replace(".json", "")
-                session_info = await load_sessions(session_name, folder_path)
-                if session_info:
-                    sessions.append(session_info)
-        return sessions
-    except Exception as e:
-        logger.error(f"Ошибка при загрузке сессий из {folder_path}: {str(e)}")
-        return []
+class ClientPool:
+    """
+    Keeps bot drivers connected across menu actions.
+
+    Drivers are started concurrently (at most CLIENT_START_CONCURRENCY at once) the first time a
+    session is needed and stay connected until stop(). Callers get a driver through lease(), which
+    also serializes conversations with the bot for one account.
+    """
+
+    def __init__(self, workdir: str = "data/sessions", concurrency: int = CLIENT_START_CONCURRENCY):
+        self.workdir = workdir
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.drivers: Dict[str, BotDriver] = {}
+        self.starting: Dict[str, asyncio.Task] = {}
+        self.locks: Dict[str, asyncio.Lock] = {}
+
+    def create_driver(self, session_name: str) -> BotDriver:
+        """Create a driver for an existing session file"""
+        return ReplyRouter(pyrogram.Client(name=session_name, workdir=self.workdir))
+
+    async def start_driver(self, session_name: str) -> BotDriver | None:
+        """Start a single driver, waiting for a free start slot"""
+        async with self.semaphore:
+            driver = self.create_driver(session_name)
+            try:
+                await driver.start()
+            except Exception as e:
+                logger.error(f"Failed to start client for session {session_name}: {str(e)}")
+                return None
+        self.drivers[session_name] = driver
+        logger.debug(f"Client started for session {session_name}")
+        return driver
+
+    async def start(self, session_names: Iterable[str]) -> Dict[str, BotDriver]:
+        """Start drivers that are not connected yet and return the started ones"""
+        session_names = list(session_names)
+        for session_name in session_names:
+            if session_name not in self.drivers and session_name not in self.starting:
+                self.starting[session_name] = asyncio.create_task(self.start_driver(session_name))
+
+        pending = [self.starting[name] for name in session_names if name in self.starting]
+        if pending:
+            await asyncio.gather(*pending)
+        for session_name in session_names:
+            task = self.starting.get(session_name)
+            if task and task.done():
+                del self.starting[session_name]
+
+        return {name: self.drivers[name] for name in session_names if name in self.drivers}
+
+    @asynccontextmanager
+    async def lease(self, session_name: str):
+        """Hand out a started driver for exclusive use by one bot conversation"""
+        drivers = await self.start([session_name])
+        if session_name not in drivers:
+            raise RuntimeError(f"Client for session {session_name} is not available")
+
+        lock = self.locks.setdefault(session_name, asyncio.Lock())
+        async with lock:
+            yield drivers[session_name]
+
+    async def stop_driver(self, session_name: str, driver: BotDriver):
+        """Stop a single driver"""
+        try:
+            await driver.stop()
+        except Exception as e:
+            logger.error(f"Error stopping client for session {session_name}: {str(e)}")
+
+    async def stop(self):
+        """Stop all drivers in parallel"""
+        if self.starting:
+            await asyncio.gather(*self.starting.values())
+            self.starting = {}
+        drivers, self.drivers = self.drivers, {}
+        await asyncio.gather(*[self.stop_driver(name, driver) for name, driver in drivers.items()])
+        self.locks = {}
+
+
+client_pool = ClientPool()
@@ -2,29 +2,65 @@ import pyrogram
 from typing import Set, Dict, List
 import asyncio
 from loguru import logger
-import json
-import os
-from datetime import datetime
-from src.utils.confirmation_messages import (
-    TICKER_MESSAGE,
-    CHOOSE_LEVERAGE_MESSAGE,
-    CHOOSE_POSITION_SIZE_MESSAGE,
-    CONFIRM_POSITION_MESSAGE,
-    CLOSE_POSITION_MESSAGE,
-    CHOOSE_PERCENTAGE_MESSAGE,
-    ORDER_PLACED_MESSAGE,
-    CLOSED_POSITION_MESSAGE
-)
-from config import LEVERAGE, BETWEEN_OPEN_CLOSE_TRADE_TIME_RANGE, BETWEEN_ACCOUNTS_IN_ONE_TRADE_PAUSE_RANGE, PAUSE_BETWEEN_TRADE_SIDES, BETWEEN_CLOSE_NEXT_TRADE_TIME_RANGE
+from src.utils.message_classifier import BotState
+from config import LEVERAGE, BETWEEN_OPEN_CLOSE_TRADE_TIME_RANGE, BETWEEN_ACCOUNTS_IN_ONE_TRADE_PAUSE_RANGE, PAUSE_BETWEEN_TRADE_SIDES, BETWEEN_CLOSE_NEXT_TRADE_TIME_RANGE, RECONCILE_ON_START
+from src.utils.bot_driver import BotDriver
+from src.utils.rate_limiter import rate_limiter
+from src.utils.tracing import tracer
+from src.utils.position_ledger import PositionLedger
+from src.utils.progress_journal import ProgressJournal, apply_checkpoint
+from src.utils.plan_stream import StreamingPlan, is_streaming_plan
+from src.utils.instructions_index import instructions_index
+from src.session_manager import ClientPool, client_pool
+from src.utils.session_registry import SessionRegistry
 import random
+import re
+import time
+from dataclasses import dataclass
+
+
+# One line per open position in "Positions Overview", e.g. "HYPE: LONG $12.29 (1x)"
+POSITION_PATTERN = re.compile(r"^([A-Z0-9]+): (LONG|SHORT) \$(\d+(?:\.\d+)?)", re.MULTILINE)
+
+
+@dataclass
+class FillResult:
+    """Outcome of one account's open leg"""
+    session_name: str
+    side: str
+    pair: str
+    volume: float
+    success: bool
+    latency: float = 0.0
+    filled_at: float | None = None
 
 
 class Trade:
-    def __init__(self, instructions: dict):
-        self.instructions = instructions
-        self.sessions = self.extract_session_names()
+    def __init__(self, instructions: dict, instructions_file: str = None, pool: ClientPool = client_pool,
+                 ledger: PositionLedger = None, registry: SessionRegistry = None, generator=None):
+        self.instructions_file = instructions_file
+        # Line-delimited plans are streamed from their file, only the header is kept in memory
+        self.plan = StreamingPlan(instructions_file) if instructions_file and is_streaming_plan(instructions_file) else None
+        # CYCLE_MODE trades come from a TradeGenerator and are not saved to a file
+        self.generator = generator
+        if self.generator:
+            self.instructions = self.generator.summary
+            self.sessions = self.generator.sessions
+            self.journal = None
+        elif self.plan:
+            self.instructions = self.plan.load()
+            self.sessions = self.plan.sessions
+            self.journal = self.plan.journal
+        else:
+            self.instructions = instructions
+            self.sessions = self.extract_session_names()
+            self.journal = ProgressJournal(instructions_file) if instructions_file else None
         self.bot_username = "pvptrade_bot"
-        self.instructions_file = None  # Will store the file path
+        self.pool = pool
+        self.ledger = ledger or PositionLedger()
+        self.registry = registry
+        # Sessions whose positions could not be reconciled, their trades are skipped
+        self.blocked: Set[str] = set()
         
     def extract_session_names(self) -> Set[str]:
         """Extract unique session names from trade instructions"""
@@ -38,100 +74,85 @@ class Trade:
                     session_names.add(account['telegram'])
         return session_names
 
-    async def wait_for_message(self, app: pyrogram.Client, text: str, timeout: int = 30) -> tuple[bool, pyrogram.types.Message]:
-        """Wait for a specific message to appear"""
-        start_time = asyncio.get_event_loop().time()
-        while (asyncio.get_event_loop().time() - start_time) < timeout:
-            async for message in app.get_chat_history(self.bot_username, limit=3):
-                if message.text and text in message.text:
-                    return True, message
-            await asyncio.sleep(1)
-        return False, None
-
-    async def select_leverage(self, app: pyrogram.Client, leverage_msg, side: str, ticker: str) -> bool:
+    async def wait_for_message(self, bot: BotDriver, state: BotState, timeout: int = 30) -> tuple[bool, pyrogram.types.Message]:
+        """Wait for a specific screen to appear"""
+        return await bot.wait_for_message(state, timeout)
+
+    async def select_leverage(self, bot: BotDriver, leverage_msg, side: str, ticker: str) -> bool:
         """Select leverage and wait for position size message"""
-        if leverage_msg.reply_markup:
-            for row in leverage_msg.reply_markup.inline_keyboard:
-                for button in row:
-                    if f"{LEVERAGE}x" in button.text.lower():
-                        try:
-                            await app.request_callback_answer(
-                                chat_id=leverage_msg.chat.id,
-                                message_id=leverage_msg.id,
-                                callback_data=button.callback_data
-                            )
-                            logger.debug(f"Selected {LEVERAGE}x leverage")
-                            # Wait for position size message
-                            success, _ = await self.wait_for_message(app, CHOOSE_POSITION_SIZE_MESSAGE)
-                            if success:
-                                return True
-                            logger.error("Did not receive position size message after leverage selection")
-                            return False
-                        except TimeoutError:
-                            # Check if we got the message despite timeout
-                            success, _ = await self.wait_for_message(app, CHOOSE_POSITION_SIZE_MESSAGE)
-                            if success:
-                                return True
-                            logger.error("Did not receive position size message after timeout")
-                            return False
-                        except Exception as e:
-                            logger.error(f"Error selecting leverage: {str(e)}")
-                            return False
-        logger.error(f"Could not find {LEVERAGE}x leverage button")
-        return False
-
-    async def click_confirm_button(self, app: pyrogram.Client, confirm_msg) -> bool:
+        callback_data = bot.parse(leverage_msg).keyboard.find(f"{LEVERAGE}x")
+        if callback_data is None:
+            logger.error(f"Could not find {LEVERAGE}x leverage button")
+            return False
+        try:
+            await bot.request_callback_answer(leverage_msg, callback_data)
+            logger.debug(f"Selected {LEVERAGE}x leverage")
+            # Wait for position size message
+            success, _ = await self.wait_for_message(bot, BotState.CHOOSE_POSITION_SIZE)
+            if success:
+                return True
+            logger.error("Did not receive position size message after leverage selection")
+            return False
+        except TimeoutError:
+            # Check if we got the message despite timeout
+            success, _ = await self.wait_for_message(bot, BotState.CHOOSE_POSITION_SIZE)
+            if success:
+                return True
+            logger.error("Did not receive position size message after timeout")
+            return False
+        except Exception as e:
+            logger.error(f"Error selecting leverage: {str(e)}")
+            return False
+
+    async def click_confirm_button(self, bot: BotDriver, confirm_msg) -> bool:
         """Click confirm button and wait for confirmation"""
-        if confirm_msg.reply_markup:
-            for row in confirm_msg.reply_markup.inline_keyboard:
-                for button in row:
-                    if "confirm" in button.text.lower():
-                        try:
-                            await app.request_callback_answer(
-                                chat_id=confirm_msg.chat.id,
-                                message_id=confirm_msg.id,
-                                callback_data=button.callback_data
-                            )
-                            logger.debug("Clicked confirm button")
-                            # Wait for order placed message
-                            success, _ = await self.wait_for_message(app, ORDER_PLACED_MESSAGE)
-                            if success:
-                                return True
-                            logger.error("Did not receive order placed message after confirmation")
-                            return False
-                        except TimeoutError:
-                            # Check if we got the message despite timeout
-                            success, _ = await self.wait_for_message(app, ORDER_PLACED_MESSAGE)
-                            if success:
-                                return True
-                            logger.error("Did not receive order placed message after timeout")
-                            return False
-                        except Exception as e:
-                            logger.error(f"Error clicking confirm: {str(e)}")
-                            return False
-        logger.error("Could not find confirm button")
-        return False
-
-    async def execute_position(self, app: pyrogram.Client, side: str, volume: float, pair: str) -> bool:
+        callback_data = bot.parse(confirm_msg).keyboard.find("confirm")
+        if callback_data is None:
+            logger.error("Could not find confirm button")
+            return False
+        try:
+            await bot.request_callback_answer(confirm_msg, callback_data)
+            logger.debug("Clicked confirm button")
+            # Wait for order placed message
+            success, _ = await self.wait_for_message(bot, BotState.ORDER_PLACED)
+            if success:
+                return True
+            logger.error("Did not receive order placed message after confirmation")
+            return False
+        except TimeoutError:
+            # Check if we got the message despite timeout
+            success, _ = await self.wait_for_message(bot, BotState.ORDER_PLACED)
+            if success:
+                return True
+            logger.error("Did not receive order placed message after timeout")
+            return False
+        except Exception as e:
+            logger.error(f"Error clicking confirm: {str(e)}")
+            return False
+
+    async def execute_position(self, bot: BotDriver, side: str, volume: float, pair: str) -> bool:
         """Execute a single position (long or short)"""
         try:
-            # Send trade command
-            command = "/long" if side.lower() == "long" else "/short"
-            await app.send_message(self.bot_username, command)
+            span_tags = dict(session=bot.session_name, side=side, pair=pair)
+            with tracer.span("open.command", **span_tags):
+                # Send trade command
+                command = "/long" if side.lower() == "long" else "/short"
+                await bot.send_message(command)
             
-            # Wait for ticker selection message
-            success, msg = await self.wait_for_message(app, TICKER_MESSAGE)
+                # Wait for ticker selection message
+                success, msg = await self.wait_for_message(bot, BotState.TICKER)
             if not success:
                 logger.error("Timeout waiting for ticker message")
                 return False
 
-            # Send ticker
-            ticker = pair.replace("-PERP", "").lower()
-            await app.send_message(self.bot_username, ticker)
-            logger.debug(f"Sent ticker: {ticker}")
+            with tracer.span("open.ticker", **span_tags):
+                # Send ticker
+                ticker = pair.replace("-PERP", "").lower()
+                await bot.send_message(ticker)
+                logger.debug(f"Sent ticker: {ticker}")
 
-            # Wait for leverage selection message
-            success, leverage_msg = await self.wait_for_message(app, CHOOSE_LEVERAGE_MESSAGE)
+                # Wait for leverage selection message
+                success, leverage_msg = await self.wait_for_message(bot, BotState.CHOOSE_LEVERAGE)
             if not success:
                 logger.error("Timeout waiting for leverage message")
                 return False
@@ -144,15 +165,18 @@ class Trade:
             #             logger.debug(f"Button [{row_idx}][{btn_idx}]: text='{button.text}', callback_data='{button.callback_data}'")
 
             # Select leverage and wait for position size message
-            if not await self.select_leverage(app, leverage_msg, side, ticker):
+            with tracer.span("open.leverage", **span_tags):
+                selected = await self.select_leverage(bot, leverage_msg, side, ticker)
+            if not selected:
                 return False
 
-            # Send volume
-            await app.send_message(self.bot_username, str(volume))
-            logger.debug(f"Sent volume: {volume}")
+            with tracer.span("open.size", **span_tags):
+                # Send volume
+                await bot.send_message(str(volume))
+                logger.debug(f"Sent volume: {volume}")
 
-            # Wait for confirmation message
-            success, confirm_msg = await self.wait_for_message(app, CONFIRM_POSITION_MESSAGE)
+                # Wait for confirmation message
+                success, confirm_msg = await self.wait_for_message(bot, BotState.CONFIRM_POSITION)
             if not success:
                 logger.error("Timeout waiting for confirmation message")
                 return False
@@ -165,7 +189,9 @@ class Trade:
             #             logger.debug(f"Button [{row_idx}][{btn_idx}]: text='{button.text}', callback_data='{button.callback_data}'")
 
             # Click confirm button and wait for position opened message
-            if not await self.click_confirm_button(app, confirm_msg):
+            with tracer.span("open.confirm", **span_tags):
+                confirmed = await self.click_confirm_button(bot, confirm_msg)
+            if not confirmed:
                 return False
 
             logger.success(f"Position executed: {side} {volume} {pair}")
@@ -175,34 +201,34 @@ class Trade:
             logger.error(f"Error executing position: {str(e)}")
             return False
 
-    async def close_position(self, app: pyrogram.Client, pair: str) -> bool:
+    async def close_position(self, bot: BotDriver, pair: str) -> bool:
         """Close position for a specific pair"""
         try:
-            # Send close command
-            await app.send_message(self.bot_username, "/close")
-            logger.debug("Sent /close command")
-
-            # Small delay to ensure we get the bot's response
-            await asyncio.sleep(2)
-
-            # Debug log recent messages
-            # logger.debug("Recent messages after /close:")
-            # async for message in app.get_chat_history(self.bot_username, limit=5):
-            #     logger.debug(f"Message text: '{message.text}'")
-
-            # Wait for close position message
-            success, close_msg = await self.wait_for_message(app, CLOSE_POSITION_MESSAGE)
+            span_tags = dict(session=bot.session_name, pair=pair)
+            with tracer.span("close.command", **span_tags):
+                # Send close command
+                await bot.send_message("/close")
+                logger.debug("Sent /close command")
+
+                # Debug log recent messages
+                # logger.debug("Recent messages after /close:")
+                # async for message in app.get_chat_history(self.bot_username, limit=5):
+                #     logger.debug(f"Message text: '{message.text}'")
+
+                # Wait for close position message
+                success, close_msg = await self.wait_for_message(bot, BotState.CLOSE_POSITION)
             if not success:
-                logger.error(f"Timeout waiting for close position message. Expected text: '{CLOSE_POSITION_MESSAGE}'")
+                logger.error(f"Timeout waiting for close position message. Expected text: '{BotState.CLOSE_POSITION.value}'")
                 return False
 
-            # Send ticker to close
-            ticker = pair.replace("-PERP", "").lower()
-            await app.send_message(self.bot_username, ticker)
-            logger.debug(f"Sent ticker to close: {ticker}")
+            with tracer.span("close.ticker", **span_tags):
+                # Send ticker to close
+                ticker = pair.replace("-PERP", "").lower()
+                await bot.send_message(ticker)
+                logger.debug(f"Sent ticker to close: {ticker}")
 
-            # Wait for percentage selection message
-            success, percentage_msg = await self.wait_for_message(app, CHOOSE_PERCENTAGE_MESSAGE)
+                # Wait for percentage selection message
+                success, percentage_msg = await self.wait_for_message(bot, BotState.CHOOSE_PERCENTAGE)
             if not success:
                 logger.error("Timeout waiting for percentage selection message")
                 return False
@@ -214,90 +240,62 @@ class Trade:
             #         for btn_idx, button in enumerate(row):
             #             logger.debug(f"Button [{row_idx}][{btn_idx}]: text='{button.text}', callback_data='{button.callback_data}'")
 
-            # Click 100% button
-            percentage_clicked = False
-            if percentage_msg.reply_markup:
-                for row in percentage_msg.reply_markup.inline_keyboard:
-                    for button in row:
-                        if "100%" in button.text:
-                            try:
-                                await app.request_callback_answer(
-                                    chat_id=percentage_msg.chat.id,
-                                    message_id=percentage_msg.id,
-                                    callback_data=button.callback_data
-                                )
-                                logger.debug("Selected 100% to close")
-                                # Wait for confirmation message
-                                success, _ = await self.wait_for_message(app, CONFIRM_POSITION_MESSAGE)
-                                if success:
-                                    percentage_clicked = True
-                                    break
-                                logger.error("Did not receive confirmation message after selecting percentage")
-                                return False
-                            except TimeoutError:
-                                # Check if we got the confirmation message despite timeout
-                                success, _ = await self.wait_for_message(app, CONFIRM_POSITION_MESSAGE)
-                                if success:
-                                    percentage_clicked = True
-                                    break
-                                logger.error("Did not receive confirmation message after percentage timeout")
-                                return False
-                            except Exception as e:
-                                logger.error(f"Error selecting percentage: {str(e)}")
-                                return False
-                    if percentage_clicked:
-                        break
-
-            if not percentage_clicked:
-                logger.error("Could not find 100% button")
-                return False
+            with tracer.span("close.percentage", **span_tags):
+                # Click 100% button
+                callback_data = bot.parse(percentage_msg).keyboard.find("100%")
+                if callback_data is None:
+                    logger.error("Could not find 100% button")
+                    return False
+                try:
+                    await bot.request_callback_answer(percentage_msg, callback_data)
+                    logger.debug("Selected 100% to close")
+                    # Wait for confirmation message
+                    success, _ = await self.wait_for_message(bot, BotState.CONFIRM_POSITION)
+                    if not success:
+                        logger.error("Did not receive confirmation message after selecting percentage")
+                        return False
+                except TimeoutError:
+                    # Check if we got the confirmation message despite timeout
+                    success, _ = await self.wait_for_message(bot, BotState.CONFIRM_POSITION)
+                    if not success:
+                        logger.error("Did not receive confirmation message after percentage timeout")
+                        return False
+                except Exception as e:
+                    logger.error(f"Error selecting percentage: {str(e)}")
+                    return False
 
             # Wait for confirmation message no longer needed here since we already got it
-            success, confirm_msg = await self.wait_for_message(app, CONFIRM_POSITION_MESSAGE)
+            with tracer.span("close.preview", **span_tags):
+                success, confirm_msg = await self.wait_for_message(bot, BotState.CONFIRM_POSITION)
             if not success:
                 logger.error("Timeout waiting for close confirmation message")
                 return False
 
-            # Click confirm button
-            confirm_clicked = False
-            if confirm_msg.reply_markup:
-                for row in confirm_msg.reply_markup.inline_keyboard:
-                    for button in row:
-                        if "confirm" in button.text.lower():
-                            try:
-                                await app.request_callback_answer(
-                                    chat_id=confirm_msg.chat.id,
-                                    message_id=confirm_msg.id,
-                                    callback_data=button.callback_data
-                                )
-                                logger.debug("Clicked confirm button")
-                                # Wait for closed position message
-                                success, _ = await self.wait_for_message(app, CLOSED_POSITION_MESSAGE)
-                                if success:
-                                    logger.debug("Position close confirmed")
-                                    confirm_clicked = True
-                                else:
-                                    logger.error("Did not receive position closed confirmation")
-                                    return False
-                            except TimeoutError:
-                                # Check if we got the closed message despite timeout
-                                success, _ = await self.wait_for_message(app, CLOSED_POSITION_MESSAGE)
-                                if success:
-                                    logger.debug("Position close confirmed after timeout")
-                                    confirm_clicked = True
-                                else:
-                                    logger.error("Did not receive position closed confirmation after timeout")
-                                    return False
-                            except Exception as e:
-                                logger.error(f"Error clicking confirm: {str(e)}")
-                                return False
-                            break
-                    if confirm_clicked:
-                        break
-
-            if not confirm_clicked:
-                logger.error("Could not find confirm button")
-                return False
+            with tracer.span("close.confirm", **span_tags):
+                # Click confirm button
+                callback_data = bot.parse(confirm_msg).keyboard.find("confirm")
+                if callback_data is None:
+                    logger.error("Could not find confirm button")
+                    return False
+                try:
+                    await bot.request_callback_answer(confirm_msg, callback_data)
+                    logger.debug("Clicked confirm button")
+                    # Wait for closed position message
+                    success, _ = await self.wait_for_message(bot, BotState.CLOSED_POSITION)
+                    if not success:
+                        logger.error("Did not receive position closed confirmation")
+                        return False
+                    logger.debug("Position close confirmed")
+                except TimeoutError:
+                    # Check if we got the closed message despite timeout
+                    success, _ = await self.wait_for_message(bot, BotState.CLOSED_POSITION)
+                    if not success:
+                        logger.error("Did not receive position closed confirmation after timeout")
+                        return False
+                    logger.debug("Position close confirmed after timeout")
+                except Exception as e:
+                    logger.error(f"Error clicking confirm: {str(e)}")
+                    return False
 
             logger.success(f"Position closed for {pair}")
             return True
@@ -306,126 +304,355 @@ class Trade:
             logger.error(f"Error closing position: {str(e)}")
             return False
 
-    def update_instructions_file(self, trade_id: str):
-        """Update the instructions file after completing a trade"""
-        if not self.instructions_file:
-            # Find the instructions file
-            for file in os.listdir("data/instructions"):
-                if file.endswith(".json"):
-                    with open(f"data/instructions/{file}", "r") as f:
-                        data = json.load(f)
-                        if data == self.instructions:
-                            self.instructions_file = f"data/instructions/{file}"
-                            break
-
-        if self.instructions_file:
-            # Update the trade status
-            self.instructions['trades'][trade_id]['completed'] = True
-            self.instructions['total_trades_completed'] += 1
-            self.instructions['last_trade_time'] = datetime.now().timestamp()
-
-            # Save updated instructions
-            with open(self.instructions_file, "w") as f:
-                json.dump(self.instructions, f, indent=4)
+    async def update_instructions_file(self, trade_id: str):
+        """Record a completed trade in the progress journal of the instructions file"""
+        if self.generator:
+            self.generator.checkpoint(trade_id)
+        elif self.plan:
+            self.plan.checkpoint(trade_id)
+        else:
+            apply_checkpoint(self.instructions, trade_id)
+        if not self.journal:
+            return
+        try:
+            # The instructions index is updated once at the end of trade(), not per checkpoint
+            await self.journal.append(trade_id, self.instructions['last_trade_time'])
             logger.info(f"Instructions updated for {trade_id}")
+        except Exception as e:
+            logger.error(f"Error journaling {trade_id}: {str(e)}")
 
-    async def execute_positions_with_delay(self, clients: dict, accounts: list, side: str, pair: str):
-        """Execute positions for a group of accounts with delay between them"""
+    async def execute_session_position(self, session_name: str, side: str, volume: float, pair: str) -> FillResult:
+        """Execute a position on a leased driver of the session and report the fill"""
+        started = time.monotonic()
+        try:
+            async with self.pool.lease(session_name) as bot:
+                success = await self.execute_position(bot, side, volume, pair)
+        except Exception as e:
+            logger.error(f"Error executing position for {session_name}: {str(e)}")
+            success = False
+        finished = time.monotonic()
+        return FillResult(
+            session_name=session_name,
+            side=side,
+            pair=pair,
+            volume=volume,
+            success=success,
+            latency=finished - started,
+            filled_at=finished if success else None,
+        )
+
+    async def close_session_position(self, session_name: str, pair: str) -> bool:
+        """Close a position on a leased driver of the session, ahead of queued opens"""
+        with rate_limiter.priority_lane():
+            async with self.pool.lease(session_name) as bot:
+                return await self.close_position(bot, pair)
+
+    async def execute_positions_with_delay(self, clients: dict, accounts: list, side: str, pair: str) -> List[FillResult]:
+        """Execute positions for a group of accounts with delay between them and wait for every fill"""
+        tasks = []
+        results = []
         for account in accounts:
-            client = clients[account['telegram']]
-            task = self.execute_position(
-                app=client,
+            if account['telegram'] not in clients:
+                logger.error(f"Session {account['telegram']} is not connected, skipping")
+                results.append(FillResult(account['telegram'], side, pair, account['volume'], success=False))
+                continue
+            task = self.execute_session_position(
+                session_name=account['telegram'],
                 side=side,
                 volume=account['volume'],
                 pair=pair
             )
             # Start the task
-            asyncio.create_task(task)
+            tasks.append(asyncio.create_task(task))
             # Wait before starting next account
             delay = random.randint(BETWEEN_ACCOUNTS_IN_ONE_TRADE_PAUSE_RANGE[0], 
                                  BETWEEN_ACCOUNTS_IN_ONE_TRADE_PAUSE_RANGE[1])
             await asyncio.sleep(delay)
 
+        results.extend(await asyncio.gather(*tasks))
+        return results
+
+    async def execute_trade(self, clients: dict, trade_id: str, trade_info: dict) -> bool:
+        """Open both sides of a trade, hold from the last fill, close and checkpoint it"""
+        logger.info(f"Executing {trade_id}")
+        pair = trade_info['pair']
+        trade_sessions = {account['telegram'] for side in ('long', 'short') for account in trade_info[side]['accounts']}
+
+        # Recorded before the first order, so a restart knows which positions belong to this trade
+        self.ledger.start_trade(trade_id, pair, sorted(trade_sessions))
+        await self.ledger.save()
+
+        # Randomly decide which side goes first
+        first_side = random.choice(['long', 'short'])
+        second_side = 'short' if first_side == 'long' else 'long'
+        logger.debug(f"Starting with {first_side} side")
+
+        # Prepare tasks for both sides
+        first_task = self.execute_positions_with_delay(
+            clients=clients,
+            accounts=trade_info[first_side]['accounts'],
+            side=first_side,
+            pair=pair
+        )
+
+        # Start first side
+        first_side_task = asyncio.create_task(first_task)
+        
+        # Wait random time before starting second side
+        delay = random.randint(PAUSE_BETWEEN_TRADE_SIDES[0], PAUSE_BETWEEN_TRADE_SIDES[1])
+        logger.debug(f"Waiting {delay} seconds before starting {second_side} side")
+        await asyncio.sleep(delay)
+
+        # Start second side
+        second_task = self.execute_positions_with_delay(
+            clients=clients,
+            accounts=trade_info[second_side]['accounts'],
+            side=second_side,
+            pair=pair
+        )
+        second_side_task = asyncio.create_task(second_task)
+
+        # Wait for every fill of both sides
+        first_results, second_results = await asyncio.gather(first_side_task, second_side_task)
+        fills = first_results + second_results
+        filled = [fill for fill in fills if fill.success]
+        for fill in filled:
+            self.ledger.open(fill.session_name, fill.pair, fill.side, fill.volume, trade_id)
+        await self.ledger.save()
+        for side in ('long', 'short'):
+            side_fills = [fill for fill in filled if fill.side == side]
+            logger.info(
+                f"{trade_id} | {side}: {len(side_fills)}/{len([f for f in fills if f.side == side])} filled, "
+                f"volume sent {round(sum(fill.volume for fill in side_fills), 8)}"
+            )
+        if not filled:
+            logger.error(f"No positions opened for {trade_id}")
+            self.ledger.finish_trade(trade_id)
+            await self.ledger.save()
+            return False
+        if len(filled) == len(fills):
+            logger.success(f"All positions opened for {trade_id}")
+        else:
+            for fill in fills:
+                if not fill.success:
+                    logger.error(f"{trade_id} | {fill.session_name} failed to open {fill.side} {fill.volume} {fill.pair}")
+
+        # Hold period starts from the last actual fill
+        hold = random.randint(BETWEEN_OPEN_CLOSE_TRADE_TIME_RANGE[0], BETWEEN_OPEN_CLOSE_TRADE_TIME_RANGE[1])
+        last_fill = max(fill.filled_at for fill in filled)
+        await asyncio.sleep(max(0.0, last_fill + hold - time.monotonic()))
+
+        # Close only the sessions of this trade that hold a position on this pair, other groups
+        # may be trading the same pair at the same time
+        holders = [session_name for session_name in self.ledger.holders(pair) if session_name in trade_sessions]
+        close_tasks = []
+        for session_name in holders:
+            task = self.close_session_position(session_name, pair)
+            close_tasks.append(task)
+
+        close_results = await asyncio.gather(*close_tasks)
+        for session_name, closed in zip(holders, close_results):
+            if closed:
+                self.ledger.close(session_name, pair)
+        self.ledger.set_phase(trade_id, "closed")
+        await self.ledger.save()
+        if all(close_results):
+            logger.success(f"All positions closed for {trade_id}")
+        else:
+            logger.error(f"{trade_id} | {close_results.count(False)} position(s) failed to close")
+
+        # Update instructions file, then drop the trade from the ledger once its checkpoint is written
+        await self.update_instructions_file(trade_id)
+        self.ledger.finish_trade(trade_id)
+        await self.ledger.save()
+
+        return len(filled) == len(fills) and all(close_results)
+
+    async def read_positions(self, session_name: str) -> Dict[str, dict] | None:
+        """Open positions of a session from its Positions Overview, None if it could not be read"""
+        try:
+            async with self.pool.lease(session_name) as bot:
+                await bot.send_message("/close")
+                success, message = await bot.wait_for_any([BotState.CLOSE_POSITION, BotState.NO_POSITIONS])
+                if not success:
+                    logger.error(f"Timeout reading open positions of {session_name}")
+                    return None
+                if BotState.NO_POSITIONS in bot.parse(message):
+                    return {}
+            positions = {
+                ticker: {"side": side.lower(), "volume": float(volume)}
+                for ticker, side, volume in POSITION_PATTERN.findall(message.text)
+            }
+            if not positions:
+                # The overview lists positions in a format this parser does not know
+                logger.error(f"Could not parse the Positions Overview of {session_name}")
+                return None
+            return positions
+        except Exception as e:
+            logger.error(f"Error reading open positions of {session_name}: {str(e)}")
+            return None
+
+    def expected_pairs(self, session_name: str) -> Dict[str, str]:
+        """ticker -> pair of the positions this tool may have left open on a session"""
+        pairs = list(self.ledger.positions.get(session_name, {}))
+        pairs += [started["pair"] for started in self.ledger.trades.values() if session_name in started["sessions"]]
+        return {pair.replace("-PERP", "").upper(): pair for pair in pairs}
+
+    async def reconcile_session(self, session_name: str) -> tuple:
+        """Close the positions the ledger attributes to a session, returns (found, closed, still open)"""
+        found = await self.read_positions(session_name)
+        if found is None:
+            return None, {}, {}
+        expected = self.expected_pairs(session_name)
+        closed, still_open = {}, {}
+        for ticker, position in found.items():
+            pair = expected.get(ticker)
+            if pair is None:
+                # Opened by hand or by another instance using the same accounts
+                logger.warning(f"{session_name} | {position['side']} {position['volume']} {ticker} is not in the ledger, leaving it open")
+                continue
+            logger.warning(f"{session_name} | closing {position['side']} {position['volume']} {pair} left open by an interrupted run")
+            try:
+                success = await self.close_session_position(session_name, pair)
+            except Exception as e:
+                logger.error(f"Error closing {pair} for {session_name}: {str(e)}")
+                success = False
+            (closed if success else still_open)[pair] = position
+        return found, closed, still_open
+
+    def is_pending(self, trade_id: str) -> bool:
+        """Whether a trade of the current plan is still to be executed"""
+        if self.generator:
+            return False
+        if self.plan:
+            return trade_id in self.plan.volumes and trade_id not in self.plan.completed
+        trade_info = self.instructions.get('trades', {}).get(trade_id)
+        return trade_info is not None and not trade_info.get('completed', False)
+
+    async def reconcile(self, clients: dict) -> Set[str]:
+        """Close positions left open by an interrupted run, returns the sessions that could not be reconciled"""
+        # Only sessions the ledger expects a position on are read, the others were never left open by this tool
+        sessions = sorted(session_name for session_name in clients if self.expected_pairs(session_name))
+        logger.info(f"Reconciling open positions of {len(sessions)} sessions")
+        results = await asyncio.gather(*[self.reconcile_session(session_name) for session_name in sessions])
+
+        blocked = set()
+        closed_pairs = set()
+        for session_name, (found, closed, still_open) in zip(sessions, results):
+            if found is None or still_open:
+                blocked.add(session_name)
+            if found is None:
+                continue
+            previous = self.ledger.positions.get(session_name, {})
+            for pair in list(previous):
+                if pair not in still_open:
+                    self.ledger.close(session_name, pair)
+            for pair, position in still_open.items():
+                trade_id = previous.get(pair, {}).get("trade_id")
+                self.ledger.open(session_name, pair, position["side"], position["volume"], trade_id)
+            closed_pairs.update((session_name, pair) for pair in closed)
+
+        for trade_id, started in list(self.ledger.trades.items()):
+            trade_sessions = set(started["sessions"])
+            unknown = (trade_sessions - set(clients)) | (trade_sessions & blocked)
+            if unknown:
+                logger.warning(f"{trade_id} was interrupted, positions of {', '.join(sorted(unknown))} could not be reconciled")
+                continue
+            opened = any((session_name, started["pair"]) in closed_pairs for session_name in trade_sessions)
+            if (opened or started["phase"] == "closed") and self.is_pending(trade_id):
+                logger.info(f"{trade_id} was interrupted after opening, its positions are closed, marking it completed")
+                await self.update_instructions_file(trade_id)
+            self.ledger.finish_trade(trade_id)
+        await self.ledger.save()
+
+        if blocked:
+            logger.error(f"Could not reconcile positions of: {', '.join(sorted(blocked))}")
+        else:
+            logger.success(f"Reconciled {len(sessions)} sessions, closed {len(closed_pairs)} leftover position(s)")
+        return blocked
+
+    async def iter_trades(self, trades: list):
+        """Yield the trades of a group, a streaming plan reads each one from its offset when it is due"""
+        for trade_id, trade_info in trades:
+            if self.plan:
+                trade_info = await asyncio.to_thread(self.plan.read_trade, trade_info)
+            yield trade_id, trade_info
+
+    async def execute_group(self, clients: dict, trades: list) -> bool:
+        """Execute the trades of one account group one after another"""
+        all_succeeded = True
+        async for trade_id, trade_info in self.iter_trades(trades):
+            if trade_info.get('completed', False):
+                logger.info(f"Skipping completed trade {trade_id}")
+                continue
+
+            blocked = {account['telegram'] for side in ('long', 'short') for account in trade_info[side]['accounts']} & self.blocked
+            if blocked:
+                # Stays pending for the next run, once the positions of these sessions are resolved
+                logger.error(f"Skipping {trade_id}, positions of {', '.join(sorted(blocked))} were not reconciled")
+                all_succeeded = False
+                continue
+
+            with tracer.span("trade", trade_id=trade_id, pair=trade_info['pair']):
+                if not await self.execute_trade(clients, trade_id, trade_info):
+                    all_succeeded = False
+            await tracer.flush()
+
+            # Wait before next trade
+            await asyncio.sleep(random.randint(BETWEEN_CLOSE_NEXT_TRADE_TIME_RANGE[0], BETWEEN_CLOSE_NEXT_TRADE_TIME_RANGE[1])) 
+
+        return all_succeeded
+
     async def trade(self):
         """Execute all trades in the instructions"""
         try:
-            # Create clients for all sessions
-            clients = {}
-            for session_name in self.sessions:
-                clients[session_name] = pyrogram.Client(
-                    name=session_name,
-                    workdir="data/sessions"
-                )
-
-            # Start all clients
-            for client in clients.values():
-                await client.start()
-
-            # Execute trades sequentially
-            for trade_id, trade_info in self.instructions['trades'].items():
-                if trade_info.get('completed', False):
-                    logger.info(f"Skipping completed trade {trade_id}")
-                    continue
-
-                logger.info(f"Executing {trade_id}")
-                pair = trade_info['pair']
-
-                # Randomly decide which side goes first
-                first_side = random.choice(['long', 'short'])
-                second_side = 'short' if first_side == 'long' else 'long'
-                logger.debug(f"Starting with {first_side} side")
-
-                # Prepare tasks for both sides
-                first_task = self.execute_positions_with_delay(
-                    clients=clients,
-                    accounts=trade_info[first_side]['accounts'],
-                    side=first_side,
-                    pair=pair
-                )
-
-                # Start first side
-                first_side_task = asyncio.create_task(first_task)
-                
-                # Wait random time before starting second side
-                delay = random.randint(PAUSE_BETWEEN_TRADE_SIDES[0], PAUSE_BETWEEN_TRADE_SIDES[1])
-                logger.debug(f"Waiting {delay} seconds before starting {second_side} side")
-                await asyncio.sleep(delay)
-
-                # Start second side
-                second_task = self.execute_positions_with_delay(
-                    clients=clients,
-                    accounts=trade_info[second_side]['accounts'],
-                    side=second_side,
-                    pair=pair
-                )
-                second_side_task = asyncio.create_task(second_task)
-
-                # Wait for both sides to complete
-                await asyncio.gather(first_side_task, second_side_task)
-                logger.success(f"All positions opened for {trade_id}")
-                await asyncio.sleep(random.randint(BETWEEN_OPEN_CLOSE_TRADE_TIME_RANGE[0], BETWEEN_OPEN_CLOSE_TRADE_TIME_RANGE[1])) 
-
-                # Close all positions
-                close_tasks = []
-                for session_name, client in clients.items():
-                    task = self.close_position(client, pair)
-                    close_tasks.append(task)
-
-                await asyncio.gather(*close_tasks)
-                logger.success(f"All positions closed for {trade_id}")
-
-                # Update instructions file
-                self.update_instructions_file(trade_id)
-
-                # Wait before next trade
-                await asyncio.sleep(random.randint(BETWEEN_CLOSE_NEXT_TRADE_TIME_RANGE[0], BETWEEN_CLOSE_NEXT_TRADE_TIME_RANGE[1])) 
-
-            # Stop all clients
-            for client in clients.values():
-                await client.stop()
-
-            return True
+            if self.registry is not None:
+                await self.registry.load()
+                missing = sorted(name for name in self.sessions if name not in self.registry)
+                if missing:
+                    logger.warning(f"Sessions from the instructions not found in {self.registry.folder}: {', '.join(missing)}")
+
+            # Start clients for all sessions concurrently, they stay connected after the trade
+            clients = await self.pool.start(self.sessions)
+            if len(clients) < len(self.sessions):
+                logger.warning(f"Connected {len(clients)} of {len(self.sessions)} sessions")
+
+            # Positions left by a crash would otherwise be doubled by the trades that follow
+            if RECONCILE_ON_START:
+                self.blocked = await self.reconcile(clients)
+                if self.blocked and self.generator:
+                    self.generator.exclude(self.blocked)
+
+            # Trades of one group run sequentially, groups have disjoint accounts and run concurrently
+            if self.generator:
+                # Every group draws its next trade from the generator until it is stopped
+                groups = {number: self.generator.trades(number) for number in range(1, len(self.generator.groups) + 1)}
+                logger.info("CYCLE_MODE: generating trades until stopped")
+            elif self.plan:
+                # Completed trades are skipped by the offsets index without being read
+                groups = self.plan.groups()
+                if self.plan.completed:
+                    logger.info(f"Skipping {len(self.plan.completed)} completed trades")
+            else:
+                groups: Dict[int, list] = {}
+                for trade_id, trade_info in self.instructions['trades'].items():
+                    groups.setdefault(trade_info.get('group', 1), []).append((trade_id, trade_info))
+            if len(groups) > 1:
+                logger.info(f"Running {len(groups)} trade groups concurrently")
+
+            results = await asyncio.gather(*[self.execute_group(clients, trades) for trades in groups.values()])
+            return all(results)
 
         except Exception as e:
             logger.error(f"Error during trading: {str(e)}")
             return False
+
+        finally:
+            if self.journal:
+                try:
+                    # A streaming plan is never rewritten, its journal stays the record of progress
+                    if not self.plan:
+                        await self.journal.compact(self.instructions)
+                    await asyncio.to_thread(instructions_index.update, self.instructions_file, self.instructions)
+                except Exception as e:
+                    logger.error(f"Error saving instructions file: {str(e)}")
@@ -1 +1 @@
-from .reader import read_accounts, Account, read_session_json_file, load_instructions
+from .reader import read_accounts, Account, read_session_json_file, load_instructions, read_instructions
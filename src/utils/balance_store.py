@@ -0,0 +1,117 @@
+import csv
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from loguru import logger
+
+
+BALANCE_FIELDS = ("perps_balance", "perps_available", "spot_balance", "spot_available")
+
+
+class BalanceStore:
+    """
+    Timestamped balance snapshots per session in a local SQLite database.
+
+    Snapshots are indexed by (session_name, checked_at), so the latest balance of a session and
+    its history are index lookups. Methods are blocking; async callers run them via to_thread.
+    """
+
+    def __init__(self, path: str = "data/balances.db"):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection: Optional[sqlite3.Connection] = None
+
+    def connect(self) -> sqlite3.Connection:
+        if self.connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS balance_snapshots ("
+                "session_name TEXT NOT NULL, checked_at REAL NOT NULL, "
+                "perps_balance REAL, perps_available REAL, spot_balance REAL, spot_available REAL)"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS balance_snapshots_session_time "
+                "ON balance_snapshots (session_name, checked_at)"
+            )
+            self.connection.commit()
+        return self.connection
+
+    def record(self, session_name: str, balances: Tuple[float, float, float, float], checked_at: float = None):
+        """Store a (perps, perps available, spot, spot available) snapshot"""
+        with self.lock:
+            connection = self.connect()
+            connection.execute(
+                "INSERT INTO balance_snapshots VALUES (?, ?, ?, ?, ?, ?)",
+                (session_name, checked_at or time.time(), *balances),
+            )
+            connection.commit()
+
+    def latest(self, session_name: str, max_age: float) -> Optional[Tuple[float, float, float, float]]:
+        """Newest snapshot of a session if it is at most max_age seconds old"""
+        if max_age <= 0:
+            return None
+        with self.lock:
+            row = self.connect().execute(
+                "SELECT perps_balance, perps_available, spot_balance, spot_available FROM balance_snapshots "
+                "WHERE session_name = ? AND checked_at >= ? ORDER BY checked_at DESC LIMIT 1",
+                (session_name, time.time() - max_age),
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def available_balances(self, session_names: Iterable[str], max_age: float) -> Dict[str, float]:
+        """Perps available margin of the sessions with a snapshot at most max_age seconds old"""
+        balances = {}
+        for session_name in session_names:
+            snapshot = self.latest(session_name, max_age)
+            if snapshot:
+                balances[session_name] = snapshot[1]
+        return balances
+
+    def history(self, session_names: Iterable[str] = None, since: float = None, until: float = None) -> List[Dict]:
+        """Snapshots ordered by session and time, optionally filtered"""
+        query = f"SELECT session_name, checked_at, {', '.join(BALANCE_FIELDS)} FROM balance_snapshots WHERE 1 = 1"
+        params = []
+        if session_names is not None:
+            session_names = list(session_names)
+            query += f" AND session_name IN ({', '.join('?' for _ in session_names)})"
+            params += session_names
+        if since is not None:
+            query += " AND checked_at >= ?"
+            params.append(since)
+        if until is not None:
+            query += " AND checked_at <= ?"
+            params.append(until)
+        query += " ORDER BY session_name, checked_at"
+
+        with self.lock:
+            cursor = self.connect().execute(query, params)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def export_csv(self, path: str, session_names: Iterable[str] = None, since: float = None, until: float = None) -> int:
+        """Write the balance history to a CSV file, returns the number of rows"""
+        rows = self.history(session_names, since, until)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=["session_name", "checked_at", *BALANCE_FIELDS])
+            writer.writeheader()
+            writer.writerows(rows)
+        logger.info(f"Exported {len(rows)} balance snapshots to {path}")
+        return len(rows)
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+
+balance_store = BalanceStore()
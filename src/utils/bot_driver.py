@@ -0,0 +1,152 @@
+import asyncio
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional, Tuple
+import pyrogram
+from src.utils.rate_limiter import RateLimiter, rate_limiter
+from src.utils.tracing import tracer
+from src.utils.message_classifier import BotMessage, BotState, parse_message
+
+
+BOT_USERNAME = "pvptrade_bot"
+
+# How many recent bot messages are kept per driver to serve waits that start after the reply arrived
+RECENT_MESSAGES_LIMIT = 16
+
+
+class BotDriver(ABC):
+    """
+    Conversation with the bot for one account.
+
+    Subclasses deliver the transport (a live pyrogram client or the in-memory simulator) by
+    implementing start/stop and the raw request methods, and feed every bot message they receive
+    into on_message. Requests go through the rate limiter. Every message is parsed once on arrival
+    into its screens (BotState) and a button index, and waits are matched by screen.
+
+    A message-id watermark is advanced on every sent message and every matched reply, so a message
+    that was already in the chat before the current step (e.g. an old "Order Preview") can never
+    match. Edits of the message at the watermark are still accepted, because the bot answers button
+    clicks by editing the message that carried the keyboard.
+    """
+
+    def __init__(self, session_name: str, limiter: RateLimiter = rate_limiter):
+        self.session_name = session_name
+        self.limiter = limiter
+        self.watermark = 0
+        self.recent: "OrderedDict[int, BotMessage]" = OrderedDict()
+        self.waiters: List[Tuple[BotState, asyncio.Future]] = []
+
+    @abstractmethod
+    async def start(self):
+        """Connect the transport and start receiving bot messages"""
+
+    async def stop(self):
+        """Stop receiving bot messages, cancel pending waits and disconnect"""
+        for _, future in self.waiters:
+            if not future.done():
+                future.cancel()
+        self.waiters = []
+
+    @abstractmethod
+    async def raw_send_message(self, text: str) -> pyrogram.types.Message:
+        """Send a text message to the bot chat"""
+
+    @abstractmethod
+    async def raw_request_callback_answer(self, message: pyrogram.types.Message, callback_data: str | bytes):
+        """Press a button of a bot message"""
+
+    @abstractmethod
+    async def raw_get_chat_history(self, limit: int) -> List[pyrogram.types.Message]:
+        """Latest messages of the bot chat, newest first"""
+
+    def is_fresh(self, message: pyrogram.types.Message) -> bool:
+        """Check that a message belongs to the current step of the conversation"""
+        return message.id >= self.watermark
+
+    def advance(self, message_id: int):
+        """Move the watermark forward, dropping everything older"""
+        if message_id <= self.watermark:
+            return
+        self.watermark = message_id
+        for stale_id in [mid for mid in self.recent if mid < message_id]:
+            del self.recent[stale_id]
+
+    def on_message(self, message: pyrogram.types.Message):
+        """Store a new or edited bot message and resolve waits that expect one of its screens"""
+        parsed = parse_message(message)
+        self.recent[message.id] = parsed
+        self.recent.move_to_end(message.id)
+        while len(self.recent) > RECENT_MESSAGES_LIMIT:
+            self.recent.popitem(last=False)
+
+        if not parsed.states or not self.is_fresh(message):
+            return
+
+        pending = []
+        for state, future in self.waiters:
+            if future.done():
+                continue
+            if state in parsed:
+                future.set_result(message)
+            else:
+                pending.append((state, future))
+        self.waiters = pending
+
+    def parse(self, message: pyrogram.types.Message) -> BotMessage:
+        """Screens and button index of a message, parsed when it arrived"""
+        parsed = self.recent.get(message.id)
+        if parsed is None or parsed.message is not message:
+            parsed = parse_message(message)
+        return parsed
+
+    def find_recent(self, state: BotState) -> Optional[pyrogram.types.Message]:
+        """Return the newest fresh message showing a screen, if it has already arrived"""
+        for parsed in sorted(self.recent.values(), key=lambda p: p.message.id, reverse=True):
+            if state in parsed and self.is_fresh(parsed.message):
+                return parsed.message
+        return None
+
+    async def call(self, func: Callable[..., Awaitable], *args):
+        """Run a request through the limiter, counting every attempt on the trace span once it is sent"""
+        async def attempt():
+            # Counted after the limiter handed out a token, so span latency excludes throttling
+            tracer.count_rpc()
+            return await func(*args)
+        return await self.limiter.call(self.session_name, attempt)
+
+    async def send_message(self, text: str) -> pyrogram.types.Message:
+        """Send a message to the bot and start a new conversation step"""
+        message = await self.call(self.raw_send_message, text)
+        self.advance(message.id)
+        return message
+
+    async def request_callback_answer(self, message: pyrogram.types.Message, callback_data: str | bytes):
+        """Press an inline keyboard button of a bot message"""
+        return await self.call(self.raw_request_callback_answer, message, callback_data)
+
+    async def get_chat_history(self, limit: int) -> List[pyrogram.types.Message]:
+        """Read the latest messages of the bot chat, newest first"""
+        return await self.call(self.raw_get_chat_history, limit)
+
+    async def wait_for_message(self, state: BotState, timeout: int = 30) -> tuple[bool, pyrogram.types.Message]:
+        """Wait until a bot message showing a screen arrives"""
+        return await self.wait_for_any([state], timeout)
+
+    async def wait_for_any(self, states: List[BotState], timeout: int = 30) -> tuple[bool, pyrogram.types.Message]:
+        """Wait until a bot message showing any of the screens arrives, e.g. a reply or an error screen"""
+        arrived = [message for message in map(self.find_recent, states) if message is not None]
+        if arrived:
+            message = max(arrived, key=lambda m: m.id)
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self.waiters.extend((state, future) for state in states)
+            try:
+                message = await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                return False, None
+            finally:
+                self.waiters = [(t, f) for t, f in self.waiters if f is not future]
+
+        self.advance(message.id)
+        tracer.mark_reply()
+        return True, message
@@ -0,0 +1,347 @@
+import asyncio
+import random
+import secrets
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Tuple
+from pyrogram.errors import FloodWait
+from src.utils.bot_driver import BotDriver
+from src.utils.rate_limiter import RateLimiter, rate_limiter
+from src.session_manager import ClientPool
+
+
+LEVERAGE_OPTIONS = [1, 2, 3, 5, 10, 20]
+CLOSE_PERCENTAGES = [25, 50, 75, 100]
+
+
+@dataclass
+class SimulatedButton:
+    text: str
+    callback_data: str
+
+
+@dataclass
+class SimulatedKeyboard:
+    inline_keyboard: List[List[SimulatedButton]]
+
+
+@dataclass
+class SimulatedChat:
+    id: int
+
+
+@dataclass
+class SimulatedMessage:
+    """Subset of pyrogram.types.Message the bot flows read"""
+    id: int
+    text: str
+    chat: SimulatedChat
+    reply_markup: Optional[SimulatedKeyboard] = None
+    outgoing: bool = False
+
+
+@dataclass
+class SimulatedAccount:
+    """State the simulated bot keeps for one Telegram account"""
+    session_name: str
+    perps_balance: float = 1000.0
+    spot_balance: float = 0.0
+    private_key: str = field(default_factory=lambda: "0x" + secrets.token_hex(32))
+    requires_clan: bool = False
+    margin_used: float = 0.0
+    positions: Dict[str, Tuple[str, float, int]] = field(default_factory=dict)
+    messages: List[SimulatedMessage] = field(default_factory=list)
+    state: dict = field(default_factory=dict)
+    next_id: int = 1
+    deliver: Optional[Callable[[SimulatedMessage], None]] = None
+
+    @property
+    def perps_available(self) -> float:
+        return max(self.perps_balance - self.margin_used, 0.0)
+
+
+def keyboard(*rows: List[Tuple[str, str]]) -> SimulatedKeyboard:
+    return SimulatedKeyboard([[SimulatedButton(text, data) for text, data in row] for row in rows])
+
+
+class SimulatedBot:
+    """
+    In-memory stand-in for pvptrade_bot.
+
+    Replies with the same texts and inline keyboards the trade, balance and export flows match on.
+    Every reply is delivered after a random latency from the configured range; with drop_rate a
+    reply is written to the chat but its update is never delivered, and with flood_wait_rate a
+    request fails with FloodWait(flood_wait_seconds).
+    """
+
+    def __init__(
+        self,
+        latency: Tuple[float, float] = (0.0, 0.0),
+        drop_rate: float = 0.0,
+        flood_wait_rate: float = 0.0,
+        flood_wait_seconds: int = 1,
+        seed: int | None = None,
+    ):
+        self.latency = latency
+        self.drop_rate = drop_rate
+        self.flood_wait_rate = flood_wait_rate
+        self.flood_wait_seconds = flood_wait_seconds
+        self.random = random.Random(seed)
+        self.accounts: Dict[str, SimulatedAccount] = {}
+
+    def add_account(self, session_name: str, **kwargs) -> SimulatedAccount:
+        account = SimulatedAccount(session_name=session_name, **kwargs)
+        self.accounts[session_name] = account
+        return account
+
+    def account(self, session_name: str) -> SimulatedAccount:
+        account = self.accounts.get(session_name)
+        if account is None:
+            account = self.add_account(session_name)
+        return account
+
+    def connect(self, session_name: str, deliver: Callable[[SimulatedMessage], None]):
+        self.account(session_name).deliver = deliver
+
+    def disconnect(self, session_name: str):
+        self.account(session_name).deliver = None
+
+    def check_flood(self):
+        if self.flood_wait_rate and self.random.random() < self.flood_wait_rate:
+            raise FloodWait(value=self.flood_wait_seconds)
+
+    def new_message(self, account: SimulatedAccount, text: str, markup: SimulatedKeyboard = None, outgoing: bool = False) -> SimulatedMessage:
+        message = SimulatedMessage(account.next_id, text, SimulatedChat(0), markup, outgoing)
+        account.next_id += 1
+        return message
+
+    def publish(self, account: SimulatedAccount, message: SimulatedMessage):
+        """Write a bot message (new or edited) to the chat after latency and notify the client"""
+        def write():
+            for index, existing in enumerate(account.messages):
+                if existing.id == message.id:
+                    account.messages[index] = message
+                    break
+            else:
+                account.messages.append(message)
+            if account.deliver and self.random.random() >= self.drop_rate:
+                account.deliver(message)
+
+        delay = self.random.uniform(*self.latency)
+        asyncio.get_running_loop().call_later(delay, write)
+
+    def reply(self, account: SimulatedAccount, text: str, markup: SimulatedKeyboard = None):
+        self.publish(account, self.new_message(account, text, markup))
+
+    def edit(self, account: SimulatedAccount, message_id: int, text: str, markup: SimulatedKeyboard = None):
+        self.publish(account, SimulatedMessage(message_id, text, SimulatedChat(0), markup))
+
+    def history(self, session_name: str, limit: int) -> List[SimulatedMessage]:
+        self.check_flood()
+        return list(reversed(self.account(session_name).messages[-limit:]))
+
+    def handle_text(self, session_name: str, text: str) -> SimulatedMessage:
+        """Process a message sent by the account and schedule the bot reply"""
+        self.check_flood()
+        account = self.account(session_name)
+        outgoing = self.new_message(account, text, outgoing=True)
+        account.messages.append(outgoing)
+
+        command = text.strip().lower()
+        state = account.state
+        if command in ("/long", "/short"):
+            account.state = {"step": "ticker", "side": command[1:]}
+            self.reply(account, f"Reply with the ticker of the asset you want to {command[1:]}.")
+        elif command == "/close":
+            self.handle_close_command(account)
+        elif command == "/wallet":
+            account.state = {}
+            self.handle_wallet_command(account)
+        elif command == "/settings":
+            account.state = {}
+            self.handle_settings_command(account)
+        elif state.get("step") == "ticker":
+            state.update(step="leverage", ticker=command.upper())
+            self.reply(
+                account,
+                f"{state['side'].upper()} {state['ticker']}\n"
+                f"Available Margin: ${account.perps_available:.2f}\n"
+                f"Choose leverage:",
+                keyboard(
+                    [(f"{value}x", f"leverage:{value}") for value in LEVERAGE_OPTIONS[:3]],
+                    [(f"{value}x", f"leverage:{value}") for value in LEVERAGE_OPTIONS[3:]],
+                ),
+            )
+        elif state.get("step") == "size":
+            try:
+                size = float(command)
+            except ValueError:
+                self.reply(account, "Please reply with a number")
+                return outgoing
+            state.update(step="preview", size=size)
+            self.reply(
+                account,
+                f"Order Preview\n\n"
+                f"Side: {state['side'].upper()}\n"
+                f"Ticker: {state['ticker']}\n"
+                f"Size: ${size}\n"
+                f"Leverage: {state['leverage']}x",
+                keyboard([("✅ Confirm", "confirm"), ("❌ Cancel", "cancel")]),
+            )
+        elif state.get("step") == "close_ticker":
+            ticker = command.upper()
+            if ticker not in account.positions:
+                account.state = {}
+                self.reply(account, f"No open position for {ticker}")
+            else:
+                state.update(step="close_percentage", ticker=ticker)
+                self.reply(
+                    account,
+                    f"Choose what percentage of your {ticker} position to close",
+                    keyboard([(f"{value}%", f"close:{value}") for value in CLOSE_PERCENTAGES]),
+                )
+        else:
+            self.reply(account, "Unknown command")
+        return outgoing
+
+    def handle_close_command(self, account: SimulatedAccount):
+        if not account.positions:
+            account.state = {}
+            self.reply(account, "You have no open positions")
+            return
+        account.state = {"step": "close_ticker"}
+        lines = [
+            f"{ticker}: {side.upper()} ${size:.2f} ({leverage}x)"
+            for ticker, (side, size, leverage) in account.positions.items()
+        ]
+        self.reply(
+            account,
+            "Positions Overview\n\n" + "\n".join(lines) + "\n\nReply with the ticker of the position you want to close",
+        )
+
+    def handle_wallet_command(self, account: SimulatedAccount):
+        if account.requires_clan:
+            self.reply(account, "Create your clan to start trading")
+            return
+        self.reply(
+            account,
+            f"Your Wallet\n\n"
+            f"Perps Balance: ${account.perps_balance:.2f} (Available to trade: ${account.perps_available:.2f})\n"
+            f"Spot Balance: ${account.spot_balance:.2f} (Available to trade: ${account.spot_balance:.2f})",
+        )
+
+    def handle_settings_command(self, account: SimulatedAccount):
+        if account.requires_clan:
+            self.reply(account, "Settings\n\nCreate your clan to unlock settings")
+            return
+        self.reply(
+            account,
+            "Settings",
+            keyboard([("🔑 Export private key", "export")], [("🌐 Language", "language")]),
+        )
+
+    def handle_callback(self, session_name: str, message_id: int, callback_data: str):
+        """Process an inline button press and schedule the bot reply"""
+        self.check_flood()
+        account = self.account(session_name)
+        state = account.state
+        if isinstance(callback_data, bytes):
+            callback_data = callback_data.decode()
+
+        if callback_data.startswith("leverage:") and state.get("step") == "leverage":
+            state.update(step="size", leverage=int(callback_data.split(":")[1]))
+            self.edit(
+                account,
+                message_id,
+                f"{state['side'].upper()} {state['ticker']} {state['leverage']}x\n"
+                f"Choose Position Size in USDC or reply with a custom amount",
+            )
+        elif callback_data == "confirm" and state.get("step") == "preview":
+            self.confirm_open(account, message_id)
+        elif callback_data.startswith("close:") and state.get("step") == "close_percentage":
+            state.update(step="close_preview", percentage=int(callback_data.split(":")[1]))
+            side, size, leverage = account.positions[state["ticker"]]
+            self.edit(
+                account,
+                message_id,
+                f"Order Preview\n\n"
+                f"Close {state['percentage']}% of {state['ticker']} {side.upper()}\n"
+                f"Size: ${size * state['percentage'] / 100:.2f}",
+                keyboard([("✅ Confirm", "confirm"), ("❌ Cancel", "cancel")]),
+            )
+        elif callback_data == "confirm" and state.get("step") == "close_preview":
+            self.confirm_close(account, message_id)
+        elif callback_data == "cancel":
+            account.state = {}
+            self.edit(account, message_id, "Cancelled")
+        elif callback_data == "export":
+            self.reply(
+                account,
+                "⚠️ Never share your private key with anyone. Anyone with it has full control of your wallet.",
+                keyboard([("I will not share my private key", "reveal")]),
+            )
+        elif callback_data == "reveal":
+            self.reply(account, f"Your Private Key is:\n{account.private_key}\n\nDelete this message after saving it.")
+        return SimpleNamespace(message=None, alert=False)
+
+    def confirm_open(self, account: SimulatedAccount, message_id: int):
+        state, account.state = account.state, {}
+        margin = state["size"] / state["leverage"]
+        if margin > account.perps_available:
+            self.edit(account, message_id, "❌ Insufficient margin to place this order")
+            return
+        side, size, _ = account.positions.get(state["ticker"], (state["side"], 0.0, state["leverage"]))
+        account.positions[state["ticker"]] = (side, size + state["size"], state["leverage"])
+        account.margin_used += margin
+        self.edit(
+            account,
+            message_id,
+            f"✅ {state['side'].upper()} {state['ticker']} market order placed\nSize: ${state['size']}",
+        )
+
+    def confirm_close(self, account: SimulatedAccount, message_id: int):
+        state, account.state = account.state, {}
+        side, size, leverage = account.positions[state["ticker"]]
+        closed = size * state["percentage"] / 100
+        account.margin_used = max(account.margin_used - closed / leverage, 0.0)
+        if state["percentage"] >= 100:
+            del account.positions[state["ticker"]]
+        else:
+            account.positions[state["ticker"]] = (side, size - closed, leverage)
+        self.edit(account, message_id, f"Closed {state['percentage']}% of your {state['ticker']} position")
+
+
+class SimulatedBotDriver(BotDriver):
+    """Bot driver talking to a SimulatedBot instead of Telegram"""
+
+    def __init__(self, session_name: str, bot: SimulatedBot, limiter: RateLimiter = rate_limiter):
+        super().__init__(session_name, limiter)
+        self.bot = bot
+
+    async def start(self):
+        self.bot.connect(self.session_name, self.on_message)
+
+    async def stop(self):
+        await super().stop()
+        self.bot.disconnect(self.session_name)
+
+    async def raw_send_message(self, text: str) -> SimulatedMessage:
+        return self.bot.handle_text(self.session_name, text)
+
+    async def raw_request_callback_answer(self, message: SimulatedMessage, callback_data: str | bytes):
+        return self.bot.handle_callback(self.session_name, message.id, callback_data)
+
+    async def raw_get_chat_history(self, limit: int) -> List[SimulatedMessage]:
+        return self.bot.history(self.session_name, limit)
+
+
+class SimulatedClientPool(ClientPool):
+    """Client pool handing out simulated drivers, for offline tests and benchmarks"""
+
+    def __init__(self, bot: SimulatedBot, limiter: RateLimiter = rate_limiter, **kwargs):
+        super().__init__(**kwargs)
+        self.bot = bot
+        self.limiter = limiter
+
+    def create_driver(self, session_name: str) -> BotDriver:
+        return SimulatedBotDriver(session_name, self.bot, self.limiter)
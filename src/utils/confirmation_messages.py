@@ -1,5 +1,6 @@
 SETTINGS_MESSAGE = "Settings"
 CLAN_REGISTRATION_MESSAGE = "Create your clan"
+WALLET_MESSAGE = "Your Wallet"
 NEVER_SHARE_PRIVATE_KEY_MESSAGE = "Never share your private key"
 REVEAL_PRIVATE_KEY_MESSAGE = "I will not share my private key"
 PRIVATE_KEY_MESSAGE = "Your Private Key is:"
@@ -9,5 +10,6 @@ CHOOSE_POSITION_SIZE_MESSAGE = "Choose Position Size"
 CONFIRM_POSITION_MESSAGE = "Order Preview"
 ORDER_PLACED_MESSAGE = "order placed"
 CLOSE_POSITION_MESSAGE = "Positions Overview"
+NO_POSITIONS_MESSAGE = "You have no open positions"
 CHOOSE_PERCENTAGE_MESSAGE = "Choose what percentage"
 CLOSED_POSITION_MESSAGE = "Closed"
@@ -0,0 +1,135 @@
+import json
+import os
+import threading
+from typing import Dict, List, Tuple
+from loguru import logger
+from src.utils.progress_journal import ProgressJournal
+from src.utils.plan_stream import StreamingPlan, is_streaming_plan
+
+
+SUMMARY_FIELDS = ("total_volume", "completed", "total_trades", "total_trades_completed")
+
+
+class InstructionsIndex:
+    """
+    Summary of every plan in data/instructions, kept in .index.json next to them.
+
+    The menu reads the summaries from the index instead of parsing every plan. An entry is trusted
+    only while the mtime and size of the plan and of its progress journal match the recorded ones;
+    stale or missing entries are rebuilt from the plan (plus its journal) the next time the folder
+    is listed.
+    """
+
+    def __init__(self, folder: str = "data/instructions"):
+        self.folder = folder
+        self.path = os.path.join(folder, ".index.json")
+        self.entries: Dict[str, dict] = {}
+        self.loaded = False
+        self.lock = threading.Lock()
+
+    def load(self):
+        self.loaded = True
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except Exception as e:
+            logger.error(f"Error reading instructions index, rebuilding: {str(e)}")
+            self.entries = {}
+
+    def save(self):
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, indent=2)
+            os.replace(self.path + ".tmp", self.path)
+        except Exception as e:
+            logger.error(f"Error saving instructions index: {str(e)}")
+
+    def owns(self, file_path: str) -> bool:
+        return os.path.dirname(os.path.abspath(file_path)) == os.path.abspath(self.folder)
+
+    def journal_stat(self, file_path: str) -> Tuple[int, int]:
+        """mtime and size of the plan's progress journal, (None, None) if it has none"""
+        try:
+            stat = os.stat(ProgressJournal(file_path).path)
+        except FileNotFoundError:
+            return None, None
+        return stat.st_mtime_ns, stat.st_size
+
+    def summarize(self, file_path: str, stat: os.stat_result, instructions: dict, created: float = None) -> dict:
+        entry = {field: instructions.get(field) for field in SUMMARY_FIELDS}
+        entry["mtime"] = stat.st_mtime_ns
+        entry["size"] = stat.st_size
+        entry["journal_mtime"], entry["journal_size"] = self.journal_stat(file_path)
+        entry["created"] = created if created is not None else stat.st_ctime
+        return entry
+
+    def is_current(self, entry: dict, file_path: str, stat: os.stat_result) -> bool:
+        """Whether an entry still matches the plan and its journal on disk"""
+        return (
+            entry.get("mtime") == stat.st_mtime_ns
+            and entry.get("size") == stat.st_size
+            and (entry.get("journal_mtime"), entry.get("journal_size")) == self.journal_stat(file_path)
+        )
+
+    def update(self, file_path: str, instructions: dict):
+        """Record the summary of a plan that was just written or traded"""
+        if not self.owns(file_path):
+            return
+        with self.lock:
+            self.update_entry(file_path, instructions)
+
+    def update_entry(self, file_path: str, instructions: dict):
+        if not self.loaded:
+            self.load()
+        name = os.path.basename(file_path)
+        try:
+            created = self.entries.get(name, {}).get("created")
+            self.entries[name] = self.summarize(file_path, os.stat(file_path), instructions, created)
+        except OSError as e:
+            logger.error(f"Error indexing {name}: {str(e)}")
+            return
+        self.save()
+
+    def rebuild_entry(self, name: str, stat: os.stat_result, created: float = None) -> dict:
+        file_path = os.path.join(self.folder, name)
+        if is_streaming_plan(file_path):
+            return self.summarize(file_path, stat, StreamingPlan(file_path).load(), created)
+        with open(file_path, "r") as f:
+            instructions = json.load(f)
+        ProgressJournal(file_path).replay(instructions)
+        return self.summarize(file_path, stat, instructions, created)
+
+    def listing(self) -> List[Tuple[str, dict]]:
+        """Summaries of all plans in the folder, newest first"""
+        if not self.loaded:
+            self.load()
+
+        listed = {}
+        changed = False
+        with os.scandir(self.folder) as entries:
+            for item in entries:
+                is_plan = item.name.endswith(".json") or is_streaming_plan(item.name)
+                if not is_plan or item.name.startswith(".") or not item.is_file():
+                    continue
+                stat = item.stat()
+                entry = self.entries.get(item.name)
+                if entry is None or not self.is_current(entry, item.path, stat):
+                    try:
+                        entry = self.rebuild_entry(item.name, stat, entry.get("created") if entry else None)
+                    except Exception as e:
+                        logger.error(f"Error reading file {item.name}: {e}")
+                        continue
+                    changed = True
+                listed[item.name] = entry
+
+        if changed or listed.keys() != self.entries.keys():
+            self.entries = listed
+            self.save()
+
+        return sorted(listed.items(), key=lambda item: item[1]["created"], reverse=True)
+
+
+instructions_index = InstructionsIndex()
@@ -0,0 +1,99 @@
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional
+from loguru import logger
+
+
+class KeyExportWriter:
+    """
+    Deduplicated, append-only writer of data/exported_wallets.txt.
+
+    The file is read once by load() and kept as a session_name -> line map, so already exported
+    sessions can be skipped before connecting to Telegram. New lines are queued and appended by a
+    single writer task in batches; the file is fsynced at most every `fsync_interval` seconds and
+    once more on stop().
+    """
+
+    def __init__(self, path: str = "data/exported_wallets.txt", batch_size: int = 100, fsync_interval: float = 1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.fsync_interval = fsync_interval
+        self.exported: Dict[str, str] = {}
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        self.last_fsync = 0.0
+
+    def load(self):
+        """Read the sessions that already have an exported key"""
+        self.exported = {}
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                # username:session_name:private_key:address
+                parts = line.strip().split(":")
+                if len(parts) >= 4:
+                    self.exported[parts[1]] = line
+
+    def is_exported(self, session_name: str) -> bool:
+        return session_name in self.exported
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    async def start(self):
+        await asyncio.to_thread(self.load)
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self.run())
+
+    async def write(self, session_name: str, line: str) -> bool:
+        """Queue a line for the session, returns False if the session was already exported"""
+        if session_name in self.exported:
+            return False
+        self.exported[session_name] = line
+        await self.queue.put(line)
+        return True
+
+    async def run(self):
+        while True:
+            line = await self.queue.get()
+            if line is None:
+                return
+            batch = [line]
+            stop = False
+            while len(batch) < self.batch_size and not self.queue.empty():
+                line = self.queue.get_nowait()
+                if line is None:
+                    stop = True
+                    break
+                batch.append(line)
+            try:
+                await asyncio.to_thread(self.append, batch)
+            except Exception as e:
+                logger.error(f"Error writing exported keys to {self.path}: {str(e)}")
+            if stop:
+                return
+
+    def append(self, lines: List[str]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(lines))
+            f.flush()
+            if time.monotonic() - self.last_fsync >= self.fsync_interval:
+                os.fsync(f.fileno())
+                self.last_fsync = time.monotonic()
+
+    def sync(self):
+        if os.path.exists(self.path):
+            with open(self.path, "a", encoding="utf-8") as f:
+                os.fsync(f.fileno())
+
+    async def stop(self):
+        """Write out queued lines and fsync the file"""
+        if self.task is None:
+            return
+        await self.queue.put(None)
+        await self.task
+        self.task = None
+        await asyncio.to_thread(self.sync)
@@ -0,0 +1,111 @@
+import json
+import sys
+from typing import Dict
+from loguru import logger
+
+from config import LOG_LEVEL, LOG_MODULE_LEVELS, LOG_JSON
+from src.utils.tracing import current_span
+
+
+JSON_FIELDS = ("session", "trade_id", "step", "latency_ms")
+
+
+class ModuleLevelFilter:
+    """
+    Per-module minimum levels on top of a default one.
+
+    A record passes if its level is at least the level of the longest matching module prefix in
+    `levels` (e.g. "src.trade" also covers "src.trade.anything"), or the default level otherwise.
+    The result of the prefix lookup is cached per module.
+    """
+
+    def __init__(self, default: str, levels: Dict[str, str]):
+        self.default = logger.level(default).no
+        self.levels = {module: logger.level(level).no for module, level in levels.items()}
+        self.cache: Dict[str, int] = {}
+
+    @property
+    def min_level(self) -> int:
+        return min([self.default, *self.levels.values()])
+
+    def level_of(self, module: str) -> int:
+        level = self.cache.get(module)
+        if level is None:
+            level = self.default
+            matched = ""
+            for prefix, prefix_level in self.levels.items():
+                if (module == prefix or module.startswith(prefix + ".")) and len(prefix) > len(matched):
+                    level, matched = prefix_level, prefix
+            self.cache[module] = level
+        return level
+
+    def __call__(self, record) -> bool:
+        return record["level"].no >= self.level_of(record["name"] or "")
+
+
+def add_span_fields(record):
+    """Fill session, trade_id and step of a record from the current trace span unless bound explicitly"""
+    span = current_span()
+    if span is None:
+        return
+    extra = record["extra"]
+    extra.setdefault("step", span.step)
+    for tag in ("session", "trade_id"):
+        if tag in span.tags:
+            extra.setdefault(tag, span.tags[tag])
+
+
+def json_format(record) -> str:
+    entry = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "module": record["name"],
+        "line": record["line"],
+        "message": record["message"],
+    }
+    for field in JSON_FIELDS:
+        entry[field] = record["extra"].get(field)
+    record["extra"]["json"] = json.dumps(entry, ensure_ascii=False)
+    return "{extra[json]}\n"
+
+
+def setup_logging(console=sys.stdout):
+    """
+    Console and data/logs/app.log sinks, plus data/logs/app.jsonl when LOG_JSON is on.
+
+    All sinks are queued (enqueue=True): logging calls only put the record on a queue and a
+    background thread does the writing, so they never block the event loop on file I/O.
+    """
+    logger.remove()
+    level_filter = ModuleLevelFilter(LOG_LEVEL, LOG_MODULE_LEVELS)
+
+    logger.add(
+        console,
+        colorize=True,
+        format="<light-cyan>{time:HH:mm:ss:SSS}</light-cyan> | <level>{level: <8}</level> | <white>{file}:{line}</white> | <white>{message}</white>",
+        level=level_filter.min_level,
+        filter=level_filter,
+        enqueue=True,
+    )
+    logger.add(
+        "data/logs/app.log",
+        rotation="100 MB",
+        format="{time:YYYY-MM-DD HH:mm:ss:SSS} | {level: <8} | {file}:{line} | {message}",
+        encoding="utf-8",
+        level=level_filter.min_level,
+        filter=level_filter,
+        enqueue=True,
+    )
+    if LOG_JSON:
+        # Span fields are read from the context of the logging call, before the record is queued
+        logger.configure(patcher=add_span_fields)
+        logger.add(
+            "data/logs/app.jsonl",
+            rotation="100 MB",
+            format=json_format,
+            encoding="utf-8",
+            level="TRACE",
+            # Finished trace spans (TRACE, with latency_ms) go to this sink only
+            filter=lambda record: level_filter(record) or record["extra"].get("latency_ms") is not None,
+            enqueue=True,
+        )
@@ -0,0 +1,97 @@
+import re
+from dataclasses import dataclass
+from enum import Enum
+from typing import TYPE_CHECKING, Dict, FrozenSet, Optional
+from src.utils.confirmation_messages import (
+    SETTINGS_MESSAGE,
+    CLAN_REGISTRATION_MESSAGE,
+    WALLET_MESSAGE,
+    NEVER_SHARE_PRIVATE_KEY_MESSAGE,
+    PRIVATE_KEY_MESSAGE,
+    TICKER_MESSAGE,
+    CHOOSE_LEVERAGE_MESSAGE,
+    CHOOSE_POSITION_SIZE_MESSAGE,
+    CONFIRM_POSITION_MESSAGE,
+    ORDER_PLACED_MESSAGE,
+    CLOSE_POSITION_MESSAGE,
+    NO_POSITIONS_MESSAGE,
+    CHOOSE_PERCENTAGE_MESSAGE,
+    CLOSED_POSITION_MESSAGE,
+)
+
+if TYPE_CHECKING:
+    import pyrogram
+
+
+class BotState(Enum):
+    """Screens of the bot conversation, the value is the text that identifies the screen"""
+    SETTINGS = SETTINGS_MESSAGE
+    CLAN_REGISTRATION = CLAN_REGISTRATION_MESSAGE
+    WALLET = WALLET_MESSAGE
+    NEVER_SHARE_PRIVATE_KEY = NEVER_SHARE_PRIVATE_KEY_MESSAGE
+    PRIVATE_KEY = PRIVATE_KEY_MESSAGE
+    TICKER = TICKER_MESSAGE
+    CHOOSE_LEVERAGE = CHOOSE_LEVERAGE_MESSAGE
+    CHOOSE_POSITION_SIZE = CHOOSE_POSITION_SIZE_MESSAGE
+    CONFIRM_POSITION = CONFIRM_POSITION_MESSAGE
+    ORDER_PLACED = ORDER_PLACED_MESSAGE
+    CLOSE_POSITION = CLOSE_POSITION_MESSAGE
+    NO_POSITIONS = NO_POSITIONS_MESSAGE
+    CHOOSE_PERCENTAGE = CHOOSE_PERCENTAGE_MESSAGE
+    CLOSED_POSITION = CLOSED_POSITION_MESSAGE
+
+
+# Substring search runs in C and beats a regex alternation over the same texts by an order of
+# magnitude; an alternation would also miss a screen text that overlaps another match. So the
+# classifier is a precomputed table of screen texts checked once per message
+STATE_MARKERS = tuple((state, state.value) for state in BotState)
+LABEL_SEPARATORS = re.compile(r"[^\w%.]+")
+
+
+def classify(text: Optional[str]) -> FrozenSet[BotState]:
+    """Screens whose text appears in a message, usually exactly one"""
+    if not text:
+        return frozenset()
+    return frozenset(state for state, marker in STATE_MARKERS if marker in text)
+
+
+def normalize_label(label: str) -> str:
+    """Lowercase a button label and drop emoji and punctuation: "✅ Confirm" -> "confirm" """
+    return LABEL_SEPARATORS.sub(" ", label.lower()).strip()
+
+
+class Keyboard:
+    """label -> callback_data index of a message's inline keyboard"""
+
+    def __init__(self, reply_markup=None):
+        self.buttons: Dict[str, str | bytes] = {}
+        for row in getattr(reply_markup, "inline_keyboard", None) or []:
+            for button in row:
+                if button.callback_data is not None:
+                    self.buttons.setdefault(normalize_label(button.text), button.callback_data)
+
+    def find(self, label: str) -> Optional[str | bytes]:
+        """callback_data of the button with this label, or of the first one containing it"""
+        key = normalize_label(label)
+        callback_data = self.buttons.get(key)
+        if callback_data is None:
+            callback_data = next((data for text, data in self.buttons.items() if key in text), None)
+        return callback_data
+
+    def __bool__(self) -> bool:
+        return bool(self.buttons)
+
+
+@dataclass
+class BotMessage:
+    """A bot message with its screens and keyboard index, parsed once when it arrives"""
+    message: "pyrogram.types.Message"
+    states: FrozenSet[BotState]
+    keyboard: Keyboard
+
+    def __contains__(self, state: BotState) -> bool:
+        return state in self.states
+
+
+def parse_message(message) -> BotMessage:
+    return BotMessage(message, classify(message.text), Keyboard(message.reply_markup))
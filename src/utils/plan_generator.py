@@ -0,0 +1,334 @@
+"""
+NumPy implementation of the instructions generator.
+
+Splits, weights and volumes of all trades are sampled as (trades x accounts) matrices, one batch per
+group size, instead of building every trade with Python loops. The output has the same schema as
+src/utils/instractions.py always produced.
+"""
+import math
+from datetime import datetime
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+from loguru import logger
+
+from config import (
+    VOLUME_RANGE,
+    TRADES_COUNT_RANGE,
+    DISPERSION_RANGE_PERCENT,
+    TICKERS,
+    ACCOUNT_DISTRIBUTION_IMBALANCE,
+    MIN_VOLUME_PER_ACCOUNT,
+)
+from src.utils.progress_journal import count_completed
+
+
+# Plans carry volumes with up to 8 decimal places
+UNITS = 10 ** 8
+
+
+def round_random(values: np.ndarray, rng: np.random.Generator, floor: bool = False) -> np.ndarray:
+    """Round every value to a random precision of 2 to 8 decimal places"""
+    scale = 10.0 ** rng.integers(2, 9, size=values.shape)
+    rounded = np.floor(values * scale) if floor else np.round(values * scale)
+    # k / 10**p is the double nearest to the decimal, so the JSON stays short
+    return rounded / scale
+
+
+def long_count_range(accounts_count: int) -> Tuple[int, int]:
+    """
+    Range of long side sizes allowed by ACCOUNT_DISTRIBUTION_IMBALANCE that keep every account at or
+    above MIN_VOLUME_PER_ACCOUNT for any sampled volume. Raises ValueError if it is empty.
+    """
+    mid_point = accounts_count // 2
+    max_deviation = max(1, int(accounts_count * ACCOUNT_DISTRIBUTION_IMBALANCE / 2))
+    low = max(1, mid_point - max_deviation)
+    high = min(accounts_count - 1, mid_point + max_deviation)
+
+    min_base = VOLUME_RANGE[0]
+    min_counter = VOLUME_RANGE[0] * (1 + DISPERSION_RANGE_PERCENT[0])
+    high = min(high, math.floor(min_base / MIN_VOLUME_PER_ACCOUNT))
+    low = max(low, accounts_count - math.floor(min_counter / MIN_VOLUME_PER_ACCOUNT))
+    if low > high:
+        raise ValueError(
+            f"VOLUME_RANGE {VOLUME_RANGE} is too low to give each of {accounts_count} accounts at least "
+            f"{MIN_VOLUME_PER_ACCOUNT}. Please increase VOLUME_RANGE, TRADE_GROUPS_COUNT or decrease MIN_VOLUME_PER_ACCOUNT"
+        )
+    return low, high
+
+
+def fill_under_caps(weights: np.ndarray, totals: np.ndarray, caps: np.ndarray) -> np.ndarray:
+    """Row-wise split of totals proportional to weights (0 outside the side) with no cell above its cap"""
+    shares = np.zeros_like(weights)
+    fixed = np.zeros(weights.shape, dtype=bool)
+    remaining = totals.astype(float)
+    for _ in range(weights.shape[1]):
+        free_weights = np.where(fixed, 0.0, weights)
+        weight_sums = free_weights.sum(axis=1, keepdims=True)
+        weight_sums[weight_sums == 0] = 1.0
+        provisional = remaining[:, None] * free_weights / weight_sums
+        over = (free_weights > 0) & (provisional > caps)
+        if not over.any():
+            return np.where(fixed, shares, provisional)
+        shares = np.where(over, caps, shares)
+        remaining -= np.where(over, caps, 0.0).sum(axis=1)
+        fixed |= over
+    return shares
+
+
+def floor_units(values: np.ndarray) -> np.ndarray:
+    """Values floored to whole 1e-8 units, the finest precision written to a plan"""
+    units = np.floor(np.where(np.isfinite(values), values, 0.0) * UNITS)
+    # values * UNITS can round up onto the next integer, step back where the unit is above the value
+    units -= units / UNITS > values
+    return units.astype(np.int64)
+
+
+def split_side(totals: np.ndarray, side: np.ndarray, caps: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Random volumes of one side of every trade that add up to totals, none above its cap"""
+    weights = np.where(side, 1.0 - rng.random(side.shape), 0.0)
+    rows = np.arange(len(totals))
+    if not np.isfinite(caps).any():
+        shares = totals[:, None] * weights / weights.sum(axis=1, keepdims=True)
+        volumes = np.where(side, round_random(shares, rng), 0.0)
+        # One account per trade takes the rounding remainder
+        takers = weights.argmax(axis=1)
+        volumes[rows, takers] = np.round((volumes[rows, takers] + totals - volumes.sum(axis=1)) * UNITS) / UNITS
+        return volumes
+
+    # Capped sides are split in whole 1e-8 units, so every leg stays at or below its cap once written
+    cap_units = np.where(side & np.isfinite(caps), floor_units(caps), np.iinfo(np.int64).max // (2 * side.shape[1]))
+    cap_units = np.where(side, cap_units, 0)
+    total_units = np.minimum(np.round(totals * UNITS).astype(np.int64), cap_units.sum(axis=1))
+    shares = fill_under_caps(weights, total_units / UNITS, np.where(np.isfinite(caps), cap_units / UNITS, caps))
+    units = np.minimum(np.round(round_random(shares, rng, floor=True) * UNITS).astype(np.int64), cap_units)
+    units = np.where(side, units, 0)
+
+    # A float overshoot of the floored parts is taken back from the largest leg
+    remainder = total_units - units.sum(axis=1)
+    largest = units.argmax(axis=1)
+    units[rows, largest] += np.minimum(remainder, 0)
+    remainder = np.maximum(remainder, 0)
+
+    # The rounding remainder goes to the accounts with the most headroom, never past their caps
+    headroom = cap_units - units
+    by_headroom = np.argsort(-headroom, axis=1, kind="stable")
+    sorted_headroom = np.take_along_axis(headroom, by_headroom, axis=1)
+    taken_before = np.cumsum(sorted_headroom, axis=1) - sorted_headroom
+    extra = np.clip(remainder[:, None] - taken_before, 0, sorted_headroom)
+    np.put_along_axis(units, by_headroom, np.take_along_axis(units, by_headroom, axis=1) + extra, axis=1)
+    return units / UNITS
+
+
+def sample_trades(groups: List[List[str]], trades_count: int, capacities: Dict[str, float],
+                  rng: np.random.Generator) -> List[List[Dict]]:
+    """Sample trades_count trades for every group, all groups have the same size"""
+    accounts_count = len(groups[0])
+    low, high = long_count_range(accounts_count)
+    # Row r is trade r % trades_count of group r // trades_count
+    rows_count = len(groups) * trades_count
+
+    base = round_random(rng.uniform(VOLUME_RANGE[0], VOLUME_RANGE[1], rows_count), rng)
+    counter = round_random(base * (1 + rng.uniform(*DISPERSION_RANGE_PERCENT, rows_count)), rng)
+    long_counts = rng.integers(low, high + 1, rows_count)
+
+    # Every row is a random order of the group's accounts, the first long_counts of them go long
+    order = rng.permuted(np.tile(np.arange(accounts_count), (rows_count, 1)), axis=1)
+    is_long = np.arange(accounts_count)[None, :] < long_counts[:, None]
+    is_short = ~is_long
+
+    caps = np.full((rows_count, accounts_count), np.inf)
+    if capacities:
+        group_caps = np.array([[capacities.get(name, np.inf) for name in group] for group in groups])
+        caps = np.take_along_axis(np.repeat(group_caps, trades_count, axis=0), order, axis=1)
+        # Shrink the trades so both sides fit into the margin of their accounts, as written to the plan
+        written_caps = np.where(np.isfinite(caps), floor_units(caps) / UNITS, caps)
+        long_limit = np.where(is_long, written_caps, 0.0).sum(axis=1)
+        short_limit = np.where(is_short, written_caps, 0.0).sum(axis=1)
+        limit = np.minimum(long_limit, short_limit)
+        shrink = base > limit
+        if shrink.any():
+            base = np.where(shrink, np.floor(limit * rng.uniform(0.95, 1, rows_count) * 100) / 100, base)
+            counter = np.where(
+                shrink, round_random(base * (1 + rng.uniform(*DISPERSION_RANGE_PERCENT, rows_count)), rng), counter
+            )
+        counter = np.minimum(counter, short_limit)
+
+    long_volumes = split_side(base, is_long, caps, rng)
+    short_volumes = split_side(counter, is_short, caps, rng)
+    pairs = rng.choice(TICKERS, rows_count)
+
+    # Volumes too small for MIN_VOLUME_PER_ACCOUNT can only come from margin caps
+    feasible = (
+        (base / long_counts >= MIN_VOLUME_PER_ACCOUNT)
+        & (counter / (accounts_count - long_counts) >= MIN_VOLUME_PER_ACCOUNT)
+    ).tolist()
+
+    trades = []
+    order, long_counts = order.tolist(), long_counts.tolist()
+    long_volumes, short_volumes = long_volumes.tolist(), short_volumes.tolist()
+    for r, (base_volume, counter_volume, pair) in enumerate(zip(base.tolist(), counter.tolist(), pairs.tolist())):
+        if not feasible[r]:
+            trades.append(None)
+            continue
+        names = groups[r // trades_count]
+        long_count = long_counts[r]
+        row = order[r]
+        trades.append({
+            "pair": pair,
+            "completed": False,
+            "long": {
+                "accounts": [
+                    {"telegram": names[row[j]], "volume": long_volumes[r][j]} for j in range(long_count)
+                ],
+                "total_long_side_volume": base_volume
+            },
+            "short": {
+                "accounts": [
+                    {"telegram": names[row[j]], "volume": short_volumes[r][j]} for j in range(long_count, accounts_count)
+                ],
+                "total_short_side_volume": counter_volume
+            },
+            "total_volume": base_volume + counter_volume
+        })
+    return [trades[g * trades_count:(g + 1) * trades_count] for g in range(len(groups))]
+
+
+def split_groups(accounts: List[Dict], groups_count: int, rng: np.random.Generator) -> List[List[str]]:
+    """Shuffle the accounts into groups_count disjoint groups and check that every group can trade"""
+    names = [account["session_name"] for account in accounts]
+    groups_count = max(1, min(groups_count, len(names) // 2))
+    shuffled = rng.permutation(len(names)).tolist()
+    groups = [[names[index] for index in shuffled[group::groups_count]] for group in range(groups_count)]
+    for size in {len(group) for group in groups}:
+        long_count_range(size)
+    return groups
+
+
+def build_plan(accounts: List[Dict], groups_count: int, capacities: Dict[str, float] = None,
+               trades_count: int = None, seed: int = None) -> Dict:
+    """Build instructions for the accounts split into groups_count disjoint groups"""
+    rng = np.random.default_rng(seed)
+    if trades_count is None:
+        trades_count = int(rng.integers(TRADES_COUNT_RANGE[0], TRADES_COUNT_RANGE[1] + 1))
+
+    # Check every group size before sampling anything
+    groups = split_groups(accounts, groups_count, rng)
+    sizes = sorted({len(group) for group in groups})
+
+    # Groups differ in size by at most one account, so this is one or two batches
+    per_group = [None] * len(groups)
+    for size in sizes:
+        numbers = [number for number, group in enumerate(groups) if len(group) == size]
+        for number, trades in zip(numbers, sample_trades([groups[n] for n in numbers], trades_count, capacities, rng)):
+            per_group[number] = trades
+
+    instructions = {
+        "total_trades": 0,
+        "total_trades_completed": 0,
+        "total_volume": 0,
+        "total_volume_completed": 0,
+        "last_trade_time": 0,
+        "start_time": datetime.now().isoformat(),
+        "completed": False,
+        "groups": len(groups),
+        "trades": {}
+    }
+
+    total_volume = 0
+    skipped = 0
+    for i in range(trades_count):
+        for group_number, trades in enumerate(per_group, 1):
+            trade = trades[i]
+            if trade is None:
+                skipped += 1
+                continue
+            trade["group"] = group_number
+            instructions["trades"][f"trade{len(instructions['trades']) + 1}"] = trade
+            total_volume += trade["total_volume"]
+
+    if not instructions["trades"]:
+        raise ValueError(f"Available margin is too low to give each account at least {MIN_VOLUME_PER_ACCOUNT}")
+    instructions["total_trades"] = len(instructions["trades"])
+    instructions["total_volume"] = round(total_volume, 8)
+    if skipped:
+        logger.warning(f"Skipped {skipped} trade(s) whose accounts lack the margin for {MIN_VOLUME_PER_ACCOUNT} each")
+    return instructions
+
+
+class TradeGenerator:
+    """
+    Endless instructions for CYCLE_MODE: the next trade of a group is sampled right before it runs.
+
+    Trades are produced by the same sampling as build_plan, one at a time per group, and only the
+    trade each group is currently running is remembered, so memory does not grow with the number
+    of trades. `summary` has the counters of a plan header and is updated by checkpoint().
+    """
+
+    # Consecutive trades a group may fail to fit into its margin before it stops
+    MAX_SKIPPED = 100
+
+    def __init__(self, accounts: List[Dict], groups_count: int, capacities: Dict[str, float] = None,
+                 limit: int = None, seed: int = None):
+        self.rng = np.random.default_rng(seed)
+        self.groups = split_groups(accounts, groups_count, self.rng)
+        self.capacities = capacities
+        self.limit = limit
+        self.generated = 0
+        # group number -> (trade_id, total_volume) of the trade it is running
+        self.running: Dict[int, Tuple[str, float]] = {}
+        self.summary = {
+            "total_trades": 0,
+            "total_trades_completed": 0,
+            "total_volume": 0,
+            "total_volume_completed": 0,
+            "last_trade_time": 0,
+            "start_time": datetime.now().isoformat(),
+            "completed": False,
+            "groups": len(self.groups),
+            "sessions": sorted(name for group in self.groups for name in group),
+            "cycle": True,
+        }
+
+    @property
+    def sessions(self) -> set:
+        return set(self.summary["sessions"])
+
+    def exclude(self, sessions: set):
+        """Leave sessions out of the trades generated from now on"""
+        self.groups = [[name for name in group if name not in sessions] for group in self.groups]
+        self.summary["sessions"] = sorted(name for group in self.groups for name in group)
+
+    def trades(self, group_number: int) -> Iterator[Tuple[str, Dict]]:
+        """Yield (trade_id, trade) for a group until the limit, if any, is reached"""
+        group = self.groups[group_number - 1]
+        if len(group) < 2:
+            logger.error(f"Group {group_number} has fewer than 2 accounts left, stopping it")
+            return
+        skipped = 0
+        while self.limit is None or self.generated < self.limit:
+            trade = sample_trades([group], 1, self.capacities, self.rng)[0][0]
+            if trade is None:
+                skipped += 1
+                if skipped >= self.MAX_SKIPPED:
+                    logger.error(f"Group {group_number} lacks the margin for {MIN_VOLUME_PER_ACCOUNT} per account, stopping it")
+                    return
+                continue
+            skipped = 0
+            self.generated += 1
+            trade_id = f"trade{self.generated}"
+            trade["group"] = group_number
+            self.running[group_number] = (trade_id, trade["total_volume"])
+            self.summary["total_trades"] = self.generated
+            self.summary["total_volume"] = round(self.summary["total_volume"] + trade["total_volume"], 8)
+            yield trade_id, trade
+
+    def checkpoint(self, trade_id: str, timestamp: float = None):
+        """Count a completed trade in the summary"""
+        for group_number, (running_id, volume) in list(self.running.items()):
+            if running_id == trade_id:
+                del self.running[group_number]
+                count_completed(self.summary, volume, timestamp)
+                # Only a limited run can complete
+                self.summary["completed"] = self.limit is not None and self.summary["total_trades_completed"] >= self.limit
+                return
@@ -0,0 +1,137 @@
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+from loguru import logger
+from src.utils.progress_journal import ProgressJournal, count_completed
+
+
+def is_streaming_plan(file_path: str) -> bool:
+    """Line-delimited plans end with .jsonl, progress journals of any plan are not plans"""
+    return file_path.endswith(".jsonl") and not file_path.endswith(".journal.jsonl")
+
+
+def plan_header(instructions: dict) -> dict:
+    """Everything of a plan except its trades, plus the sessions the trades use"""
+    header = {key: value for key, value in instructions.items() if key != "trades"}
+    header["sessions"] = sorted({
+        account["telegram"]
+        for trade in instructions["trades"].values()
+        for side in ("long", "short")
+        for account in trade[side]["accounts"]
+    })
+    return header
+
+
+class StreamingPlan:
+    """
+    Instructions stored as one header line followed by one trade per line.
+
+    Trades are never loaded all at once: the offsets index (next to the plan) records the byte
+    offset, group and volume of every trade, so completed trades are skipped without reading them
+    and pending ones are read with a single seek when they are due. The plan file is written once;
+    progress lives in its journal, which load() replays onto the header counters.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index_path = os.path.splitext(path)[0] + ".offsets"
+        self.journal = ProgressJournal(path)
+        self.header: dict = {}
+        # [trade_id, group, offset, total_volume, completed] in plan order
+        self.entries: List[list] = []
+        self.volumes: Dict[str, float] = {}
+        self.completed = set()
+
+    @staticmethod
+    def write(path: str, instructions: dict):
+        """Write a plan in the line-delimited format together with its offsets index"""
+        entries = []
+        with open(path + ".tmp", "wb") as f:
+            f.write(json.dumps(plan_header(instructions)).encode("utf-8") + b"\n")
+            for trade_id, trade in instructions["trades"].items():
+                entries.append([trade_id, trade.get("group", 1), f.tell(), trade.get("total_volume", 0),
+                                trade.get("completed", False)])
+                f.write(json.dumps({"trade_id": trade_id, **trade}).encode("utf-8") + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        StreamingPlan(path).write_index(entries)
+
+    def write_index(self, entries: List[list]):
+        stat = os.stat(self.path)
+        with open(self.index_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"mtime": stat.st_mtime_ns, "size": stat.st_size, "entries": entries}, f)
+        os.replace(self.index_path + ".tmp", self.index_path)
+
+    def read_index(self) -> Optional[List[list]]:
+        """Offsets index of the plan, None if it is missing or was written for another version of the plan"""
+        if not os.path.exists(self.index_path):
+            return None
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except Exception as e:
+            logger.error(f"Error reading {self.index_path}, rebuilding: {str(e)}")
+            return None
+        stat = os.stat(self.path)
+        if index.get("mtime") != stat.st_mtime_ns or index.get("size") != stat.st_size:
+            return None
+        return index["entries"]
+
+    def build_index(self) -> List[list]:
+        """Scan the plan once to rebuild its offsets index"""
+        entries = []
+        with open(self.path, "rb") as f:
+            f.readline()
+            while True:
+                offset = f.tell()
+                line = f.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                trade = json.loads(line)
+                entries.append([trade["trade_id"], trade.get("group", 1), offset, trade.get("total_volume", 0),
+                                trade.get("completed", False)])
+        self.write_index(entries)
+        return entries
+
+    def load(self) -> dict:
+        """Read the header and offsets index and replay the journal, returns the header"""
+        with open(self.path, "rb") as f:
+            self.header = json.loads(f.readline())
+        self.entries = self.read_index()
+        if self.entries is None:
+            self.entries = self.build_index()
+        self.volumes = {entry[0]: entry[3] for entry in self.entries}
+        self.completed = {entry[0] for entry in self.entries if entry[4]}
+        for record in self.journal.read():
+            self.checkpoint(record["trade_id"], record["time"])
+        return self.header
+
+    @property
+    def sessions(self) -> set:
+        return set(self.header.get("sessions", []))
+
+    def checkpoint(self, trade_id: str, timestamp: float = None):
+        """Mark a trade completed in the header counters"""
+        if trade_id in self.completed:
+            return
+        self.completed.add(trade_id)
+        count_completed(self.header, self.volumes.get(trade_id, 0), timestamp)
+
+    def groups(self) -> Dict[int, List[Tuple[str, int]]]:
+        """(trade_id, offset) of the pending trades of every group, in plan order"""
+        groups: Dict[int, List[Tuple[str, int]]] = {}
+        for trade_id, group, offset, _, _ in self.entries:
+            if trade_id not in self.completed:
+                groups.setdefault(group, []).append((trade_id, offset))
+        return groups
+
+    def read_trade(self, offset: int) -> dict:
+        """Read the trade starting at a byte offset"""
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            trade = json.loads(f.readline())
+        trade.pop("trade_id", None)
+        return trade
@@ -0,0 +1,96 @@
+import asyncio
+import itertools
+import json
+import os
+import threading
+import time
+from typing import Dict, List
+from loguru import logger
+
+
+class PositionLedger:
+    """
+    Which session holds an open position on which pair.
+
+    Updated from open-leg fills and successful closes and persisted to a JSON file, so a restart
+    still knows which positions are open. Trades that have started but not been checkpointed are
+    kept in `trades` with their phase ("open" until every close was attempted, then "closed"),
+    so a restart can tell at which phase a trade was interrupted.
+    """
+
+    def __init__(self, path: str = "data/positions.json"):
+        self.path = path
+        self.positions: Dict[str, Dict[str, dict]] = {}
+        self.trades: Dict[str, dict] = {}
+        self.write_lock = threading.Lock()
+        # Snapshots are numbered on the loop, a write thread that lost the race to a newer one skips
+        self.snapshots = itertools.count(1)
+        self.written = 0
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.error(f"Error reading position ledger {self.path}: {str(e)}")
+            return
+        if "positions" in data and isinstance(data.get("trades"), dict):
+            self.positions, self.trades = data["positions"], data["trades"]
+        else:
+            # Ledgers written before trades were tracked only hold positions
+            self.positions = data
+
+    def open(self, session_name: str, pair: str, side: str, volume: float, trade_id: str = None):
+        self.positions.setdefault(session_name, {})[pair] = {
+            "side": side,
+            "volume": volume,
+            "trade_id": trade_id,
+            "opened_at": time.time(),
+        }
+
+    def close(self, session_name: str, pair: str):
+        pairs = self.positions.get(session_name, {})
+        pairs.pop(pair, None)
+        if not pairs:
+            self.positions.pop(session_name, None)
+
+    def start_trade(self, trade_id: str, pair: str, sessions: List[str]):
+        self.trades[trade_id] = {"pair": pair, "sessions": sessions, "phase": "open", "started_at": time.time()}
+
+    def set_phase(self, trade_id: str, phase: str):
+        if trade_id in self.trades:
+            self.trades[trade_id]["phase"] = phase
+
+    def finish_trade(self, trade_id: str):
+        self.trades.pop(trade_id, None)
+
+    def holders(self, pair: str) -> List[str]:
+        """Sessions with an open position on pair"""
+        return [session_name for session_name, pairs in self.positions.items() if pair in pairs]
+
+    def is_open(self, session_name: str, pair: str) -> bool:
+        return pair in self.positions.get(session_name, {})
+
+    def write(self, snapshot: str, number: int = None):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self.write_lock:
+            if number is not None:
+                if number < self.written:
+                    return
+                self.written = number
+            with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(snapshot)
+            os.replace(self.path + ".tmp", self.path)
+
+    async def save(self):
+        """Persist the ledger atomically, off the event loop"""
+        try:
+            snapshot = json.dumps({"positions": self.positions, "trades": self.trades}, indent=2)
+            await asyncio.to_thread(self.write, snapshot, next(self.snapshots))
+        except Exception as e:
+            logger.error(f"Error saving position ledger {self.path}: {str(e)}")
@@ -0,0 +1,83 @@
+import asyncio
+import json
+import os
+from datetime import datetime
+from loguru import logger
+
+
+class ProgressJournal:
+    """
+    Append-only log of completed trades next to an instructions file.
+
+    Each checkpoint appends one JSON line and fsyncs it, so its cost does not depend on the size
+    of the plan. The plan file itself is only rewritten by compact(), atomically via a temporary
+    file, after which the journal is removed.
+    """
+
+    def __init__(self, plan_path: str):
+        self.plan_path = plan_path
+        self.path = os.path.splitext(plan_path)[0] + ".journal.jsonl"
+
+    def read(self) -> list:
+        """Return journal records, ignoring a torn last line left by a crash"""
+        if not os.path.exists(self.path):
+            return []
+        records = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning(f"Skipping damaged journal line in {self.path}")
+        return records
+
+    def replay(self, instructions: dict) -> dict:
+        """Apply journaled progress on top of the plan as loaded from disk"""
+        for record in self.read():
+            apply_checkpoint(instructions, record["trade_id"], record["time"])
+        return instructions
+
+    def write_line(self, line: str):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def append(self, trade_id: str, timestamp: float):
+        """Journal a completed trade, off the event loop"""
+        line = json.dumps({"trade_id": trade_id, "time": timestamp}) + "\n"
+        await asyncio.to_thread(self.write_line, line)
+
+    def write_plan(self, snapshot: str):
+        with open(self.plan_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(snapshot)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.plan_path + ".tmp", self.plan_path)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    async def compact(self, instructions: dict):
+        """Fold the journal into the plan file and drop the journal"""
+        await asyncio.to_thread(self.write_plan, json.dumps(instructions, indent=2))
+
+
+def apply_checkpoint(instructions: dict, trade_id: str, timestamp: float = None):
+    """Mark a trade completed in the in-memory plan"""
+    trade = instructions["trades"][trade_id]
+    if trade.get("completed"):
+        return
+    trade["completed"] = True
+    count_completed(instructions, trade.get("total_volume", 0), timestamp)
+
+
+def count_completed(summary: dict, volume: float, timestamp: float = None):
+    """Add a completed trade to the counters of a plan"""
+    summary["total_trades_completed"] = summary.get("total_trades_completed", 0) + 1
+    summary["total_volume_completed"] = round(summary.get("total_volume_completed", 0) + volume, 8)
+    summary["last_trade_time"] = timestamp or datetime.now().timestamp()
+    total_trades = summary.get("total_trades")
+    if total_trades is None:
+        total_trades = len(summary.get("trades", {}))
+    if summary["total_trades_completed"] >= total_trades:
+        summary["completed"] = True
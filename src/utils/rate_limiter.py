@@ -0,0 +1,138 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, List, Tuple, TypeVar
+from pyrogram.errors import FloodWait
+from loguru import logger
+
+from config import (
+    RATE_LIMIT_GLOBAL_PER_SECOND,
+    RATE_LIMIT_ACCOUNT_PER_SECOND,
+    RATE_LIMIT_ACCOUNT_BURST,
+    FLOOD_WAIT_MAX_RETRIES,
+)
+
+
+# Lower value is served first
+CLOSE_PRIORITY = 0
+DEFAULT_PRIORITY = 1
+
+_priority: ContextVar[int] = ContextVar("rate_limiter_priority", default=DEFAULT_PRIORITY)
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at rate tokens per second"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Seconds until one token is available"""
+        self.refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        while (delay := self.delay()) > 0:
+            await asyncio.sleep(delay)
+        self.tokens -= 1
+
+
+class RateLimiter:
+    """
+    Scheduler in front of every Telegram request sent to the bot.
+
+    Each request first takes a token from its account bucket and then from the global bucket.
+    The global bucket is handed out by priority, so close operations (see priority_lane) are
+    never queued behind new opens. FloodWait errors are slept out for exactly the time given by
+    the server and the request is retried.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = RATE_LIMIT_GLOBAL_PER_SECOND,
+        account_rate: float = RATE_LIMIT_ACCOUNT_PER_SECOND,
+        account_burst: float = RATE_LIMIT_ACCOUNT_BURST,
+        max_flood_retries: int = FLOOD_WAIT_MAX_RETRIES,
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.account_rate = account_rate
+        self.account_burst = account_burst
+        self.max_flood_retries = max_flood_retries
+        self.account_buckets: Dict[str, TokenBucket] = {}
+        self.queue: List[Tuple[int, int, asyncio.Future]] = []
+        self.counter = itertools.count()
+        self.dispatcher: asyncio.Task | None = None
+
+    @contextmanager
+    def priority_lane(self, priority: int = CLOSE_PRIORITY):
+        """Serve every request made inside the block with the given priority"""
+        token = _priority.set(priority)
+        try:
+            yield
+        finally:
+            _priority.reset(token)
+
+    def account_bucket(self, account: str) -> TokenBucket:
+        bucket = self.account_buckets.get(account)
+        if bucket is None:
+            bucket = TokenBucket(self.account_rate, self.account_burst)
+            self.account_buckets[account] = bucket
+        return bucket
+
+    async def dispatch(self):
+        """Hand out global tokens to queued requests in priority order"""
+        while self.queue:
+            delay = self.global_bucket.delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            _, _, future = heapq.heappop(self.queue)
+            # Waiters of a loop that was closed meanwhile can no longer be woken up
+            if future.done() or future.get_loop().is_closed():
+                continue
+            self.global_bucket.tokens -= 1
+            future.set_result(None)
+        self.dispatcher = None
+
+    async def acquire(self, account: str):
+        """Wait for a token from the account bucket and then from the global bucket"""
+        await self.account_bucket(account).acquire()
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.queue, (_priority.get(), next(self.counter), future))
+        # A dispatcher cancelled with its loop never resets itself, start a new one then
+        if self.dispatcher is None or self.dispatcher.done():
+            self.dispatcher = asyncio.create_task(self.dispatch())
+        await future
+
+    async def call(self, account: str, func: Callable[..., Awaitable[T]], *args, **kwargs) -> T:
+        """Run a Telegram request through the limiter, retrying after FloodWait"""
+        attempt = 0
+        while True:
+            await self.acquire(account)
+            try:
+                return await func(*args, **kwargs)
+            except FloodWait as e:
+                attempt += 1
+                if attempt > self.max_flood_retries:
+                    raise
+                logger.warning(f"{account} | FloodWait for {e.value} seconds, retry {attempt}/{self.max_flood_retries}")
+                await asyncio.sleep(e.value)
+
+
+rate_limiter = RateLimiter()
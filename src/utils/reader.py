@@ -1,13 +1,14 @@
 from dataclasses import dataclass
-from typing import List
+from typing import List, Optional, Tuple
 from loguru import logger
 import json
 import os
 import aiofiles
 from aiofiles.ospath import exists
 from datetime import datetime
-import questionary
-from questionary import Choice
+from src.utils.progress_journal import ProgressJournal
+from src.utils.plan_stream import StreamingPlan, is_streaming_plan
+from src.utils.instructions_index import instructions_index
 
 
 @dataclass
@@ -19,54 +20,57 @@ class Account:
     session_name: str
     proxy: str = None
 
-async def load_instructions():
-    """Load instructions interactively from available files"""
+def read_instructions(file_path: str) -> dict:
+    """Read an instructions file together with the progress journaled since it was last saved"""
+    if is_streaming_plan(file_path):
+        # Only the header of a line-delimited plan is read, Trade streams the trades themselves
+        instructions = StreamingPlan(file_path).load()
+        logger.info(f"Loaded instructions from {os.path.basename(file_path)}")
+        return instructions
+    with open(file_path, 'r') as f:
+        instructions = json.load(f)
+    # Progress of an interrupted run is kept in the journal until it is compacted
+    ProgressJournal(file_path).replay(instructions)
+    logger.info(f"Loaded instructions from {os.path.basename(file_path)}")
+    return instructions
+
+
+async def load_instructions() -> Tuple[dict, Optional[str]]:
+    """Load instructions interactively from available files, returns the plan and its path"""
+    import questionary
+    from questionary import Choice
+
     instructions_dir = "data/instructions"
     if not os.path.exists(instructions_dir):
         logger.error("Instructions directory not found")
-        return {}
+        return {}, None
         
-    instruction_files = [f for f in os.listdir(instructions_dir) if f.endswith('.json')]
-    if not instruction_files:
-        logger.error("No instruction files found")
-        return {}
-
-    # Sort files by creation time, newest first
-    instruction_files.sort(key=lambda x: os.path.getctime(os.path.join(instructions_dir, x)), reverse=True)
-    
-    # Create choices list with file info
+    # Summaries come from the index, plans are only parsed when their entry is stale
     choices = []
-    for file in instruction_files:
+    for file, summary in instructions_index.listing():
         file_path = os.path.join(instructions_dir, file)
-        creation_time = datetime.fromtimestamp(os.path.getctime(file_path))
-        
-        try:
-            with open(file_path, 'r') as f:
-                data = json.load(f)
-                total_volume = data.get('total_volume', 0)
-                completed = data.get('completed', False)
-                trades_count = data.get('total_trades', 0)
-                
-                status = "✅ Completed" if completed else "⏳ In Progress"
-                
-                # Format the choice text with extra newlines
-                choice_text = (
-                    f"{file} | {status}\n"
-                    f"   Created: {creation_time.strftime('%Y-%m-%d %H:%M:%S')}\n"
-                    f"   Trades: {trades_count} | Volume: {total_volume:.8f}\n"
-                )
-                
-                choices.append(Choice(
-                    title=choice_text,
-                    value=file_path
-                ))
-        except Exception as e:
-            logger.error(f"Error reading file {file}: {e}")
-            continue
+        creation_time = datetime.fromtimestamp(summary['created'])
+        total_volume = summary.get('total_volume') or 0
+        completed = summary.get('completed', False)
+        trades_count = summary.get('total_trades') or 0
+
+        status = "✅ Completed" if completed else "⏳ In Progress"
+
+        # Format the choice text with extra newlines
+        choice_text = (
+            f"{file} | {status}\n"
+            f"   Created: {creation_time.strftime('%Y-%m-%d %H:%M:%S')}\n"
+            f"   Trades: {trades_count} | Volume: {total_volume:.8f}\n"
+        )
+
+        choices.append(Choice(
+            title=choice_text,
+            value=file_path
+        ))
 
     if not choices:
         logger.error("No valid instruction files found")
-        return {}
+        return {}, None
 
     # Add a cancel option
     choices.append(Choice(title="❌ Cancel", value=None))
@@ -87,17 +91,14 @@ async def load_instructions():
 
         if not selected:  # User selected Cancel or pressed Ctrl+C
             logger.info("Instruction selection cancelled")
-            return {}
+            return {}, None
 
         # Load and return the selected instructions
-        with open(selected, 'r') as f:
-            instructions = json.load(f)
-            logger.info(f"Loaded instructions from {os.path.basename(selected)}")
-            return instructions
+        return read_instructions(selected), selected
 
     except Exception as e:
         logger.error(f"Error during instruction selection: {e}")
-        return {}
+        return {}, None
 
 def read_accounts() -> List[Account]:
     """
@@ -110,7 +111,7 @@ def read_accounts() -> List[Account]:
     try:
         accounts = []
         with open("data/telegram_accounts.txt", "r", encoding="utf-8") as f:
-            for line in f:
+            for number, line in enumerate(f, 1):
                 line = line.strip()
                 if not line:
                     continue
@@ -124,10 +125,6 @@ def read_accounts() -> List[Account]:
                     # Create session name from phone number
                     session_name = f"session_{phone.replace('+', '')}"
                     
-                    # Debug log the API credentials
-                    logger.debug(f"API ID: {app_id} (type: {type(app_id)})")
-                    logger.debug(f"API Hash: {api_hash}")
-                    
                     account = Account(
                         phone=phone,
                         password=None if password.lower() == "pass" else password,
@@ -137,12 +134,10 @@ def read_accounts() -> List[Account]:
                         proxy=None
                     )
                     accounts.append(account)
-                    logger.debug(
-                        f"Loaded account: {account.phone} | {account.session_name} | "
-                        f"API ID: {account.app_id} | API Hash: {account.api_hash}"
-                    )
+                    logger.debug(f"Loaded account: {account.phone} | {account.session_name} | API ID: {account.app_id}")
                 except ValueError as e:
-                    logger.error(f"Error parsing account line '{line}': {e}")
+                    # The line holds the password and API hash, only point to it
+                    logger.error(f"Error parsing line {number} of telegram_accounts.txt: {e}")
                     continue
 
         return accounts
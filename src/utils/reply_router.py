@@ -0,0 +1,65 @@
+from typing import List
+import pyrogram
+from pyrogram import filters
+from pyrogram.handlers import MessageHandler, EditedMessageHandler
+from loguru import logger
+from src.utils.bot_driver import BotDriver, BOT_USERNAME
+from src.utils.rate_limiter import RateLimiter, rate_limiter
+
+
+class ReplyRouter(BotDriver):
+    """
+    Bot driver backed by a live pyrogram client.
+
+    Replies arrive through MessageHandler/EditedMessageHandler registered for the bot chat
+    instead of history polling.
+    """
+
+    def __init__(self, app: pyrogram.Client, bot_username: str = BOT_USERNAME, limiter: RateLimiter = rate_limiter):
+        super().__init__(app.name, limiter)
+        self.app = app
+        self.bot_username = bot_username
+        self.handlers = []
+
+    async def start(self):
+        """Register update handlers for the bot chat and start the client"""
+        bot_filter = filters.chat(self.bot_username) & filters.incoming
+        self.handlers = [
+            self.app.add_handler(MessageHandler(self.handle_update, bot_filter), group=-1),
+            self.app.add_handler(EditedMessageHandler(self.handle_update, bot_filter), group=-1),
+        ]
+        try:
+            await self.app.start()
+        except Exception:
+            self.remove_handlers()
+            raise
+
+    def remove_handlers(self):
+        for handler, group in self.handlers:
+            try:
+                self.app.remove_handler(handler, group)
+            except Exception as e:
+                logger.debug(f"Error removing reply handler: {str(e)}")
+        self.handlers = []
+
+    async def stop(self):
+        """Remove update handlers and stop the client"""
+        await super().stop()
+        self.remove_handlers()
+        await self.app.stop()
+
+    async def handle_update(self, _, message: pyrogram.types.Message):
+        self.on_message(message)
+
+    async def raw_send_message(self, text: str) -> pyrogram.types.Message:
+        return await self.app.send_message(self.bot_username, text)
+
+    async def raw_request_callback_answer(self, message: pyrogram.types.Message, callback_data: str | bytes):
+        return await self.app.request_callback_answer(
+            chat_id=message.chat.id,
+            message_id=message.id,
+            callback_data=callback_data,
+        )
+
+    async def raw_get_chat_history(self, limit: int) -> List[pyrogram.types.Message]:
+        return [message async for message in self.app.get_chat_history(self.bot_username, limit=limit)]
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import os
+from typing import Dict
+from loguru import logger
+
+
+class SessionRegistry:
+    """
+    In-process cache of the session JSONs of a folder with lookup by session_name.
+
+    The folder is read in one worker thread and the result is kept, together with the folder's
+    mtime, in a consolidated index file next to the folder. Creating or removing a session changes
+    the folder mtime, which invalidates both the cache and the index.
+    """
+
+    def __init__(self, folder: str = "data/sessions"):
+        self.folder = folder
+        self.index_path = os.path.normpath(folder) + ".index.json"
+        self.sessions: Dict[str, dict] = {}
+        self.mtime = None
+
+    def folder_mtime(self) -> int:
+        return os.stat(self.folder).st_mtime_ns
+
+    def read_index(self, mtime: int) -> Dict[str, dict] | None:
+        if not os.path.exists(self.index_path):
+            return None
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            return index["sessions"] if index.get("mtime") == mtime else None
+        except Exception as e:
+            logger.warning(f"Ignoring damaged session index {self.index_path}: {str(e)}")
+            return None
+
+    def read_folder(self) -> Dict[str, dict]:
+        sessions = {}
+        for file in sorted(os.listdir(self.folder)):
+            if not file.endswith(".json"):
+                continue
+            session_name = file[:-len(".json")]
+            try:
+                with open(os.path.join(self.folder, file), "r", encoding="utf-8") as f:
+                    sessions[session_name] = json.load(f)
+            except Exception as e:
+                logger.error(f"{session_name} | Ошибка при чтении .json файла: {e}")
+        return sessions
+
+    def write_index(self, mtime: int, sessions: Dict[str, dict]):
+        try:
+            with open(self.index_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"mtime": mtime, "sessions": sessions}, f, ensure_ascii=False)
+            os.replace(self.index_path + ".tmp", self.index_path)
+        except Exception as e:
+            logger.error(f"Error saving session index {self.index_path}: {str(e)}")
+
+    def refresh(self) -> Dict[str, dict]:
+        mtime = self.folder_mtime()
+        if mtime == self.mtime:
+            return self.sessions
+        sessions = self.read_index(mtime)
+        if sessions is None:
+            sessions = self.read_folder()
+            self.write_index(mtime, sessions)
+        self.sessions, self.mtime = sessions, mtime
+        return sessions
+
+    async def load(self) -> list:
+        """Return all sessions, re-reading the folder only when it changed"""
+        if not os.path.exists(self.folder):
+            logger.error(f"Папка {self.folder} не существует")
+            return []
+        await asyncio.to_thread(self.refresh)
+        return list(self.sessions.values())
+
+    def get(self, session_name: str) -> dict | None:
+        return self.sessions.get(session_name)
+
+    def __contains__(self, session_name: str) -> bool:
+        return session_name in self.sessions
+
+    def invalidate(self):
+        """Drop the cache and the index, e.g. after a session JSON was rewritten in place"""
+        self.mtime = None
+        if os.path.exists(self.index_path):
+            os.remove(self.index_path)
+
+
+session_registry = SessionRegistry()
+
+
+async def load_sessions_from_folder(folder_path: str) -> list:
+    """Загружает сессии из указанной папки"""
+    try:
+        registry = session_registry
+        if os.path.normpath(folder_path) != os.path.normpath(registry.folder):
+            registry = SessionRegistry(folder_path)
+        return await registry.load()
+    except Exception as e:
+        logger.error(f"Ошибка при загрузке сессий из {folder_path}: {str(e)}")
+        return []
@@ -0,0 +1,214 @@
+import asyncio
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+from loguru import logger
+
+from config import TRACING_ENABLED
+
+
+TAGS = ("session", "side", "pair", "trade_id")
+QUANTILES = (0.5, 0.95, 0.99)
+# Rollups cover the most recent samples, so an endless CYCLE_MODE run does not grow them
+LATENCY_WINDOW = 10000
+# There is one per-account rollup for every (session, step), so their windows are kept short
+ACCOUNT_LATENCY_WINDOW = 500
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+@dataclass
+class Span:
+    step: str
+    tags: Dict[str, str]
+    parent: Optional["Span"] = None
+    span_id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+    started: float = field(default_factory=time.perf_counter)
+    first_request: Optional[float] = None
+    reply: Optional[float] = None
+    rpcs: int = 0
+
+
+def current_span() -> Optional[Span]:
+    """Span of the running task, None outside of any span"""
+    return _current_span.get()
+
+
+def percentiles(values: Sequence[float], quantiles: Sequence[float] = QUANTILES) -> List[float]:
+    """Nearest-rank percentiles of unsorted values, sorted once for all quantiles"""
+    ordered = sorted(values)
+    return [ordered[max(0, math.ceil(quantile * len(ordered)) - 1)] for quantile in quantiles]
+
+
+class Tracer:
+    """
+    Records per-step spans of the bot conversations.
+
+    Spans nest through a context variable, so tags set on a parent span (e.g. trade_id on the
+    trade span) are inherited by the step spans of every task started inside it. Each span records
+    its duration, the latency from its first request to the bot reply it waited for, and the number
+    of Telegram requests issued inside it. Finished spans are buffered in memory and written by
+    flush() to a JSONL file plus a Prometheus text file with p50/p95/p99 rollups per step and per
+    account.
+    """
+
+    def __init__(self, folder: str = "data/traces", enabled: bool = TRACING_ENABLED):
+        self.folder = folder
+        self.enabled = enabled
+        self.pending: List[dict] = []
+        self.latencies: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+        self.account_latencies: Dict[Tuple[str, str], Deque[float]] = defaultdict(lambda: deque(maxlen=ACCOUNT_LATENCY_WINDOW))
+        self.rpcs: Dict[str, int] = defaultdict(int)
+        self.failures: Dict[str, int] = defaultdict(int)
+        self.write_lock = threading.Lock()
+
+    @contextmanager
+    def span(self, step: str, **tags):
+        """Trace the enclosed block as one step"""
+        if not self.enabled:
+            yield None
+            return
+
+        parent = _current_span.get()
+        inherited = dict(parent.tags) if parent else {}
+        inherited.update({key: str(value) for key, value in tags.items() if value is not None})
+        span = Span(step=step, tags=inherited, parent=parent)
+        token = _current_span.set(span)
+        failed = False
+        try:
+            yield span
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            _current_span.reset(token)
+            self.finish(span, failed)
+
+    def count_rpc(self):
+        """Count a Telegram request on the current span and its parents"""
+        span = _current_span.get()
+        now = time.perf_counter()
+        while span is not None:
+            span.rpcs += 1
+            if span.first_request is None:
+                span.first_request = now
+            span = span.parent
+
+    def mark_reply(self):
+        """Record that the awaited bot reply arrived for the current span"""
+        span = _current_span.get()
+        if span is not None:
+            span.reply = time.perf_counter()
+
+    def finish(self, span: Span, failed: bool):
+        ended = time.perf_counter()
+        duration_ms = (ended - span.started) * 1000
+        latency_ms = None
+        if span.first_request is not None and span.reply is not None:
+            latency_ms = (span.reply - span.first_request) * 1000
+
+        self.latencies[span.step].append(latency_ms if latency_ms is not None else duration_ms)
+        if "session" in span.tags:
+            self.account_latencies[(span.tags["session"], span.step)].append(
+                latency_ms if latency_ms is not None else duration_ms
+            )
+        self.rpcs[span.step] += span.rpcs
+        if failed:
+            self.failures[span.step] += 1
+
+        # TRACE level: only the JSON log sink takes these, see src/utils/logging_setup.py
+        logger.bind(
+            step=span.step,
+            session=span.tags.get("session"),
+            trade_id=span.tags.get("trade_id"),
+            latency_ms=round(latency_ms if latency_ms is not None else duration_ms, 3),
+        ).trace(f"{span.step} finished in {duration_ms:.0f} ms")
+
+        self.pending.append({
+            "time": time.time(),
+            "span_id": span.span_id,
+            "parent_id": span.parent.span_id if span.parent else None,
+            "step": span.step,
+            **{tag: span.tags.get(tag) for tag in TAGS},
+            "duration_ms": round(duration_ms, 3),
+            "latency_ms": round(latency_ms, 3) if latency_ms is not None else None,
+            "rpcs": span.rpcs,
+            "failed": failed,
+        })
+
+    def render_metrics(self) -> str:
+        """
+        Prometheus text of the rollups. Runs in the flush thread while the event loop keeps adding
+        samples: sorted(dict.items()) and list(deque) copy in a single C call under the GIL, so
+        every window is snapshotted before it is iterated.
+        """
+        latencies = [(step, list(values)) for step, values in sorted(self.latencies.items())]
+        account_latencies = [(key, list(values)) for key, values in sorted(self.account_latencies.items())]
+        rpcs = sorted(self.rpcs.items())
+        failures = sorted(self.failures.items())
+
+        lines = [
+            "# HELP pvp_step_latency_ms Send-to-reply latency of a bot conversation step",
+            "# TYPE pvp_step_latency_ms summary",
+        ]
+        for step, values in latencies:
+            for quantile, value in zip(QUANTILES, percentiles(values)):
+                lines.append(f'pvp_step_latency_ms{{step="{step}",quantile="{quantile}"}} {value:.3f}')
+            lines.append(f'pvp_step_latency_ms_count{{step="{step}"}} {len(values)}')
+        lines += [
+            "# HELP pvp_step_rpcs_total Telegram requests issued by a step",
+            "# TYPE pvp_step_rpcs_total counter",
+        ]
+        for step, count in rpcs:
+            lines.append(f'pvp_step_rpcs_total{{step="{step}"}} {count}')
+        lines += [
+            "# HELP pvp_step_failures_total Steps that raised",
+            "# TYPE pvp_step_failures_total counter",
+        ]
+        for step, count in failures:
+            lines.append(f'pvp_step_failures_total{{step="{step}"}} {count}')
+        lines += [
+            "# HELP pvp_account_step_latency_ms Send-to-reply latency of a step per account",
+            "# TYPE pvp_account_step_latency_ms summary",
+        ]
+        for (session, step), values in account_latencies:
+            for quantile, value in zip(QUANTILES, percentiles(values)):
+                lines.append(
+                    f'pvp_account_step_latency_ms{{session="{session}",step="{step}",quantile="{quantile}"}} {value:.3f}'
+                )
+        return "\n".join(lines) + "\n"
+
+    async def flush(self):
+        """Append buffered spans to spans.jsonl and render and rewrite metrics.prom off the event loop"""
+        if not self.enabled:
+            return
+        pending, self.pending = self.pending, []
+        await asyncio.to_thread(self.write, pending)
+
+    def write(self, pending: List[dict]):
+        with self.write_lock:
+            self.write_files(pending, self.render_metrics())
+
+    def write_files(self, pending: List[dict], metrics: str):
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            if pending:
+                with open(os.path.join(self.folder, "spans.jsonl"), "a", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(record) + "\n" for record in pending))
+            metrics_path = os.path.join(self.folder, "metrics.prom")
+            with open(metrics_path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(metrics)
+            os.replace(metrics_path + ".tmp", metrics_path)
+        except Exception as e:
+            logger.error(f"Error writing traces: {str(e)}")
+
+
+tracer = Tracer()
@@ -0,0 +1,83 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import src.trade as trade_module
+from src.utils.bot_simulator import SimulatedBot, SimulatedClientPool
+from src.utils.position_ledger import PositionLedger
+from src.utils.rate_limiter import RateLimiter
+from src.utils.tracing import tracer
+
+
+SESSIONS = ["alice", "bob", "carol", "dave"]
+
+
+@pytest.fixture(autouse=True)
+def no_pauses(monkeypatch):
+    """Zero the config pauses between trade steps and keep traces out of data/"""
+    for setting in (
+        "BETWEEN_OPEN_CLOSE_TRADE_TIME_RANGE",
+        "BETWEEN_CLOSE_NEXT_TRADE_TIME_RANGE",
+        "BETWEEN_ACCOUNTS_IN_ONE_TRADE_PAUSE_RANGE",
+        "PAUSE_BETWEEN_TRADE_SIDES",
+    ):
+        monkeypatch.setattr(trade_module, setting, [0, 0])
+    monkeypatch.setattr(tracer, "enabled", False)
+
+
+@pytest.fixture
+def sessions():
+    return list(SESSIONS)
+
+
+@pytest.fixture
+def bot():
+    return SimulatedBot(latency=(0.001, 0.003), seed=1)
+
+
+@pytest.fixture
+def pool(bot):
+    return SimulatedClientPool(bot, RateLimiter(global_rate=1e9, account_rate=1e9, account_burst=1e9))
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return PositionLedger(str(tmp_path / "positions.json"))
+
+
+def make_trade(pair: str, long_sessions: list, short_sessions: list, volume: float = 20.0, group: int = 1) -> dict:
+    return {
+        "pair": pair,
+        "completed": False,
+        "group": group,
+        "long": {
+            "accounts": [{"telegram": name, "volume": volume} for name in long_sessions],
+            "total_long_side_volume": volume * len(long_sessions),
+        },
+        "short": {
+            "accounts": [{"telegram": name, "volume": volume} for name in short_sessions],
+            "total_short_side_volume": volume * len(short_sessions),
+        },
+        "total_volume": volume * (len(long_sessions) + len(short_sessions)),
+    }
+
+
+@pytest.fixture
+def plan():
+    """Two trades over the same four accounts"""
+    trades = {
+        "trade1": make_trade("HYPE", SESSIONS[:2], SESSIONS[2:]),
+        "trade2": make_trade("ETH", SESSIONS[2:], SESSIONS[:2]),
+    }
+    return {
+        "total_trades": len(trades),
+        "total_trades_completed": 0,
+        "total_volume": sum(trade["total_volume"] for trade in trades.values()),
+        "total_volume_completed": 0,
+        "start_time": "2026-01-01T00:00:00",
+        "completed": False,
+        "trades": trades,
+    }
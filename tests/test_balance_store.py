@@ -0,0 +1,68 @@
+import asyncio
+import csv
+import time
+
+import src.check_balance as check_balance_module
+from src.check_balance import CheckBalances
+from src.utils.balance_store import BalanceStore
+
+
+def session(name: str) -> dict:
+    return {"session_name": name, "user": {"username": f"{name}_user"}}
+
+
+def test_latest_respects_max_age(tmp_path):
+    store = BalanceStore(str(tmp_path / "balances.db"))
+    now = time.time()
+    store.record("alice", (100.0, 80.0, 5.0, 5.0), checked_at=now - 600)
+    store.record("alice", (110.0, 90.0, 5.0, 5.0), checked_at=now - 10)
+    store.record("bob", (50.0, 50.0, 0.0, 0.0), checked_at=now - 600)
+
+    assert store.latest("alice", 60) == (110.0, 90.0, 5.0, 5.0)
+    assert store.latest("bob", 60) is None
+    assert store.latest("bob", 3600) == (50.0, 50.0, 0.0, 0.0)
+    # A TTL of zero disables the cache
+    assert store.latest("alice", 0) is None
+    assert store.available_balances(["alice", "bob", "carol"], 60) == {"alice": 90.0}
+    store.close()
+
+
+def test_history_and_csv_export(tmp_path):
+    store = BalanceStore(str(tmp_path / "balances.db"))
+    store.record("bob", (50.0, 50.0, 0.0, 0.0), checked_at=300.0)
+    store.record("alice", (100.0, 80.0, 5.0, 5.0), checked_at=200.0)
+    store.record("alice", (110.0, 90.0, 5.0, 5.0), checked_at=100.0)
+
+    history = store.history(since=150.0)
+    assert [(row["session_name"], row["checked_at"]) for row in history] == [("alice", 200.0), ("bob", 300.0)]
+    assert [row["checked_at"] for row in store.history(["alice"])] == [100.0, 200.0]
+
+    path = tmp_path / "history.csv"
+    assert store.export_csv(str(path), until=250.0) == 2
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["session_name"] for row in rows] == ["alice", "alice"]
+    assert float(rows[0]["perps_available"]) == 90.0
+    store.close()
+
+
+def test_check_balances_serves_fresh_snapshots_from_the_cache(tmp_path, monkeypatch, bot, pool):
+    monkeypatch.setattr(check_balance_module, "CYCLE_MODE", False)
+    store = BalanceStore(str(tmp_path / "balances.db"))
+    store.record("alice", (123.0, 100.0, 0.0, 0.0))
+    store.record("bob", (50.0, 50.0, 0.0, 0.0), checked_at=time.time() - 3600)
+    checker = CheckBalances([], pool=pool, store=store, cache_ttl=60)
+
+    async def main():
+        try:
+            return await checker.check_balances([session("alice"), session("bob")])
+        finally:
+            await pool.stop()
+
+    balances = asyncio.run(main())
+
+    # alice is answered from the cache without contacting the bot, bob's snapshot is too old
+    assert balances == {"alice": (123.0, 100.0, 0.0, 0.0), "bob": (1000.0, 1000.0, 0.0, 0.0)}
+    assert bot.account("alice").messages == []
+    assert store.latest("bob", 60) == (1000.0, 1000.0, 0.0, 0.0)
+    store.close()
@@ -0,0 +1,63 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import main
+import src.utils.session_registry as session_registry_module
+from src.utils.session_registry import SessionRegistry
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """data/sessions with two sessions in a temporary working directory, with a fresh registry"""
+    (tmp_path / "data" / "sessions").mkdir(parents=True)
+    for name in ("alice", "bob"):
+        session = {"session_name": name, "phone": "+10000000000", "user": {"username": f"{name}_user"}}
+        (tmp_path / "data" / "sessions" / f"{name}.json").write_text(json.dumps(session), encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    registry = SessionRegistry()
+    monkeypatch.setattr(session_registry_module, "session_registry", registry)
+    monkeypatch.setattr(main, "session_registry", registry)
+    return tmp_path
+
+
+def run(capsys, *argv) -> tuple:
+    code = asyncio.run(main.run_command(main.build_parser().parse_args(argv)))
+    return code, json.loads(capsys.readouterr().out)
+
+
+def test_list_sessions_succeeds(workdir, capsys):
+    code, output = run(capsys, "list-sessions")
+
+    assert code == 0
+    assert [session["session_name"] for session in output] == ["alice", "bob"]
+
+
+@pytest.mark.parametrize("argv, error", [
+    (["trade"], "Either --plan or --cycle is required"),
+    (["trade", "--plan", "missing.json"], "Instructions file missing.json not found"),
+    (["balances", "--sessions", "alice", "carol"], "Unknown sessions: carol"),
+    (["export-keys", "--sessions", "dave"], "Unknown sessions: dave"),
+])
+def test_failed_command_exits_with_one(workdir, capsys, argv, error):
+    code, output = run(capsys, *argv)
+
+    assert code == 1
+    assert output == {"error": error}
+
+
+def test_exit_code_reaches_the_shell(workdir):
+    result = subprocess.run(
+        [sys.executable, os.path.join(ROOT, "main.py"), "trade"],
+        capture_output=True, text=True, timeout=60,
+    )
+
+    assert result.returncode == 1
+    assert json.loads(result.stdout) == {"error": "Either --plan or --cycle is required"}
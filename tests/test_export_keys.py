@@ -0,0 +1,64 @@
+import asyncio
+
+from src.export_keys import ExportKeys
+from src.utils.key_writer import KeyExportWriter
+
+
+def session(name: str) -> dict:
+    return {"session_name": name, "user": {"username": f"{name}_user"}}
+
+
+def exported_lines(path) -> list:
+    return path.read_text(encoding="utf-8").splitlines() if path.exists() else []
+
+
+def test_export_single_session_starts_its_own_writer(tmp_path, bot, pool):
+    path = tmp_path / "exported_wallets.txt"
+    exporter = ExportKeys([], pool=pool, writer=KeyExportWriter(str(path)))
+
+    async def main():
+        try:
+            return await exporter.export_single_session(session("alice"))
+        finally:
+            await pool.stop()
+
+    assert asyncio.run(main())
+    assert not exporter.writer.running
+    username, session_name, key, address = exported_lines(path)[0].split(":")
+    assert (username, session_name, key) == ("alice_user", "alice", bot.account("alice").private_key)
+    assert address.startswith("0x")
+
+
+def test_export_keys_skips_exported_sessions(tmp_path, bot, pool):
+    path = tmp_path / "exported_wallets.txt"
+    path.write_text("alice_user:alice:0xabc:0xdef\n", encoding="utf-8")
+    exporter = ExportKeys([], pool=pool, writer=KeyExportWriter(str(path)))
+
+    async def main():
+        try:
+            first = await exporter.export_keys([session("alice"), session("bob")])
+            second = await exporter.export_keys([session("bob")])
+            return first, second
+        finally:
+            await pool.stop()
+
+    first, second = asyncio.run(main())
+
+    assert first == {"alice": True, "bob": True} and second == {"bob": True}
+    lines = exported_lines(path)
+    assert [line.split(":")[1] for line in lines] == ["alice", "bob"]
+    # alice was never connected, her line is the one that was already there
+    assert "alice" not in pool.drivers and lines[0] == "alice_user:alice:0xabc:0xdef"
+
+
+def test_writer_deduplicates_within_a_run(tmp_path):
+    writer = KeyExportWriter(str(tmp_path / "exported_wallets.txt"))
+
+    async def main():
+        await writer.start()
+        written = [await writer.write("alice", "u:alice:0x1:0x2\n"), await writer.write("alice", "u:alice:0x1:0x2\n")]
+        await writer.stop()
+        return written
+
+    assert asyncio.run(main()) == [True, False]
+    assert exported_lines(tmp_path / "exported_wallets.txt") == ["u:alice:0x1:0x2"]
@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+from src.utils.instructions_index import InstructionsIndex
+from src.utils.plan_stream import StreamingPlan
+from src.utils.progress_journal import ProgressJournal
+
+
+def write_plans(folder, plan):
+    (folder / "plan.json").write_text(json.dumps(plan))
+    StreamingPlan.write(str(folder / "stream.jsonl"), plan)
+
+
+def test_listing_summarizes_plans_and_reuses_current_entries(tmp_path, plan, monkeypatch):
+    write_plans(tmp_path, plan)
+    (tmp_path / "broken.json").write_text("{")
+    index = InstructionsIndex(str(tmp_path))
+
+    listed = dict(index.listing())
+
+    assert set(listed) == {"plan.json", "stream.jsonl"}
+    for entry in listed.values():
+        assert entry["total_trades"] == 2 and entry["total_trades_completed"] == 0
+        assert entry["total_volume"] == plan["total_volume"] and not entry["completed"]
+
+    def unexpected_rebuild(*args):
+        raise AssertionError("a current entry was rebuilt")
+
+    reopened = InstructionsIndex(str(tmp_path))
+    monkeypatch.setattr(reopened, "rebuild_entry", unexpected_rebuild)
+    assert dict(reopened.listing()) == listed
+
+
+def test_journal_change_invalidates_entry(tmp_path, plan):
+    write_plans(tmp_path, plan)
+    index = InstructionsIndex(str(tmp_path))
+    index.listing()
+
+    for name in ("plan.json", "stream.jsonl"):
+        asyncio.run(ProgressJournal(str(tmp_path / name)).append("trade1", 1700000000.0))
+
+    listed = dict(InstructionsIndex(str(tmp_path)).listing())
+    assert all(entry["total_trades_completed"] == 1 for entry in listed.values())
+
+
+def test_removed_plans_leave_the_index(tmp_path, plan):
+    write_plans(tmp_path, plan)
+    index = InstructionsIndex(str(tmp_path))
+    index.listing()
+
+    (tmp_path / "plan.json").unlink()
+
+    assert [name for name, _ in index.listing()] == ["stream.jsonl"]
+    with open(index.path, "r", encoding="utf-8") as f:
+        assert list(json.load(f)) == ["stream.jsonl"]
+
+
+def test_update_ignores_plans_outside_the_folder(tmp_path, plan):
+    folder = tmp_path / "instructions"
+    folder.mkdir()
+    (tmp_path / "plan.json").write_text(json.dumps(plan))
+    index = InstructionsIndex(str(folder))
+
+    index.update(str(tmp_path / "plan.json"), plan)
+
+    assert index.entries == {}
+    assert not (folder / ".index.json").exists()
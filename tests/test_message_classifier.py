@@ -0,0 +1,41 @@
+from src.utils.bot_simulator import keyboard
+from src.utils.message_classifier import BotState, Keyboard, classify, normalize_label
+
+
+def test_classify_finds_every_screen_in_a_message():
+    text = "Positions Overview\n\nHYPE: LONG $12.29 (1x)\n\nReply with the ticker of the position you want to close"
+
+    assert classify(text) == {BotState.CLOSE_POSITION, BotState.TICKER}
+    assert classify("✅ LONG HYPE market order placed") == {BotState.ORDER_PLACED}
+    assert classify("You have no open positions") == {BotState.NO_POSITIONS}
+
+
+def test_classify_without_text():
+    assert classify(None) == frozenset()
+    assert classify("") == frozenset()
+    assert classify("Unknown command") == frozenset()
+
+
+def test_normalize_label():
+    assert normalize_label("✅ Confirm") == "confirm"
+    assert normalize_label("100%") == "100%"
+    assert normalize_label("🔑 Export Private Key") == "export private key"
+
+
+def test_keyboard_find_prefers_exact_label():
+    buttons = Keyboard(keyboard(
+        [("10%", "close:10"), ("100%", "close:100")],
+        [("✅ Confirm", "confirm"), ("❌ Cancel", "cancel")],
+    ))
+
+    assert buttons.find("100%") == "close:100"
+    assert buttons.find("10%") == "close:10"
+    assert buttons.find("confirm") == "confirm"
+    # Falls back to the first label containing the text
+    assert buttons.find("canc") == "cancel"
+    assert buttons.find("export") is None
+
+
+def test_keyboard_without_markup():
+    assert not Keyboard(None)
+    assert Keyboard(None).find("confirm") is None
@@ -0,0 +1,108 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import src.utils.plan_generator as plan_generator
+from src.utils.plan_generator import TradeGenerator, build_plan
+
+
+@pytest.fixture(autouse=True)
+def volume_settings(monkeypatch):
+    """Volumes wide enough for groups of several accounts"""
+    monkeypatch.setattr(plan_generator, "VOLUME_RANGE", [100, 200])
+    monkeypatch.setattr(plan_generator, "MIN_VOLUME_PER_ACCOUNT", 5)
+
+
+def accounts(count: int) -> list:
+    return [{"session_name": f"session{index}"} for index in range(count)]
+
+
+def legs(trade: dict):
+    for side in ("long", "short"):
+        for leg in trade[side]["accounts"]:
+            yield side, leg
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_legs_never_exceed_caps(seed):
+    rng = np.random.default_rng(seed)
+    group = accounts(int(rng.integers(2, 9)))
+    capacities = {account["session_name"]: float(rng.uniform(10, 80)) for account in group}
+    # Accounts without a known balance are not capped
+    capacities.pop(group[0]["session_name"])
+
+    try:
+        plan = build_plan(group, 1, capacities, trades_count=25, seed=seed)
+    except ValueError:
+        pytest.skip("margin too low for this draw")
+
+    for trade in plan["trades"].values():
+        for _, leg in legs(trade):
+            assert leg["volume"] <= capacities.get(leg["telegram"], np.inf)
+        for side in ("long", "short"):
+            side_legs = trade[side]["accounts"]
+            total = sum(leg["volume"] for leg in side_legs)
+            assert total == pytest.approx(trade[side][f"total_{side}_side_volume"], abs=1e-6)
+            # Trades that cannot give their accounts MIN_VOLUME_PER_ACCOUNT on average are dropped
+            assert total / len(side_legs) >= plan_generator.MIN_VOLUME_PER_ACCOUNT
+
+
+def test_uncapped_plan_splits_every_trade_between_sides():
+    plan = build_plan(accounts(8), 2, trades_count=10, seed=1)
+
+    assert plan["total_trades"] == 20 and plan["groups"] == 2
+    group_sessions = {}
+    for trade in plan["trades"].values():
+        sessions = [leg["telegram"] for _, leg in legs(trade)]
+        assert len(sessions) == len(set(sessions)) == 4
+        assert trade["long"]["accounts"] and trade["short"]["accounts"]
+        group_sessions.setdefault(trade["group"], set()).update(sessions)
+    # Groups are disjoint
+    assert not group_sessions[1] & group_sessions[2]
+
+
+def test_plan_without_enough_margin_is_rejected():
+    capacities = {account["session_name"]: 1.0 for account in accounts(4)}
+
+    with pytest.raises(ValueError):
+        build_plan(accounts(4), 1, capacities, trades_count=5, seed=1)
+
+
+def test_group_size_the_volume_range_cannot_cover_is_rejected(monkeypatch):
+    monkeypatch.setattr(plan_generator, "MIN_VOLUME_PER_ACCOUNT", 90)
+
+    with pytest.raises(ValueError):
+        build_plan(accounts(6), 1, trades_count=5, seed=1)
+
+
+def test_generator_respects_limit_and_caps():
+    group = accounts(4)
+    capacities = {account["session_name"]: 60.0 for account in group}
+    generator = TradeGenerator(group, 1, capacities, limit=30, seed=3)
+
+    trades = list(generator.trades(1))
+
+    assert len(trades) == 30
+    assert all(leg["volume"] <= 60.0 for _, trade in trades for _, leg in legs(trade))
+    for trade_id, _ in trades:
+        generator.running[1] = (trade_id, 1.0)
+        generator.checkpoint(trade_id)
+    assert generator.summary["completed"] and generator.summary["total_trades_completed"] == 30
+
+
+def test_generator_stops_a_group_that_cannot_be_funded():
+    capacities = {account["session_name"]: 1.0 for account in accounts(4)}
+    generator = TradeGenerator(accounts(4), 1, capacities, seed=3)
+
+    assert list(itertools.islice(generator.trades(1), 5)) == []
+
+
+def test_generator_excludes_sessions():
+    generator = TradeGenerator(accounts(4), 2, seed=3)
+    excluded = set(generator.groups[0])
+
+    generator.exclude(excluded)
+
+    assert list(generator.trades(1)) == []
+    assert not generator.sessions & excluded
@@ -0,0 +1,73 @@
+import asyncio
+import json
+import os
+
+from src.utils.plan_stream import StreamingPlan, is_streaming_plan
+
+
+def write_plan(tmp_path, plan) -> StreamingPlan:
+    path = str(tmp_path / "plan.jsonl")
+    StreamingPlan.write(path, plan)
+    return StreamingPlan(path)
+
+
+def test_is_streaming_plan():
+    assert is_streaming_plan("data/instructions/01-01-2026_00-00-00.jsonl")
+    assert not is_streaming_plan("data/instructions/01-01-2026_00-00-00.json")
+    assert not is_streaming_plan("data/instructions/01-01-2026_00-00-00.journal.jsonl")
+
+
+def test_header_holds_counters_and_sessions(tmp_path, plan, sessions):
+    stream = write_plan(tmp_path, plan)
+
+    header = stream.load()
+
+    assert "trades" not in header
+    assert header["total_trades"] == 2
+    assert stream.sessions == set(sessions)
+
+
+def test_read_trade_seeks_to_offset(tmp_path, plan):
+    plan["trades"]["trade2"]["group"] = 2
+    stream = write_plan(tmp_path, plan)
+    stream.load()
+
+    groups = stream.groups()
+
+    assert [trade_id for trade_id, _ in groups[1]] == ["trade1"]
+    assert [trade_id for trade_id, _ in groups[2]] == ["trade2"]
+    for group in groups.values():
+        for trade_id, offset in group:
+            assert stream.read_trade(offset) == plan["trades"][trade_id]
+
+
+def test_journal_skips_completed_trades(tmp_path, plan):
+    stream = write_plan(tmp_path, plan)
+    stream.load()
+    asyncio.run(stream.journal.append("trade1", 1700000000.0))
+
+    reopened = StreamingPlan(stream.path)
+    header = reopened.load()
+
+    assert reopened.completed == {"trade1"}
+    assert [trade_id for group in reopened.groups().values() for trade_id, _ in group] == ["trade2"]
+    assert header["total_trades_completed"] == 1
+    assert header["total_volume_completed"] == plan["trades"]["trade1"]["total_volume"]
+
+
+def test_stale_offsets_index_is_rebuilt(tmp_path, plan):
+    stream = write_plan(tmp_path, plan)
+    # The plan changed after its index was written, the recorded offsets no longer apply
+    with open(stream.path, "ab") as f:
+        f.write(b"\n")
+    with open(stream.index_path, "r", encoding="utf-8") as f:
+        index = json.load(f)
+    index["entries"] = [[trade_id, 1, 0, 0, False] for trade_id, *_ in index["entries"]]
+    with open(stream.index_path, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+
+    stream.load()
+
+    for trade_id, offset in stream.groups()[1]:
+        assert stream.read_trade(offset) == plan["trades"][trade_id]
+    assert os.path.getmtime(stream.index_path) >= os.path.getmtime(stream.path)
@@ -0,0 +1,37 @@
+import asyncio
+import json
+
+from src.utils.position_ledger import PositionLedger
+
+
+def test_stale_snapshot_does_not_overwrite_newer(ledger):
+    ledger.open("alice", "HYPE", "long", 20.0, "trade1")
+    newer = json.dumps({"positions": ledger.positions, "trades": {}})
+
+    # The write thread of an older save finishes after a newer one
+    ledger.write(newer, 2)
+    ledger.write(json.dumps({"positions": {}, "trades": {}}), 1)
+
+    assert PositionLedger(ledger.path).is_open("alice", "HYPE")
+
+
+def test_concurrent_saves_keep_the_latest_state(ledger):
+    async def trade_groups():
+        async def group(number):
+            for index in range(5):
+                ledger.open(f"session{number}", f"PAIR{index}", "long", 1.0)
+                await ledger.save()
+        await asyncio.gather(*[group(number) for number in range(4)])
+
+    asyncio.run(trade_groups())
+
+    assert PositionLedger(ledger.path).positions == ledger.positions
+
+
+def test_loads_ledger_without_trades(ledger):
+    with open(ledger.path, "w", encoding="utf-8") as f:
+        json.dump({"alice": {"HYPE": {"side": "long", "volume": 20.0, "trade_id": "trade1"}}}, f)
+
+    loaded = PositionLedger(ledger.path)
+
+    assert loaded.holders("HYPE") == ["alice"] and loaded.trades == {}
@@ -0,0 +1,51 @@
+import asyncio
+import copy
+import json
+
+from src.utils.progress_journal import ProgressJournal
+
+
+def test_replay_applies_journaled_trades(tmp_path, plan):
+    plan_path = tmp_path / "plan.json"
+    plan_path.write_text(json.dumps(plan))
+    journal = ProgressJournal(str(plan_path))
+    asyncio.run(journal.append("trade1", 1700000000.0))
+
+    instructions = journal.replay(json.loads(plan_path.read_text()))
+
+    assert instructions["trades"]["trade1"]["completed"]
+    assert not instructions["trades"]["trade2"]["completed"]
+    assert instructions["total_trades_completed"] == 1
+    assert instructions["total_volume_completed"] == plan["trades"]["trade1"]["total_volume"]
+    assert instructions["last_trade_time"] == 1700000000.0
+    assert not instructions["completed"]
+
+
+def test_replay_ignores_torn_last_line_and_repeats(tmp_path, plan):
+    journal = ProgressJournal(str(tmp_path / "plan.json"))
+    asyncio.run(journal.append("trade1", 1700000000.0))
+    asyncio.run(journal.append("trade1", 1700000001.0))
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"trade_id": "trade2", "ti')
+
+    instructions = journal.replay(copy.deepcopy(plan))
+
+    assert instructions["total_trades_completed"] == 1
+    assert not instructions["trades"]["trade2"]["completed"]
+
+
+def test_compact_folds_journal_into_plan(tmp_path, plan):
+    plan_path = tmp_path / "plan.json"
+    plan_path.write_text(json.dumps(plan))
+    journal = ProgressJournal(str(plan_path))
+    asyncio.run(journal.append("trade1", 1700000000.0))
+    asyncio.run(journal.append("trade2", 1700000001.0))
+    instructions = journal.replay(json.loads(plan_path.read_text()))
+
+    asyncio.run(journal.compact(instructions))
+
+    assert not (tmp_path / "plan.journal.jsonl").exists()
+    assert not (tmp_path / "plan.json.tmp").exists()
+    saved = json.loads(plan_path.read_text())
+    assert saved == instructions
+    assert saved["completed"] and saved["total_trades_completed"] == 2
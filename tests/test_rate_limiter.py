@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+from pyrogram.errors import FloodWait
+
+from src.utils.rate_limiter import RateLimiter
+
+
+def unlimited(**kwargs) -> RateLimiter:
+    return RateLimiter(global_rate=1e9, account_rate=1e9, account_burst=1e9, **kwargs)
+
+
+def flooding(failures: int):
+    """Request that fails with a zero-second FloodWait the given number of times"""
+    attempts = []
+
+    async def request():
+        attempts.append(len(attempts))
+        if len(attempts) <= failures:
+            raise FloodWait(value=0)
+        return "ok"
+
+    return request, attempts
+
+
+def test_flood_wait_is_retried():
+    request, attempts = flooding(2)
+
+    assert asyncio.run(unlimited(max_flood_retries=2).call("alice", request)) == "ok"
+    assert len(attempts) == 3
+
+
+def test_flood_wait_raises_after_max_retries():
+    request, attempts = flooding(3)
+
+    with pytest.raises(FloodWait):
+        asyncio.run(unlimited(max_flood_retries=2).call("alice", request))
+    assert len(attempts) == 3
+
+
+def test_priority_lane_is_served_before_queued_opens():
+    limiter = RateLimiter(global_rate=200, account_rate=1e9, account_burst=1e9)
+    served = []
+
+    async def request(name: str, close: bool):
+        if close:
+            with limiter.priority_lane():
+                await limiter.acquire(name)
+        else:
+            await limiter.acquire(name)
+        served.append(name)
+
+    async def main():
+        # Drain the global bucket so every request has to wait in the queue
+        limiter.global_bucket.tokens = 0
+        await asyncio.gather(
+            *[request(f"open{i}", False) for i in range(3)],
+            *[request(f"close{i}", True) for i in range(3)],
+        )
+
+    asyncio.run(main())
+
+    assert served == ["close0", "close1", "close2", "open0", "open1", "open2"]
+
+
+def test_dispatcher_restarts_in_a_new_event_loop():
+    limiter = RateLimiter(global_rate=200, account_rate=1e9, account_burst=1e9)
+
+    async def acquire_drained():
+        limiter.global_bucket.tokens = 0
+        await limiter.acquire("alice")
+
+    async def cancel_waiting():
+        task = asyncio.create_task(acquire_drained())
+        await asyncio.sleep(0)
+        task.cancel()
+
+    # The first loop is closed while its dispatcher is still waiting for a token
+    asyncio.run(cancel_waiting())
+    asyncio.run(asyncio.wait_for(acquire_drained(), timeout=1))
@@ -0,0 +1,80 @@
+import asyncio
+import json
+import os
+
+from src.utils.session_registry import SessionRegistry
+
+
+def write_session(folder, name: str, **fields):
+    (folder / f"{name}.json").write_text(json.dumps({"session_name": name, **fields}), encoding="utf-8")
+
+
+def bump_mtime(folder, seconds: int = 1):
+    """Move the folder mtime forward, filesystems with coarse timestamps may not change it by themselves"""
+    stat = os.stat(folder)
+    os.utime(folder, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 10 ** 9))
+
+
+def test_new_session_invalidates_cache_and_index(tmp_path):
+    folder = tmp_path / "sessions"
+    folder.mkdir()
+    write_session(folder, "alice")
+    registry = SessionRegistry(str(folder))
+
+    assert [session["session_name"] for session in asyncio.run(registry.load())] == ["alice"]
+    assert os.path.exists(registry.index_path)
+
+    write_session(folder, "bob")
+    bump_mtime(folder)
+
+    assert [session["session_name"] for session in asyncio.run(registry.load())] == ["alice", "bob"]
+    assert "bob" in registry
+    with open(registry.index_path, "r", encoding="utf-8") as f:
+        assert list(json.load(f)["sessions"]) == ["alice", "bob"]
+
+
+def test_current_index_is_used_instead_of_the_folder(tmp_path, monkeypatch):
+    folder = tmp_path / "sessions"
+    folder.mkdir()
+    write_session(folder, "alice", api_id=1)
+    asyncio.run(SessionRegistry(str(folder)).load())
+
+    def unexpected_read():
+        raise AssertionError("the folder was read despite a current index")
+
+    registry = SessionRegistry(str(folder))
+    monkeypatch.setattr(registry, "read_folder", unexpected_read)
+    asyncio.run(registry.load())
+
+    assert registry.get("alice") == {"session_name": "alice", "api_id": 1}
+
+
+def test_invalidate_picks_up_in_place_rewrite(tmp_path):
+    folder = tmp_path / "sessions"
+    folder.mkdir()
+    write_session(folder, "alice", api_id=1)
+    registry = SessionRegistry(str(folder))
+    asyncio.run(registry.load())
+
+    # Rewriting a session JSON does not touch the folder mtime
+    write_session(folder, "alice", api_id=2)
+    asyncio.run(registry.load())
+    assert registry.get("alice")["api_id"] == 1
+
+    registry.invalidate()
+    assert not os.path.exists(registry.index_path)
+    asyncio.run(registry.load())
+    assert registry.get("alice")["api_id"] == 2
+
+
+def test_damaged_index_is_rebuilt(tmp_path):
+    folder = tmp_path / "sessions"
+    folder.mkdir()
+    write_session(folder, "alice")
+    registry = SessionRegistry(str(folder))
+    with open(registry.index_path, "w", encoding="utf-8") as f:
+        f.write("{")
+
+    assert [session["session_name"] for session in asyncio.run(registry.load())] == ["alice"]
+    with open(registry.index_path, "r", encoding="utf-8") as f:
+        assert list(json.load(f)["sessions"]) == ["alice"]
@@ -0,0 +1,128 @@
+import asyncio
+import json
+
+from src.trade import Trade
+from src.utils.position_ledger import PositionLedger
+
+
+def run_trade(trade: Trade, pool) -> bool:
+    async def main():
+        try:
+            return await trade.trade()
+        finally:
+            await pool.stop()
+    return asyncio.run(main())
+
+
+def count_opened_orders(bot) -> dict:
+    """Count confirmed open orders per account from now on"""
+    opened = {}
+    confirm_open = bot.confirm_open
+
+    def counting_confirm_open(account, message_id):
+        opened[account.session_name] = opened.get(account.session_name, 0) + 1
+        return confirm_open(account, message_id)
+
+    bot.confirm_open = counting_confirm_open
+    return opened
+
+
+def test_open_close_round_trip(tmp_path, bot, pool, ledger, plan, sessions):
+    plan_path = tmp_path / "plan.json"
+    plan_path.write_text(json.dumps(plan))
+    trade = Trade(plan, str(plan_path), pool=pool, ledger=ledger)
+
+    assert run_trade(trade, pool)
+
+    assert all(not bot.account(name).positions for name in sessions)
+    assert ledger.positions == {} and ledger.trades == {}
+    # The journal was folded into the plan when trading finished
+    saved = json.loads(plan_path.read_text())
+    assert saved["completed"] and saved["total_trades_completed"] == 2
+    assert all(trade_info["completed"] for trade_info in saved["trades"].values())
+    assert not (tmp_path / "plan.journal.jsonl").exists()
+
+
+def test_reconcile_closes_interrupted_trade(tmp_path, bot, pool, ledger, plan, sessions):
+    # trade1 crashed after two of its legs opened; dave holds a position this tool never opened
+    bot.account("alice").positions["HYPE"] = ("long", 20.0, 1)
+    bot.account("carol").positions["HYPE"] = ("short", 20.0, 1)
+    bot.account("dave").positions["BTC"] = ("long", 5.0, 1)
+    ledger.open("alice", "HYPE", "long", 20.0, "trade1")
+    ledger.start_trade("trade1", "HYPE", sessions)
+    asyncio.run(ledger.save())
+
+    opened = count_opened_orders(bot)
+    trade = Trade(plan, str(tmp_path / "plan.json"), pool=pool, ledger=PositionLedger(ledger.path))
+    assert run_trade(trade, pool)
+
+    # trade1 is checkpointed instead of being opened again, only trade2 places orders
+    assert plan["trades"]["trade1"]["completed"] and plan["trades"]["trade2"]["completed"]
+    assert opened == {name: 1 for name in sessions}
+    assert {name: bot.account(name).positions for name in sessions} == {
+        "alice": {}, "bob": {}, "carol": {}, "dave": {"BTC": ("long", 5.0, 1)},
+    }
+    assert PositionLedger(ledger.path).trades == {}
+
+
+def test_reconcile_keeps_trade_pending_if_it_never_opened(tmp_path, bot, pool, ledger, plan, sessions):
+    ledger.start_trade("trade1", "HYPE", sessions)
+    asyncio.run(ledger.save())
+    plan["trades"].pop("trade2")
+    plan["total_trades"] = 1
+
+    opened = count_opened_orders(bot)
+    trade = Trade(plan, str(tmp_path / "plan.json"), pool=pool, ledger=PositionLedger(ledger.path))
+    assert run_trade(trade, pool)
+
+    # Reconcile found nothing to close, so the trade was run instead of checkpointed
+    assert plan["total_trades_completed"] == 1
+    assert opened == {name: 1 for name in sessions}
+    assert all(not bot.account(name).positions for name in sessions)
+
+
+def test_unreadable_overview_skips_only_trades_of_that_session(tmp_path, bot, pool, ledger, plan):
+    # trade2 does not involve bob
+    plan["trades"]["trade2"]["long"]["accounts"] = [{"telegram": "carol", "volume": 20.0}]
+    plan["trades"]["trade2"]["short"]["accounts"] = [{"telegram": "dave", "volume": 20.0}]
+    bot.account("bob").positions["HYPE"] = ("long", 20.0, 1)
+    ledger.open("bob", "HYPE", "long", 20.0, "trade0")
+    asyncio.run(ledger.save())
+    handle_close_command = bot.handle_close_command
+
+    def unknown_overview_format(account):
+        if account.session_name != "bob":
+            return handle_close_command(account)
+        account.state = {"step": "close_ticker"}
+        bot.reply(account, "Positions Overview\n\nHYPE long 20 USD")
+
+    bot.handle_close_command = unknown_overview_format
+    trade = Trade(plan, str(tmp_path / "plan.json"), pool=pool, ledger=PositionLedger(ledger.path))
+
+    assert not run_trade(trade, pool)
+
+    assert trade.blocked == {"bob"}
+    assert not plan["trades"]["trade1"]["completed"]
+    assert plan["trades"]["trade2"]["completed"]
+    assert bot.account("bob").positions == {"HYPE": ("long", 20.0, 1)}
+
+
+def test_reconcile_reads_only_sessions_in_the_ledger(tmp_path, bot, pool, ledger, plan, sessions):
+    # bob holds a position this tool never opened and the ledger attributes nothing to anyone
+    bot.account("bob").positions["BTC"] = ("long", 5.0, 1)
+    handle_close_command = bot.handle_close_command
+    overviews = []
+
+    def recording_close_command(account):
+        overviews.append(account.session_name)
+        return handle_close_command(account)
+
+    bot.handle_close_command = recording_close_command
+    trade = Trade(plan, str(tmp_path / "plan.json"), pool=pool, ledger=ledger)
+
+    assert run_trade(trade, pool)
+
+    assert trade.blocked == set()
+    assert bot.account("bob").positions == {"BTC": ("long", 5.0, 1)}
+    # Every /close came from closing the trades, none from reconciling
+    assert sorted(overviews) == sorted(sessions * 2)